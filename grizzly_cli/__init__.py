@@ -2,8 +2,6 @@ import os
 
 from typing import Callable, List, Optional
 
-from behave.model import Scenario
-
 from .argparse import ArgumentSubParser
 from .__version__ import __version__
 
@@ -16,10 +14,6 @@ MOUNT_CONTEXT = os.environ.get('GRIZZLY_MOUNT_CONTEXT', EXECUTION_CONTEXT)
 
 PROJECT_NAME = os.path.basename(EXECUTION_CONTEXT)
 
-SCENARIOS: List[Scenario] = []
-
-FEATURE_DESCRIPTION: Optional[str] = None
-
 
 class register_parser:
     registered: List[Callable[[ArgumentSubParser], None]] = []
@@ -3,15 +3,17 @@ import os
 import sys
 
 from shutil import which
+from functools import lru_cache
 from typing import Tuple, Optional, List
 from traceback import format_exc
 
 from .argparse import ArgumentParser
-from .utils import ask_yes_no, get_distributed_system, get_dependency_versions, setup_logging
+from .utils import ask_yes_no, get_distributed_system, get_dependency_versions, setup_logging, FeatureDocument
 from .init import init
 from .local import local
 from .distributed import distributed
 from .auth import auth
+from .tracing import span, tracer
 from . import __version__, register_parser
 
 
@@ -43,6 +45,27 @@ def _create_parser() -> ArgumentParser:
         choices=['all'],
         help='print version of command line interface, and exit. add argument `all` to get versions of dependencies',
     )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        default=False,
+        required=False,
+        help='do not get package information from pypi, only use what has been cached by previous executions',
+    )
+    parser.add_argument(
+        '--trace-file',
+        type=str,
+        default=None,
+        required=False,
+        help='write how long each phase of the execution took to this file, in chrome trace-event format (`chrome://tracing` or https://ui.perfetto.dev)',
+    )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        default=False,
+        required=False,
+        help='print a summary of how long each phase of the execution took to stderr, when done',
+    )
 
     sub_parser = parser.add_subparsers(dest='command')
 
@@ -52,13 +75,73 @@ def _create_parser() -> ArgumentParser:
     return parser
 
 
-def _parse_arguments() -> argparse.Namespace:
-    parser = _create_parser()
-    args = parser.parse_args()
+@lru_cache(maxsize=1)
+def _get_parser() -> ArgumentParser:
+    """The parser tree is only created once, and is used for all arguments that are parsed."""
+    return _create_parser()
+
 
+def _parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse, validate and prepare `argv` (default `sys.argv[1:]`), without injecting arguments from feature file metadata."""
+    args = _read_arguments(argv)
+    _prepare_arguments(args)
+
+    return args
+
+
+def _read_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse and validate `argv` (default `sys.argv[1:]`), without any side effects, so it can be done more than once."""
+    parser = _get_parser()
+
+    return _validate_arguments(parser, parser.parse_args(argv))
+
+
+def _validate_arguments(parser: ArgumentParser, args: argparse.Namespace) -> argparse.Namespace:
     if hasattr(args, 'file'):
-        # needed to support file names with spaces, which is escaped (sh-style)
-        setattr(args, 'file', ' '.join(args.file))
+        # each argument has been validated to be an existing feature file, file names with spaces has to be escaped (sh-style)
+        setattr(args, 'files', args.file)
+        setattr(args, 'file', args.file[0])
+
+        if len(args.files) > 1 and isinstance(getattr(args, 'dump', None), str):
+            parser.error_no_help('argument --dump: can only dump to a file when running one feature file')
+
+    # version is printed when the arguments are prepared, nothing else matters
+    if args.version:
+        return args
+
+    if args.command is None:
+        parser.error('no command specified')
+
+    if getattr(args, 'subcommand', None) is None and args.command not in ['init', 'auth']:
+        parser.error_no_help(f'no subcommand for {args.command} specified')
+
+    if args.command == 'dist':
+        if args.registry is not None and not args.registry.endswith('/'):
+            setattr(args, 'registry', f'{args.registry}/')
+    elif args.command in ['init', 'auth']:
+        setattr(args, 'subcommand', None)
+
+    if args.subcommand == 'run':
+        for variable in args.testdata_variable or []:
+            if '=' not in variable:
+                parser.error_no_help('-T/--testdata-variable needs to be in the format NAME=VALUE')
+
+        if args.csv_prefix is None:
+            if args.csv_interval is not None:
+                parser.error_no_help('--csv-interval can only be used in combination with --csv-prefix')
+
+            if args.csv_flush_interval is not None:
+                parser.error_no_help('--csv-flush-interval can only be used in combination with --csv-prefix')
+    elif args.command == 'dist' and args.subcommand == 'build':
+        setattr(args, 'force_build', args.no_cache)
+        setattr(args, 'build', not args.no_cache)
+
+    return args
+
+
+def _prepare_arguments(args: argparse.Namespace) -> None:
+    """Everything that depends on the environment, or changes it, for the final arguments. Only done once."""
+    parser = _get_parser()
 
     if args.version:
         if __version__ == '0.0.0':
@@ -69,7 +152,7 @@ def _parse_arguments() -> argparse.Namespace:
         grizzly_versions: Optional[Tuple[Optional[str], Optional[List[str]]]] = None
 
         if args.version == 'all':
-            grizzly_versions, locust_version = get_dependency_versions(False)
+            grizzly_versions, locust_version = get_dependency_versions(False, offline=args.offline)
         else:
             grizzly_versions, locust_version = None, None
 
@@ -87,23 +170,12 @@ def _parse_arguments() -> argparse.Namespace:
 
         raise SystemExit(0)
 
-    if args.command is None:
-        parser.error('no command specified')
-
-    if getattr(args, 'subcommand', None) is None and args.command not in ['init', 'auth']:
-        parser.error_no_help(f'no subcommand for {args.command} specified')
-
     if args.command == 'dist':
         args.container_system = get_distributed_system()
 
         if args.container_system is None:
             parser.error_no_help('cannot run distributed')
 
-        if args.registry is not None and not args.registry.endswith('/'):
-            setattr(args, 'registry', f'{args.registry}/')
-    elif args.command in ['init', 'auth']:
-        setattr(args, 'subcommand', None)
-
     if args.subcommand == 'run':
         if args.command == 'dist':
             if args.limit_nofile < 10001 and not args.yes:
@@ -113,73 +185,63 @@ def _parse_arguments() -> argparse.Namespace:
             if which('behave') is None:
                 parser.error_no_help('"behave" not found in PATH, needed when running local mode')
 
-        if args.testdata_variable is not None:
-            for variable in args.testdata_variable:
-                try:
-                    [name, value] = variable.split('=', 1)
-                    os.environ[f'TESTDATA_VARIABLE_{name}'] = value
-                except ValueError:
-                    parser.error_no_help('-T/--testdata-variable needs to be in the format NAME=VALUE')
-
-        if args.csv_prefix is None:
-            if args.csv_interval is not None:
-                parser.error_no_help('--csv-interval can only be used in combination with --csv-prefix')
-
-            if args.csv_flush_interval is not None:
-                parser.error_no_help('--csv-flush-interval can only be used in combination with --csv-prefix')
-    elif args.command == 'dist' and args.subcommand == 'build':
-        setattr(args, 'force_build', args.no_cache)
-        setattr(args, 'build', not args.no_cache)
-
-    log_file = getattr(args, 'log_file', None)
-    setup_logging(log_file)
+        for variable in args.testdata_variable or []:
+            name, value = variable.split('=', 1)
+            os.environ[f'TESTDATA_VARIABLE_{name}'] = value
 
-    return args
+    setup_logging(getattr(args, 'log_file', None))
 
 
-def _inject_additional_arguments_from_metadata(args: argparse.Namespace) -> argparse.Namespace:
-    with open(args.file) as fd:
-        file_metadata = [line.strip().replace('# grizzly-cli ', '').split(' ') for line in fd.readlines() if line.strip().startswith('# grizzly-cli ')]
+def _inject_additional_arguments_from_metadata(args: argparse.Namespace, argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse and validate `argv` (default `sys.argv[1:]`) again, with `# grizzly-cli` metadata arguments from the feature files added."""
+    file_metadata: List[List[str]] = []
+    for file in getattr(args, 'files', None) or [args.file]:
+        for additional_arguments in FeatureDocument.load(file).metadata:
+            # same metadata in more than one feature file should only be injected once
+            if additional_arguments not in file_metadata:
+                file_metadata.append(additional_arguments)
 
     if len(file_metadata) < 1:
         return args
 
-    argv = sys.argv[1:]
+    injected_argv = list(sys.argv[1:] if argv is None else argv)
     for additional_arguments in file_metadata:
         try:
             if additional_arguments[0].strip().startswith('-'):
                 raise ValueError()
 
-            index = argv.index(additional_arguments[0]) + 1
+            index = injected_argv.index(additional_arguments[0]) + 1
             for zindex, additional_argument in enumerate(additional_arguments[1:]):
-                argv.insert(index + zindex, additional_argument)
+                injected_argv.insert(index + zindex, additional_argument)
         except ValueError:
             print('?? ignoring {}'.format(' '.join(additional_arguments)))
 
-    sys.argv = sys.argv[0:1] + argv
-
-    return _parse_arguments()
+    return _read_arguments(injected_argv)
 
 
 def main() -> int:
     args: Optional[argparse.Namespace] = None
 
     try:
-        args = _parse_arguments()
-
-        if getattr(args, 'file', None) is not None:
-            args = _inject_additional_arguments_from_metadata(args)
-
-        if args.command == 'local':
-            rc = local(args)
-        elif args.command == 'dist':
-            rc = distributed(args)
-        elif args.command == 'init':
-            rc = init(args)
-        elif args.command == 'auth':
-            rc = auth(args)
-        else:
-            raise ValueError(f'unknown command {args.command}')
+        with span('parse arguments'):
+            args = _read_arguments()
+
+            if getattr(args, 'file', None) is not None:
+                args = _inject_additional_arguments_from_metadata(args)
+
+            _prepare_arguments(args)
+
+        with span(args.command):
+            if args.command == 'local':
+                rc = local(args)
+            elif args.command == 'dist':
+                rc = distributed(args)
+            elif args.command == 'init':
+                rc = init(args)
+            elif args.command == 'auth':
+                rc = auth(args)
+            else:
+                raise ValueError(f'unknown command {args.command}')
 
         return rc
     except (KeyboardInterrupt, ValueError) as e:
@@ -194,3 +256,14 @@ def main() -> int:
 
         print('\n!! aborted grizzly-cli')
         return 1
+    finally:
+        trace_file = getattr(args, 'trace_file', None)
+        if trace_file is not None:
+            # should not change the outcome of the command
+            try:
+                tracer.write_chrome_trace(trace_file)
+            except Exception as e:
+                print(f'!! unable to write trace file {trace_file}: {e}', file=sys.stderr)
+
+        if getattr(args, 'timings', False):
+            print(f'\n{tracer.summary()}', file=sys.stderr)
@@ -5,7 +5,7 @@ from typing import Any, Optional, IO, Sequence, cast
 from argparse import ArgumentParser as CoreArgumentParser, Namespace, _SubParsersAction
 
 from .markdown import MarkdownFormatter, MarkdownHelpAction
-from .bashcompletion import BashCompletionAction, hook as bashcompletion_hook
+from .bashcompletion import BashCompletionAction, BashCompleteDaemonAction, hook as bashcompletion_hook
 
 
 ArgumentSubParser = _SubParsersAction
@@ -23,6 +23,7 @@ class ArgumentParser(CoreArgumentParser):
 
         if self.bash_completion:
             self.add_argument('--bash-completion', action=BashCompletionAction)
+            self.add_argument('--bash-complete-daemon', action=BashCompleteDaemonAction)
 
         self._optionals.title = 'optional arguments'
 
@@ -1,4 +1,5 @@
 import sys
+import re
 
 from typing import Any, Dict, List, Union, Sequence, Optional, cast
 from argparse import (
@@ -13,6 +14,7 @@ from argparse import (
     SUPPRESS,
 )
 from os import path
+from shlex import quote
 
 from .types import BashCompletionTypes
 
@@ -20,6 +22,8 @@ __all__ = [
     'BashCompletionTypes',
     'BashCompletionAction',
     'BashCompleteAction',
+    'BashCompleteDaemonAction',
+    'completion_table',
     'hook',
 ]
 
@@ -49,9 +53,29 @@ class BashCompletionAction(Action):
         values: Union[str, Sequence[Any], None],
         option_string: Optional[str] = None,
     ) -> None:
+        from . import daemon
+
         file_directory = path.dirname(__file__)
         with open(path.join(file_directory, 'bashcompletion.bash'), encoding='utf-8') as fd:
-            print(fd.read().replace('bashcompletion_template', parser.prog))
+            script = fd.read()
+
+        # bash variable names can only contain alphanumeric characters and underscores
+        name = '_{}_completion'.format(re.sub(r'\W', '_', parser.prog))
+        declaration = '\n'.join(
+            ['declare -gA {}=('.format(name)]
+            + ['    [{}]={}'.format(quote(key), quote(value)) for key, value in completion_table(parser).items()]
+            + [')']
+        )
+
+        script = (
+            script
+            .replace('bashcompletion_declaration', declaration)
+            .replace('bashcompletion_table', name)
+            .replace('bashcompletion_socket', quote(str(daemon.get_socket_path(parser.prog))))
+            .replace('bashcompletion_python', quote(sys.executable))
+            .replace('bashcompletion_client', quote(daemon.CLIENT))
+        )
+        print(script.replace('bashcompletion_template', parser.prog))
 
         parser.exit()
 
@@ -78,7 +102,8 @@ class BashCompleteAction(Action):
         suggestions: Dict[str, Union[str, Action]] = {}
 
         for action in parser._actions:
-            if isinstance(action, (BashCompleteAction, BashCompletionAction, )) or (SUPPRESS in [action.help, action.default] and action.dest != 'help'):
+            # options with default `SUPPRESS` are only hidden if the help is, they are not set unless specified
+            if isinstance(action, (BashCompleteAction, BashCompletionAction, BashCompleteDaemonAction, )) or (action.help == SUPPRESS and action.dest != 'help'):
                 continue
             elif isinstance(action, _SubParsersAction):
                 suggestions.update({key: action for key in action.choices.keys()})
@@ -310,9 +335,117 @@ class BashCompleteAction(Action):
                             del suggestions[suggestion.dest]
 
         print('\n'.join(suggestions.keys()))
+
+        from . import daemon
+
+        # next completion will not have to execute the command
+        if daemon.enabled() and not daemon.serving:
+            daemon.start(parser.prog.split(' ')[0])
+
         parser.exit()
 
 
+class BashCompleteDaemonAction(Action):
+    def __init__(
+        self,
+        option_strings: List[str],
+        dest: str = SUPPRESS,
+        default: str = SUPPRESS,
+        help: str = SUPPRESS,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=default,
+            help=help,
+            nargs=0,
+            **kwargs,
+        )
+
+    def __call__(
+        self,
+        parser: ArgumentParser,
+        namespace: Namespace,
+        values: Union[str, Sequence[Any], None],
+        option_string: Optional[str] = None,
+    ) -> None:
+        from . import daemon
+
+        daemon.serve(parser, daemon.get_socket_path(parser.prog))
+
+        parser.exit()
+
+
+def completion_table(parser: ArgumentParser) -> Dict[str, str]:
+    """Flatten the option and sub-command tree of `parser` into the lookup table that `bashcompletion.bash` uses, so that only
+    completion of file names needs to execute the command.
+
+    Keys are `<kind>|<sub-command path>[|<option>]`, e.g. `options|local run` or `arity|local run|--yes`:
+
+    * `options`, `commands`: space separated options and sub-commands of the parser
+    * `positional`: `@file` if the parser has a positional argument of type `BashCompletionTypes.File`, otherwise `value`
+    * `aliases`: all option strings of the same argument
+    * `arity`: `0` no value, `1` one value, `?` optional value, `a` one value and the option can be repeated
+    * `values`: space separated choices, or `@file`, for the value of the option
+    * `exclusive`: options that are mutually exclusive to the option
+    """
+    action = BashCompleteAction(['--bash-complete'])
+    table: Dict[str, str] = {}
+
+    def flatten(parser: ArgumentParser, parser_path: str) -> None:
+        suggestions = action.get_suggestions(parser)
+        exclusive_suggestions = action.get_exclusive_suggestions(parser)
+        options: List[str] = []
+        commands: List[str] = []
+
+        for key, suggestion in suggestions.items():
+            if not isinstance(suggestion, Action):
+                continue
+
+            if isinstance(suggestion, _SubParsersAction):
+                commands.append(key)
+                flatten(suggestion.choices[key], '{} {}'.format(parser_path, key).strip())
+                continue
+
+            is_file = isinstance(suggestion.type, BashCompletionTypes.File)
+
+            if len(suggestion.option_strings) == 0:
+                table.update({'positional|{}'.format(parser_path): '@file' if is_file else 'value'})
+                continue
+
+            options.append(key)
+            table.update({'aliases|{}|{}'.format(parser_path, key): ' '.join(suggestion.option_strings)})
+
+            if suggestion.nargs == 0:
+                arity = '0'
+            elif isinstance(suggestion, _AppendAction):
+                arity = 'a'
+            elif suggestion.nargs == '?':
+                arity = '?'
+            else:
+                arity = '1'
+
+            table.update({'arity|{}|{}'.format(parser_path, key): arity})
+
+            if is_file:
+                table.update({'values|{}|{}'.format(parser_path, key): '@file'})
+            elif suggestion.choices is not None and arity != '0':
+                table.update({'values|{}|{}'.format(parser_path, key): ' '.join([str(choice) for choice in suggestion.choices if choice is not None])})
+
+            if key in exclusive_suggestions:
+                table.update({'exclusive|{}|{}'.format(parser_path, key): ' '.join(exclusive_suggestions[key])})
+
+        table.update({'options|{}'.format(parser_path): ' '.join(options)})
+
+        if len(commands) > 0:
+            table.update({'commands|{}'.format(parser_path): ' '.join(commands)})
+
+    flatten(parser, '')
+
+    return table
+
+
 def hook(parser: ArgumentParser) -> None:
     try:
         parser.add_argument('--bash-complete', action=BashCompleteAction)
@@ -1,5 +1,19 @@
-_bashcompletion_template() {
-    local current previous command
+bashcompletion_declaration
+
+_bashcompletion_template_query() {
+    local socket=bashcompletion_socket
+
+    [[ -S "${socket}" ]] || return 1
+
+    if command -v socat > /dev/null; then
+        printf '%s\0' "$@" | socat -t 5 - "UNIX-CONNECT:${socket}" 2> /dev/null
+    else
+        printf '%s\0' "$@" | bashcompletion_python -I -S -c bashcompletion_client "${socket}" 2> /dev/null
+    fi
+}
+
+_bashcompletion_template_dynamic() {
+    local current previous command output
 
     current="${COMP_WORDS[COMP_CWORD]}"
     previous="${COMP_WORDS[$((COMP_CWORD - 1))]}"
@@ -15,7 +29,110 @@ _bashcompletion_template() {
         command="${COMP_WORDS[*]}"
     fi
 
+    # ask the completion daemon, if it is running, so the command does not have to be executed
+    if output="$(_bashcompletion_template_query "${PWD}" ${command} --bash-complete="${command} ${current}")"; then
+        if [[ -n "${output}" ]]; then
+            mapfile -t COMPREPLY <<< "${output}"
+        else
+            COMPREPLY=()
+        fi
+        return
+    fi
+
     mapfile -t COMPREPLY < <( ${command} --bash-complete="${command} ${current}" )
 }
 
+_bashcompletion_template() {
+    local current="${COMP_WORDS[COMP_CWORD]}"
+    local path='' pending='' word option arity values index
+    local -a candidates=()
+    local -A used=()
+
+    # walk the already completed words, to find out which (sub)parser, and which of its options, that is being completed
+    for (( index = 1; index < COMP_CWORD; index++ )); do
+        word="${COMP_WORDS[index]}"
+
+        if [[ "${word}" == '=' ]]; then
+            continue
+        fi
+
+        if [[ -n "${pending}" ]]; then
+            arity="${bashcompletion_table["arity|${path}|${pending}"]}"
+            values="${bashcompletion_table["values|${path}|${pending}"]}"
+            pending=''
+
+            # optional values are only consumed if it looks like one
+            if [[ "${arity}" != '?' || ( "${word}" != -* && ( -z "${values}" || " ${values} " == *" ${word} "* ) ) ]]; then
+                continue
+            fi
+        fi
+
+        if [[ "${word}" == '-h' || "${word}" == '--help' ]]; then
+            COMPREPLY=()
+            return
+        fi
+
+        if [[ " ${bashcompletion_table["commands|${path}"]} " == *" ${word} "* ]]; then
+            path="${path:+${path} }${word}"
+            used=()
+            continue
+        fi
+
+        option="${word%%=*}"
+        if [[ " ${bashcompletion_table["options|${path}"]} " == *" ${option} "* ]]; then
+            arity="${bashcompletion_table["arity|${path}|${option}"]}"
+
+            if [[ "${arity}" != 'a' ]]; then
+                for option in ${bashcompletion_table["aliases|${path}|${option}"]} ${bashcompletion_table["exclusive|${path}|${option}"]}; do
+                    used["${option}"]=1
+                done
+            fi
+
+            if [[ "${arity}" != '0' && "${word}" != *=* ]]; then
+                pending="${word}"
+            fi
+        fi
+    done
+
+    if [[ "${current}" == '=' ]]; then
+        current=''
+    fi
+
+    if [[ -n "${pending}" ]]; then
+        arity="${bashcompletion_table["arity|${path}|${pending}"]}"
+        values="${bashcompletion_table["values|${path}|${pending}"]}"
+
+        if [[ "${values}" == '@file' ]]; then
+            _bashcompletion_template_dynamic
+            return
+        elif [[ "${arity}" != '?' ]]; then
+            mapfile -t COMPREPLY < <( compgen -W "${values}" -- "${current}" )
+            return
+        elif [[ -z "${values}" && "${current}" != -* ]]; then
+            COMPREPLY=()
+            return
+        fi
+
+        candidates+=(${values})
+    fi
+
+    for option in ${bashcompletion_table["options|${path}"]}; do
+        if [[ -z "${used["${option}"]}" ]]; then
+            candidates+=("${option}")
+        fi
+    done
+
+    if [[ "${current}" != -* ]]; then
+        # file names are the only suggestions that are not known beforehand
+        if [[ "${bashcompletion_table["positional|${path}"]}" == '@file' ]]; then
+            _bashcompletion_template_dynamic
+            return
+        fi
+
+        candidates+=(${bashcompletion_table["commands|${path}"]})
+    fi
+
+    mapfile -t COMPREPLY < <( compgen -W "${candidates[*]}" -- "${current}" )
+}
+
 complete -F _bashcompletion_template -o filenames -o noquote bashcompletion_template
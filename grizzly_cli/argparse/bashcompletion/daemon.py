@@ -0,0 +1,221 @@
+"""Completion server, that keeps the parser tree and file indexes in memory between completions.
+
+It is started in the background by the first completion that executes the command, if `GRIZZLY_CLI_COMPLETION_DAEMON` is set,
+and exits when it has not received any requests for `IDLE_TIMEOUT` seconds, or when another version of grizzly-cli has been
+installed. Requests are the working directory, followed by the same arguments the command would have been executed with, separated
+by NUL characters. The response is the output of the command.
+
+The socket is in a directory that is only accessible by the user, since requests can list the contents of any directory.
+"""
+import os
+import re
+import sys
+import socket
+import subprocess
+
+from typing import List, Optional
+from argparse import ArgumentParser
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+__all__ = [
+    'CLIENT',
+    'IDLE_TIMEOUT',
+    'enabled',
+    'execute',
+    'get_command',
+    'get_installed_version',
+    'get_socket_path',
+    'handle',
+    'is_private',
+    'serve',
+    'start',
+]
+
+# seconds without requests before the server exits
+IDLE_TIMEOUT = 600
+
+# fallback client, if `socat` is not installed. `_socket` is used since `socket` takes longer to import than to complete
+CLIENT = (
+    'import _socket, sys; '
+    'client = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM); '
+    'client.settimeout(5); '
+    'client.connect(sys.argv[1]); '
+    'client.sendall(sys.stdin.buffer.read()); '
+    'client.shutdown(_socket.SHUT_WR); '
+    'sys.stdout.buffer.write(b"".join(iter(lambda: client.recv(65536), b"")))'
+)
+
+serving = False
+
+
+def enabled() -> bool:
+    return hasattr(socket, 'AF_UNIX') and os.environ.get('GRIZZLY_CLI_COMPLETION_DAEMON', '').lower() in ['1', 'true', 'yes']
+
+
+def get_socket_path(prog: str) -> Path:
+    from ...utils import get_cache_dir
+
+    socket_dir = get_cache_dir('completion')
+    socket_dir.chmod(0o700)
+
+    return socket_dir / '{}.sock'.format(re.sub(r'\W', '_', prog))
+
+
+def is_private(directory: Path) -> bool:
+    """Directory is owned by, and only accessible by, the user."""
+    directory_stat = directory.stat()
+
+    return directory_stat.st_uid == os.getuid() and directory_stat.st_mode & 0o077 == 0
+
+
+def get_installed_version() -> Optional[str]:
+    """Version of grizzly-cli that is currently installed, which is not the version of this process if it has been upgraded."""
+    import grizzly_cli
+
+    try:
+        content = (Path(grizzly_cli.__file__).parent / '__version__.py').read_text()
+    except OSError:
+        return None
+
+    match = re.search(r"^__version__ = version = '([^']*)'$", content, re.MULTILINE)
+
+    return match.group(1) if match is not None else None
+
+
+def get_command() -> List[str]:
+    """Arguments to execute the command the same way as the current process was started."""
+    main_spec = getattr(sys.modules.get('__main__', None), '__spec__', None)
+
+    if main_spec is not None:
+        return [sys.executable, '-m', main_spec.name]
+
+    return [sys.executable, sys.argv[0]]
+
+
+def is_running(socket_path: Path) -> bool:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        client.connect(str(socket_path))
+        return True
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+
+def start(prog: str) -> None:
+    """Start the server in the background, unless it is already running. Arguments to execute the command is the same as
+    the current process was started with."""
+    socket_path = get_socket_path(prog)
+
+    if is_running(socket_path):
+        return
+
+    # stale socket from a server that did not exit cleanly
+    socket_path.unlink(missing_ok=True)
+
+    subprocess.Popen(
+        [*get_command(), '--bash-complete-daemon'],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def handle(parser: ArgumentParser, request: bytes) -> bytes:
+    """Parse the arguments in `request`, from the working directory in it, and return what was printed."""
+    values = [value for value in request.decode().split('\0') if len(value) > 0]
+
+    if len(values) < 2:
+        return b''
+
+    cwd, _, *args = values
+    output = StringIO()
+
+    try:
+        os.chdir(cwd)
+
+        with redirect_stdout(output), redirect_stderr(StringIO()):
+            parser.parse_args(args)
+    except SystemExit:
+        pass
+    except Exception:
+        return b''
+
+    return output.getvalue().encode()
+
+
+def execute(request: bytes) -> bytes:
+    """Execute the command for the arguments in `request`, from the working directory in it, without the server."""
+    values = [value for value in request.decode().split('\0') if len(value) > 0]
+
+    if len(values) < 2:
+        return b''
+
+    cwd, _, *args = values
+    env = {key: value for key, value in os.environ.items() if key != 'GRIZZLY_CLI_COMPLETION_DAEMON'}
+
+    try:
+        return subprocess.check_output([*get_command(), *args], cwd=cwd, env=env, stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError) as e:
+        return getattr(e, 'output', None) or b''
+
+
+def serve(parser: ArgumentParser, socket_path: Path, idle_timeout: float = IDLE_TIMEOUT) -> None:
+    global serving
+
+    import grizzly_cli
+
+    if not is_private(socket_path.parent):
+        # other users would be able to connect to the socket
+        return
+
+    version = get_installed_version() or grizzly_cli.__version__
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        server.bind(str(socket_path))
+    except OSError:
+        # another server was started at the same time
+        server.close()
+        return
+
+    serving = True
+    server.listen()
+    server.settimeout(idle_timeout)
+
+    try:
+        while True:
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                break
+
+            with connection:
+                try:
+                    connection.settimeout(5)
+                    chunks: List[bytes] = []
+                    chunk: Optional[bytes] = None
+
+                    while chunk != b'':
+                        chunk = connection.recv(65536)
+                        chunks.append(chunk)
+
+                    request = b''.join(chunks)
+
+                    # parser is stale, answer with the installed version and let the next completion start a new server
+                    if get_installed_version() not in [None, version]:
+                        connection.sendall(execute(request))
+                        break
+
+                    connection.sendall(handle(parser, request))
+                except OSError:
+                    continue
+    finally:
+        serving = False
+        server.close()
+        socket_path.unlink(missing_ok=True)
@@ -1,11 +1,14 @@
 import sys
+import os
 
-from typing import Dict, Optional
-from glob import glob
+from typing import Dict, List, Optional, Tuple
 from os import getcwd
-from os.path import sep as path_separator, exists, isfile
-from fnmatch import filter as fnmatch_filter
+from os.path import sep as path_separator, exists, isfile, isabs, join as path_join
+from fnmatch import filter as fnmatch_filter, fnmatch
 from argparse import ArgumentTypeError
+from hashlib import sha1
+from json import loads as jsonloads, dumps as jsondumps
+from time import time
 
 
 __all__ = [
@@ -18,6 +21,149 @@ ESCAPE_CHARACTERS = {
     ')': '\\)',
 }
 
+# directories that are never searched for files to complete, unless explicitly typed. `requests/logs` is where scenarios writes
+# log files, a directory named `logs` elsewhere is searched
+IGNORED_DIRECTORIES = ['node_modules', '__pycache__', path_join('requests', 'logs')]
+
+# seconds a file index is used, directory listings in it are also invalidated when the directory is modified
+FILE_INDEX_TTL = 60
+
+
+def is_ignored(directory: str) -> bool:
+    """If `directory` ends with any of `IGNORED_DIRECTORIES`."""
+    parts = directory.split(path_separator)
+
+    for ignored_directory in IGNORED_DIRECTORIES:
+        ignored_parts = ignored_directory.split(path_separator)
+        if parts[-len(ignored_parts):] == ignored_parts:
+            return True
+
+    return False
+
+
+class FileIndex:
+    """Directory listings under `root`, persisted in the grizzly-cli cache between completions.
+
+    A listing is used as long as the modification time of the directory is unchanged, which changes when an entry in it is
+    added, removed or renamed.
+    """
+
+    _indexes: Dict[str, 'FileIndex'] = {}
+
+    root: str
+    directories: Dict[str, Tuple[int, List[str], List[str]]]
+
+    def __init__(self, root: str) -> None:
+        from ...utils import get_cache_dir
+
+        self.root = root
+        self.file = get_cache_dir('completion') / '{}.json'.format(sha1(root.encode()).hexdigest())
+        self.directories = {}
+        self.modified = False
+
+        try:
+            index = jsonloads(self.file.read_text())
+            if index.get('timestamp', 0) + FILE_INDEX_TTL > time():
+                self.directories = {directory: (mtime, files, dirs) for directory, (mtime, files, dirs) in index.get('directories', {}).items()}
+        except (OSError, ValueError):
+            pass
+
+    @classmethod
+    def get(cls, root: str) -> 'FileIndex':
+        index = cls._indexes.get(root, None)
+
+        if index is None:
+            index = cls._indexes[root] = cls(root)
+
+        return index
+
+    def listdir(self, directory: str) -> Tuple[List[str], List[str]]:
+        """Files and directories, that are not hidden, in `directory` (relative to `root`)."""
+        try:
+            mtime = os.stat(path_join(self.root, directory)).st_mtime_ns
+        except OSError:
+            return [], []
+
+        cached = self.directories.get(directory, None)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        files: List[str] = []
+        dirs: List[str] = []
+
+        try:
+            with os.scandir(path_join(self.root, directory)) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+
+                    try:
+                        if entry.is_dir():
+                            dirs.append(entry.name)
+                        else:
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return [], []
+
+        self.directories[directory] = (mtime, files, dirs)
+        self.modified = True
+
+        return files, dirs
+
+    def contains(self, directory: str, patterns: List[str], searched: Optional[Dict[Tuple[int, int], bool]] = None) -> bool:
+        """If `directory`, or any directory under it that is not pruned, has a file matching any of `patterns`."""
+        if searched is None:
+            searched = {}
+
+        try:
+            directory_stat = os.stat(path_join(self.root, directory))
+        except OSError:
+            return False
+
+        # same directory, regardless of which path (e.g. via a symbolic link) it was found by
+        key = (directory_stat.st_dev, directory_stat.st_ino,)
+        contains = searched.get(key, None)
+
+        if contains is not None:
+            return contains
+
+        # a directory that links to one of its parents is not searched again
+        searched[key] = False
+
+        files, dirs = self.list_matching(directory, '', patterns)
+
+        contains = len(files) > 0 or any([self.contains(path_join(directory, name), patterns, searched) for name in dirs])
+        searched[key] = contains
+
+        return contains
+
+    def list_matching(self, directory: str, prefix: str, patterns: List[str]) -> Tuple[List[str], List[str]]:
+        """Files in `directory` matching `patterns`, and directories that should be searched, that starts with `prefix`."""
+        files, dirs = self.listdir(directory)
+
+        # do not search virtual environments
+        if 'pyvenv.cfg' in files:
+            return [], []
+
+        return (
+            [name for name in files if name.startswith(prefix) and any([fnmatch(name, pattern) for pattern in patterns])],
+            [name for name in dirs if name.startswith(prefix) and not is_ignored(path_join(directory, name))],
+        )
+
+    def save(self) -> None:
+        if not self.modified:
+            return
+
+        from ...utils import write_file_atomic
+
+        try:
+            write_file_atomic(self.file, jsondumps({'timestamp': time(), 'directories': self.directories}))
+            self.modified = False
+        except OSError:
+            pass
+
 
 class BashCompletionTypes:
     class File:
@@ -49,26 +195,23 @@ class BashCompletionTypes:
                     value += ' '
                 value = value.replace('\\ ', ' ').replace('\\(', '(').replace('\\)', ')')
 
-            for pattern in self.patterns:
-                for path in glob('**/{pattern}'.format(pattern=pattern), recursive=True):
-                    path_match = path.replace('{cwd}{path_separator}'.format(cwd=self.cwd, path_separator=path_separator), '')
+            # only the directory of the value is listed, and directories in it are only searched until a matching file is found
+            directory, separator, prefix = (value or '').rpartition(path_separator)
 
-                    if path_match.startswith('.') or (value is not None and not path_match.startswith(value)):
-                        continue
+            # hidden files and directories are never suggested, and absolute paths are not supported
+            if any([part.startswith('.') for part in directory.split(path_separator)]) or prefix.startswith('.') or isabs(value or ''):
+                return matches
 
-                    match: Optional[Dict[str, str]] = None
+            index = FileIndex.get(getcwd())
+            files, dirs = index.list_matching(directory, prefix, self.patterns)
 
-                    if path_separator in path_match:
-                        try:
-                            index_match = len(value or '')
-                            index_sep = path_match[index_match:].index(path_separator) + index_match
-                            match = {path_match[:index_sep].translate(str.maketrans(ESCAPE_CHARACTERS)): 'dir'}  # type: ignore
-                        except ValueError:
-                            pass
+            for name in files:
+                matches.update({'{}{}{}'.format(directory, separator, name).translate(str.maketrans(ESCAPE_CHARACTERS)): 'file'})  # type: ignore
 
-                    if match is None:
-                        match = {path_match.translate(str.maketrans(ESCAPE_CHARACTERS)): 'file'}  # type: ignore
+            for name in dirs:
+                if index.contains(path_join(directory, name), self.patterns):
+                    matches.update({'{}{}{}'.format(directory, separator, name).translate(str.maketrans(ESCAPE_CHARACTERS)): 'dir'})  # type: ignore
 
-                    matches.update(match)
+            index.save()
 
             return matches
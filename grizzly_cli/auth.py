@@ -5,8 +5,6 @@ from argparse import Namespace as Arguments
 from typing import Optional
 from pathlib import Path
 
-from pyotp import TOTP
-
 from . import register_parser
 from .argparse import ArgumentSubParser
 
@@ -60,6 +58,8 @@ def auth(args: Arguments) -> int:
         if ' ' in secret or len(secret.split('\n')) > 1 or secret == '':
             raise ValueError(f'file {input_file} does not seem to contain a single line with a valid OTP secret')
 
+    from pyotp import TOTP
+
     try:
         totp = TOTP(secret)
 
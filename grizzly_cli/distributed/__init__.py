@@ -3,7 +3,7 @@ import sys
 import argparse
 import subprocess
 
-from typing import List, Dict, Any, cast
+from typing import Callable, List, Dict, Any, Optional, cast
 from tempfile import NamedTemporaryFile
 from getpass import getuser
 from shutil import get_terminal_size
@@ -17,12 +17,14 @@ from .. import EXECUTION_CONTEXT, STATIC_CONTEXT, MOUNT_CONTEXT, PROJECT_NAME, r
 from ..utils import (
     run_command,
     get_default_mtu,
-    list_images,
+    inspect_image,
+    run_probes,
 )
 from .build import build as do_build, create_parser as build_create_parser
 from .clean import clean as do_clean, create_parser as clean_create_parser
-from ..run import create_parser as run_create_parser, run
+from ..run_parser import create_parser as run_create_parser
 from ..argparse import ArgumentSubParser
+from ..tracing import span
 
 
 @register_parser(order=3)
@@ -143,6 +145,9 @@ def create_parser(sub_parser: ArgumentSubParser) -> None:
 
 def distributed(args: Arguments) -> int:
     if args.subcommand == 'run':
+        # rendering feature files has heavy dependencies, only import them when they are needed
+        from ..run import run
+
         return run(args, distributed_run)
     elif args.subcommand == 'build':
         return do_build(args)
@@ -152,6 +157,23 @@ def distributed(args: Arguments) -> int:
         raise ValueError(f'unknown subcommand {args.subcommand}')
 
 
+def get_mount_context_path(args: Arguments) -> str:
+    """Path of the execution context relative to the mount context, when grizzly-cli runs inside a container."""
+    hostname = gethostname()
+    output = subprocess.check_output(
+        [args.container_system, 'container', 'inspect', '-f', '{{ json .Mounts }}', hostname],
+        encoding='utf-8',
+    )
+    container_mounts = jsonloads(output)
+    for container_mount in container_mounts:
+        if container_mount['Source'] != MOUNT_CONTEXT:
+            continue
+
+        return EXECUTION_CONTEXT.replace(container_mount['Destination'], '')[1:]
+
+    return ''
+
+
 def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dict[str, List[str]]) -> int:
     suffix = '' if args.id is None else f'-{args.id}'
     tag = getuser()
@@ -173,7 +195,19 @@ def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dic
     if args.wait_for_worker is not None:
         os.environ['LOCUST_WAIT_FOR_WORKERS_REPORT_AFTER_RAMP_UP'] = f'{args.wait_for_worker}'
 
-    mtu = get_default_mtu(args)
+    # none of these depends on each other
+    probes: Dict[str, Callable[[], Any]] = {
+        'mtu': lambda: get_default_mtu(args),
+        'image': lambda: inspect_image(args, f'{project_name}:{tag}'),
+    }
+
+    if EXECUTION_CONTEXT != MOUNT_CONTEXT:
+        probes.update({'mount': lambda: get_mount_context_path(args)})
+
+    with span('probes'):
+        probe_results = run_probes(probes, verbose=getattr(args, 'verbose', False))
+
+    mtu = cast(Optional[str], probe_results['mtu'].value)
 
     if mtu is None and os.environ.get('GRIZZLY_MTU', None) is None:
         print('!! unable to determine MTU, try manually setting GRIZZLY_MTU environment variable if anything other than 1500 is needed')
@@ -198,25 +232,9 @@ def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dic
     os.environ['COLUMNS'] = str(columns)
     os.environ['LINES'] = str(lines)
 
-    grizzly_mount_context_path = ''
-
     name_template = '{project}{suffix}-{tag}-{node}-{index}'
 
-    if EXECUTION_CONTEXT != MOUNT_CONTEXT:
-        hostname = gethostname()
-        output = subprocess.check_output(
-            [args.container_system, 'container', 'inspect', '-f', '{{ json .Mounts }}', hostname],
-            encoding='utf-8',
-        )
-        container_mounts = jsonloads(output)
-        for container_mount in container_mounts:
-            if container_mount['Source'] != MOUNT_CONTEXT:
-                continue
-
-            grizzly_mount_context_path = EXECUTION_CONTEXT.replace(container_mount['Destination'], '')[1:]
-            break
-
-    os.environ['GRIZZLY_MOUNT_PATH'] = grizzly_mount_context_path
+    os.environ['GRIZZLY_MOUNT_PATH'] = cast(str, probe_results['mount'].value) if 'mount' in probe_results else ''
 
     if len(run_arguments.get('master', [])) > 0:
         os.environ['GRIZZLY_MASTER_RUN_ARGS'] = ' '.join(run_arguments['master'])
@@ -228,7 +246,7 @@ def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dic
         os.environ['GRIZZLY_COMMON_RUN_ARGS'] = ' '.join(run_arguments['common'])
 
     # check if we need to build image
-    images = list_images(args)
+    image = probe_results['image'].value
 
     with NamedTemporaryFile() as fd:
         # file will be deleted when conContainertext exits
@@ -258,7 +276,8 @@ def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dic
             'config',
         ]
 
-        result = run_command(compose_command, silent=not validate_config)
+        with span('compose config'):
+            result = run_command(compose_command, silent=not validate_config)
 
         if validate_config or result.return_code != 0:
             if result.return_code != 0 and not validate_config:
@@ -269,7 +288,7 @@ def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dic
 
             return result.return_code
 
-        if images.get(project_name, {}).get(tag, None) is None or args.force_build or args.build:
+        if image is None or args.force_build or args.build:
             rc = do_build(args)
             if rc != 0:
                 print(f'!! failed to build {project_name}, rc={rc}')
@@ -286,7 +305,8 @@ def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dic
             '--remove-orphans',
         ]
 
-        result = run_command(compose_command, verbose=args.verbose)
+        with span('compose up', workers=args.workers):
+            result = run_command(compose_command, verbose=args.verbose)
 
         try:
             output = subprocess.check_output(
@@ -316,7 +336,8 @@ def distributed_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dic
             'stop',
         ]
 
-        run_command(compose_command)
+        with span('compose stop'):
+            run_command(compose_command)
 
         if result.return_code != 0:
             if result.abort_timestamp is not None:
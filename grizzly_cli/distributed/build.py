@@ -5,8 +5,9 @@ from argparse import SUPPRESS, Namespace as Arguments
 from getpass import getuser
 from socket import gethostbyname, gaierror
 
-from ..utils import get_dependency_versions, requirements, run_command
+from ..utils import forget_image, get_dependency_versions, requirements, run_command
 from ..argparse import ArgumentSubParser
+from ..tracing import traced
 from .. import EXECUTION_CONTEXT, PROJECT_NAME, STATIC_CONTEXT
 
 
@@ -82,7 +83,7 @@ def _create_build_command(args: Arguments, containerfile: str, tag: str, context
     else:
         install_type = 'remote'
 
-    (_, grizzly_extras, ), _ = get_dependency_versions(local_install)
+    (_, grizzly_extras, ), _ = get_dependency_versions(local_install, offline=getattr(args, 'offline', False))
 
     if grizzly_extras is not None and 'mq' in grizzly_extras:
         grizzly_extra = 'mq'
@@ -124,6 +125,7 @@ def _create_build_command(args: Arguments, containerfile: str, tag: str, context
     ]
 
 
+@traced('build')
 @requirements(EXECUTION_CONTEXT)
 def build(args: Arguments) -> int:
     tag = getuser()
@@ -151,6 +153,7 @@ def build(args: Arguments) -> int:
     spinner = 'building' if not getattr(args, 'no_progress', False) else None
 
     result = run_command(build_command, env=build_env, spinner=spinner, verbose=args.verbose)
+    forget_image(args, image_name)
 
     if result.return_code == 0:
         print(f'\nbuilt image {image_name}')
@@ -5,7 +5,7 @@ from getpass import getuser
 from shutil import get_terminal_size
 
 from ..argparse import ArgumentSubParser
-from ..utils import run_command
+from ..utils import forget_image, run_command
 from .. import PROJECT_NAME, STATIC_CONTEXT
 
 
@@ -76,6 +76,7 @@ def clean(args: Arguments) -> int:
         ]
 
         run_command(command)
+        forget_image(args, f'{project_name}:{tag}')
 
     if args.networks:
         command = [
@@ -1,14 +1,32 @@
 import os
 
 from typing import List, Dict, Any
-from argparse import Namespace as Arguments
+from argparse import Namespace as Arguments, ArgumentTypeError, SUPPRESS
 
 from . import register_parser
 from .utils import (
     run_command,
+    run_commands,
 )
-from .run import create_parser as run_create_parser, run
+from .run_parser import create_parser as run_create_parser
 from .argparse import ArgumentSubParser
+from .tracing import span
+
+
+def workers_type(value: str) -> int:
+    """Number of worker processes, where `auto` is one per CPU."""
+    if value == 'auto':
+        return os.cpu_count() or 1
+
+    try:
+        workers = int(value)
+    except ValueError:
+        raise ArgumentTypeError(f'"{value}" is not a number or "auto"')
+
+    if workers < 1:
+        raise ArgumentTypeError('there must be at least 1 worker')
+
+    return workers
 
 
 @register_parser(order=2)
@@ -18,13 +36,39 @@ def create_parser(sub_parser: ArgumentSubParser) -> None:
     if local_parser.prog != 'grizzly-cli local':  # pragma: no cover
         local_parser.prog = 'grizzly-cli local'
 
+    workers_help = (
+        'run with one locust master process, and this many worker processes, instead of one process. '
+        '`auto` starts one worker process per CPU'
+    )
+
+    local_parser.add_argument(
+        '--workers',
+        type=workers_type,
+        required=False,
+        default=None,
+        help=workers_help,
+    )
+
     sub_parser = local_parser.add_subparsers(dest='subcommand')
 
     run_create_parser(sub_parser, parent='local')
 
+    # can be specified both before and after `run`, not set if after is not specified, so it does not override the value before
+    run_parser = sub_parser.choices['run']
+    run_parser.add_argument(
+        '--workers',
+        type=workers_type,
+        required=False,
+        default=SUPPRESS,
+        help=workers_help,
+    )
+
 
 def local(args: Arguments) -> int:
     if args.subcommand == 'run':
+        # rendering feature files has heavy dependencies, only import them when they are needed
+        from .run import run
+
         return run(args, local_run)
     else:
         raise ValueError(f'unknown subcommand {args.subcommand}')
@@ -35,6 +79,11 @@ def local_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dict[str,
         if key not in os.environ:
             os.environ[key] = value
 
+    workers = getattr(args, 'workers', None)
+
+    if workers is not None:
+        return local_run_workers(args, workers, run_arguments)
+
     command = [
         'behave',
     ]
@@ -46,3 +95,24 @@ def local_run(args: Arguments, environ: Dict[str, Any], run_arguments: Dict[str,
         command += run_arguments['master'] + run_arguments['worker'] + run_arguments['common']
 
     return run_command(command).return_code
+
+
+def local_run_workers(args: Arguments, workers: int, run_arguments: Dict[str, List[str]]) -> int:
+    """Run one master and `workers` worker processes, with the same arguments as the containers in `dist run`."""
+    master_command = ['behave', '-D', 'master=true', '-D', f'expected-workers={workers}']
+    worker_command = ['behave', '-q', '--no-summary', '--format', 'null', '-D', 'worker=true', '-D', 'master-host=127.0.0.1']
+
+    if args.file is not None:
+        master_command += [args.file]
+        worker_command += [args.file]
+
+    master_command += run_arguments.get('master', []) + run_arguments.get('common', [])
+    worker_command += run_arguments.get('worker', []) + run_arguments.get('common', [])
+
+    commands = {'master': master_command}
+    commands.update({f'worker-{index}': worker_command for index in range(1, workers + 1)})
+
+    with span('run workers', workers=workers):
+        results = run_commands(commands, verbose=getattr(args, 'verbose', False))
+
+    return results['master'].return_code
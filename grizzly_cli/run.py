@@ -6,8 +6,10 @@ import re
 import logging
 
 from typing import (
+    TYPE_CHECKING,
     ClassVar,
     Iterable,
+    Iterator,
     List,
     Dict,
     Any,
@@ -16,6 +18,8 @@ from typing import (
     TextIO,
     Union,
     Set,
+    Tuple,
+    Type,
     cast,
 )
 from argparse import Namespace as Arguments
@@ -23,73 +27,256 @@ from platform import node as get_hostname
 from datetime import datetime
 from pathlib import Path
 from contextlib import suppress
+from dataclasses import dataclass
+from hashlib import sha256
+from json import loads as jsonloads, dumps as jsondumps
 from textwrap import dedent
+from fnmatch import fnmatch
+from shutil import rmtree
+from tempfile import mkdtemp
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from time import time
 
 import yaml
-from azure.core.exceptions import ClientAuthenticationError, ServiceRequestError
-from azure.identity import AzureCliCredential, ManagedIdentityCredential, ChainedTokenCredential
-from azure.keyvault.secrets import SecretClient
-from jinja2 import Environment
-from jinja2.lexer import Token, TokenStream
+from jinja2 import Environment, Template
+from jinja2.bccache import Bucket, FileSystemBytecodeCache
+from jinja2.ext import Extension
+from jinja2.lexer import Token, TokenStream, newline_re
 from jinja2_simple_tags import StandaloneTag
 from behave.parser import parse_feature
 from behave.model import Scenario
 
+if TYPE_CHECKING:  # pragma: no cover
+    from azure.keyvault.secrets import SecretClient
+
 import grizzly_cli
 from .utils import (
     logger,
     find_variable_names_in_questions,
     ask_yes_no, get_input,
     distribution_of_users_per_scenario,
+    write_plan,
     requirements,
     find_metadata_notices,
-    parse_feature_file,
-    merge_dicts,
+    FeatureDocument,
     unflatten,
-    IndentDumper,
+    get_cache_dir,
+    write_file_atomic,
+    get_indentation,
+    LayeredConfiguration,
 )
-from .argparse import ArgumentSubParser
-from .argparse.bashcompletion import BashCompletionTypes
+from .tracing import span, traced
 
 
-class ScenarioTag(StandaloneTag):
-    tags = {'scenario'}
+class BoundedBytecodeCache(FileSystemBytecodeCache):
+    """File system bytecode cache limited to `max_size` bytes, where the least recently used templates are evicted first."""
 
-    def preprocess(
-        self, source: str, name: Optional[str], filename: Optional[str] = None
-    ) -> str:
-        self._source = source
+    def __init__(self, directory: str, max_size: int) -> None:
+        super().__init__(directory, '__grizzly_cli_%s.cache')
+        self.max_size = max_size
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        super().load_bytecode(bucket)
+
+        if bucket.code is not None:  # mark as recently used
+            with suppress(OSError):
+                os.utime(self._get_cache_filename(bucket))
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        super().dump_bytecode(bucket)
+        self.evict()
+
+    def evict(self) -> None:
+        evict_least_recently_used(self.directory, self.pattern % ('*',), self.max_size)
+
+
+def evict_least_recently_used(directory: str, pattern: str, max_size: int) -> None:
+    """Remove files matching `pattern` in `directory`, least recently modified first, until they are at most `max_size` bytes."""
+    entries: List[Tuple[int, int, str]] = []
+
+    for entry in os.scandir(directory):
+        if not fnmatch(entry.name, pattern):
+            continue
+
+        with suppress(OSError):
+            entry_stat = entry.stat()
+            entries.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry.path,))
+
+    total_size = sum(size for _, size, _ in entries)
+
+    for _, size, entry_path in sorted(entries):
+        if total_size <= max_size:
+            break
+
+        with suppress(OSError):
+            os.remove(entry_path)
+            total_size -= size
+
+
+def create_environment(*extensions: Type[Extension]) -> Environment:
+    """Create template environment, with a persistent bytecode cache if environment variable `GRIZZLY_CLI_BYTECODE_CACHE`
+    is set to the max size, in MB, of the cache."""
+    bytecode_cache: Optional[BoundedBytecodeCache] = None
+    bytecode_cache_size = os.environ.get('GRIZZLY_CLI_BYTECODE_CACHE', None)
+
+    if bytecode_cache_size:
+        try:
+            max_size = int(bytecode_cache_size) * 1024 * 1024
+        except ValueError:
+            raise ValueError(f'GRIZZLY_CLI_BYTECODE_CACHE should be max size of cache in MB, not "{bytecode_cache_size}"')
+
+        bytecode_cache = BoundedBytecodeCache(get_cache_dir('bytecode').as_posix(), max_size=max_size)
+
+    return Environment(autoescape=False, extensions=list(extensions), bytecode_cache=bytecode_cache)
+
+
+def compile_template(environment: Environment, source: str) -> Template:
+    """Same as `environment.from_string`, but compiled code is stored in, and loaded from, the bytecode cache of the environment.
+
+    `from_string` never uses the bytecode cache, it is only used for templates loaded by a loader.
+    """
+    bytecode_cache = environment.bytecode_cache
+
+    if bytecode_cache is None:
+        return environment.from_string(source)
+
+    # compiled code depends on which extensions that filtered the source
+    extensions = ','.join(sorted(environment.extensions.keys()))
+    name = sha256('\0'.join([grizzly_cli.__version__, extensions, source]).encode('utf-8')).hexdigest()
+    bucket = bytecode_cache.get_bucket(environment, name, None, source)
+
+    if bucket.code is None:
+        bucket.code = environment.compile(source)
+        bytecode_cache.set_bucket(bucket)
+
+    return environment.template_class.from_code(environment, bucket.code, environment.make_globals(None))
 
-        return cast(str, super().preprocess(source, name, filename))
+
+@dataclass
+class ScenarioIndex:
+    """Line ranges for all scenarios in a feature file, so that an included scenario is a lookup and a slice of the
+    already split lines, instead of parsing the whole file again for each `{% scenario ... %}` tag."""
+    lines: List[str]
+    scenarios: Dict[str, Tuple[int, Optional[int]]]
 
     @classmethod
-    def get_scenario_text(cls, name: str, file: Path) -> str:
+    def parse(cls, file: Path) -> ScenarioIndex:
         content = file.read_text()
 
         content_skel = re.sub(r'\{%.*%\}', '', content)
         content_skel = re.sub(r'\{\$.*\$\}', '', content_skel)
 
-        assert len(content.splitlines()) == len(content_skel.splitlines()), 'oops, there is not a 1:1 match between lines!'
+        lines = content.splitlines()
+
+        assert len(lines) == len(content_skel.splitlines()), 'oops, there is not a 1:1 match between lines!'
 
         feature = parse_feature(content_skel, filename=file.as_posix())
-        scenarios = cast(List[Scenario], feature.scenarios)
-        lines = content.splitlines()
+        feature_scenarios = cast(List[Scenario], feature.scenarios if feature is not None else [])
+        scenarios: Dict[str, Tuple[int, Optional[int]]] = {}
 
-        for scenario_index, scenario in enumerate(scenarios):
-            if scenario.name == name:
-                break
+        for scenario_index, scenario in enumerate(feature_scenarios):
+            if scenario.name in scenarios:  # first scenario with a name wins
+                continue
+
+            # check if there are scenarios after our scenario in the source
+            next_scenario: Optional[Scenario] = None
+            with suppress(IndexError):
+                next_scenario = feature_scenarios[scenario_index + 1]
+
+            if next_scenario is None:  # last scenario, take everything until the end
+                scenarios.update({scenario.name: (scenario.line, None)})
+                continue
+
+            # take everything up until where the next scenario starts
+            end = next_scenario.line - 1
+            if end > scenario.line and lines[end - 1] == '':  # if last line is an empty line, lets remove it
+                end -= 1
+
+            scenarios.update({scenario.name: (scenario.line, end)})
+
+        return cls(lines=lines, scenarios=scenarios)
+
+    @classmethod
+    def get(cls, file: Path, cache: Optional[Dict[Tuple[str, int, int], ScenarioIndex]] = None) -> ScenarioIndex:
+        """Get index for `file`, from `cache` if the file has not been modified since it was indexed."""
+        if cache is None:
+            return cls.parse(file)
+
+        stat = file.stat()
+        key = (file.resolve().as_posix(), stat.st_mtime_ns, stat.st_size)
+
+        index = cache.get(key, None)
+        if index is None:
+            index = cls.parse(file)
+            cache.update({key: index})
+
+        return index
+
+
+class SourceTag(StandaloneTag):
+    """Base for tags that passes everything, except the tag itself, through as plain text.
+
+    Keeps the offset of each line in the preprocessed source, so that the original text of a token can be sliced out
+    of the source by searching from the line the token is on, instead of rescanning the source.
+    """
+    _source: str
+    _line_offsets: List[int]
+
+    def preprocess(
+        self, source: str, name: Optional[str], filename: Optional[str] = None,
+    ) -> str:
+        self._source = source
+        # same newline definition as the jinja2 lexer uses when counting lines
+        self._line_offsets = [0, *[match.end() for match in newline_re.finditer(source)]]
+
+        return cast(str, super().preprocess(source, name, filename))
+
+    def get_line(self, lineno: int) -> str:
+        start = self._line_offsets[lineno - 1]
+        end = self._line_offsets[lineno] if lineno < len(self._line_offsets) else len(self._source)
 
-        # check if there are scenarios after our scenario in the source
-        next_scenario: Optional[Scenario] = None
-        with suppress(IndexError):
-            next_scenario = scenarios[scenario_index + 1]
+        return self._source[start:end]
 
-        if next_scenario is None:  # last scenario, take everything until the end
-            scenario_lines = lines[scenario.line:]
-        else:  # take everything up until where the next scenario starts
-            scenario_lines = lines[scenario.line:next_scenario.line - 1]
-            if scenario_lines[-1] == '':  # if last line is an empty line, lets remove it
-                scenario_lines.pop()
+    def find(self, value: str, lineno: int, start: int) -> int:
+        """Offset of `value` in source, on or after line `lineno`, but not before offset `start`."""
+        return self._source.index(value, max(self._line_offsets[lineno - 1], start))
+
+    @staticmethod
+    def coalesce(tokens: Iterable[Token]) -> Iterator[Token]:
+        """Merge consecutive `data` tokens, so the parser and compiler handles one constant instead of one per token."""
+        data: List[str] = []
+        data_lineno = 0
+
+        for token in tokens:
+            if token.type == 'data':
+                if len(data) < 1:
+                    data_lineno = token.lineno
+                data.append(token.value)
+                continue
+
+            if len(data) > 0:
+                yield Token(data_lineno, 'data', ''.join(data))
+                data = []
+
+            yield token
+
+        if len(data) > 0:
+            yield Token(data_lineno, 'data', ''.join(data))
+
+
+class ScenarioTag(SourceTag):
+    tags = {'scenario'}
+
+    @classmethod
+    def get_scenario_text(cls, name: str, file: Path, cache: Optional[Dict[Tuple[str, int, int], ScenarioIndex]] = None) -> str:
+        index = ScenarioIndex.get(file, cache)
+
+        try:
+            start, end = index.scenarios[name]
+        except KeyError:
+            raise ValueError(f'scenario "{name}" does not exist in {file.as_posix()}')
+
+        scenario_lines = index.lines[start:end]
 
         # remove any scenario text/comments
         if scenario_lines[0].strip() == '"""':
@@ -112,7 +299,7 @@ class ScenarioTag(StandaloneTag):
         if not feature_file.exists():
             feature_file = (self.environment.feature_file.parent / feature).resolve()
 
-        scenario_content = self.get_scenario_text(scenario, feature_file)
+        scenario_content = self.get_scenario_text(scenario, feature_file, getattr(self.environment, 'scenario_index', None))
 
         ignore_errors = getattr(self.environment, 'ignore_errors', False)
 
@@ -157,18 +344,17 @@ class ScenarioTag(StandaloneTag):
         if '{%' in scenario_content and '%}' in scenario_content:
             environment = self.environment.overlay()
             environment.feature_file = feature_file
-            template = environment.from_string(scenario_content)
+            template = compile_template(environment, scenario_content)
             scenario_content = template.render()
         # // -->
 
         return scenario_content
 
-    def filter_stream(self, stream: TokenStream) -> Union[TokenStream, Iterable[Token]]:  # type: ignore[return]
-        """Everything outside of `{% scenario ... %}` (and `{% if ... %}...{% endif %}`) should be treated as "data", e.g. plain text.
+    def filter_stream(self, stream: TokenStream) -> Union[TokenStream, Iterable[Token]]:
+        """Everything outside of `{% scenario ... %}` (and `{% if ... %}...{% endif %}`) should be treated as "data", e.g. plain text."""
+        return self.coalesce(self._filter_stream(stream))
 
-        Overloaded from `StandaloneTag`, must match method signature, which is not `Generator`, even though we yield
-        the result instead of returning.
-        """
+    def _filter_stream(self, stream: TokenStream) -> Iterator[Token]:
         in_scenario = False
         in_block_comment = False
         in_condition = False
@@ -178,22 +364,20 @@ class ScenarioTag(StandaloneTag):
         variable_end_pos = 0
         block_begin_pos = -1
         block_end_pos = 0
-        source_lines = self._source.splitlines()
 
         for token in stream:
             if token.type == 'block_begin':
                 if stream.current.value in self.tags:  # {% scenario ... %}
                     in_scenario = True
-                    current_line = source_lines[token.lineno - 1].lstrip()
-                    in_block_comment = current_line.startswith('#')
-                    block_begin_pos = self._source.index(token.value, block_begin_pos + 1)
+                    in_block_comment = self.get_line(token.lineno).lstrip().startswith('#')
+                    block_begin_pos = self.find(token.value, token.lineno, block_begin_pos + 1)
                 elif stream.current.value in ['if', 'endif']:  # {% if <condition> %}, {% endif %}
                     in_condition = True
 
             if in_scenario:
                 if token.type == 'block_end' and in_block_comment:
                     in_block_comment = False
-                    block_end_pos = self._source.index(token.value, block_begin_pos)
+                    block_end_pos = self.find(token.value, token.lineno, block_begin_pos)
                     token_value = self._source[block_begin_pos:block_end_pos + len(token.value)]
                     filtered_token = Token(token.lineno, 'data', token_value)
                 elif in_block_comment:
@@ -205,12 +389,12 @@ class ScenarioTag(StandaloneTag):
             else:
                 if token.type == 'variable_begin':
                     # Find variable start in the source
-                    variable_begin_pos = self._source.index(token.value, variable_begin_pos + 1)
+                    variable_begin_pos = self.find(token.value, token.lineno, variable_begin_pos + 1)
                     in_variable = True
                     continue
                 elif token.type == 'variable_end':
                     # Find variable end in the source
-                    variable_end_pos = self._source.index(token.value, variable_begin_pos)
+                    variable_end_pos = self.find(token.value, token.lineno, variable_begin_pos)
                     # Extract the variable definition substring and use as token value
                     token_value = self._source[variable_begin_pos:variable_end_pos + len(token.value)]
                     in_variable = False
@@ -231,15 +415,9 @@ class ScenarioTag(StandaloneTag):
                     in_condition = False
 
 
-class MergeYamlTag(StandaloneTag):  # pragma: no cover
+class MergeYamlTag(SourceTag):  # pragma: no cover
     tags: ClassVar[set[str]] = {'merge'}
 
-    def preprocess(
-        self, source: str, name: Optional[str], filename: Optional[str] = None,
-    ) -> str:
-        self._source = source
-        return cast(str, super().preprocess(source, name, filename))
-
     def render(self, filename: str, *filenames: str) -> str:
         buffer: list[str] = []
 
@@ -267,8 +445,11 @@ class MergeYamlTag(StandaloneTag):  # pragma: no cover
 
         return '\n'.join(buffer)
 
-    def filter_stream(self, stream: TokenStream) -> Union[TokenStream, Iterable[Token]]:  # type: ignore[return]
+    def filter_stream(self, stream: TokenStream) -> Union[TokenStream, Iterable[Token]]:
         """Everything outside of `{% merge ... %}` should be treated as "data", e.g. plain text."""
+        return self.coalesce(self._filter_stream(stream))
+
+    def _filter_stream(self, stream: TokenStream) -> Iterator[Token]:
         in_merge = False
         in_variable = False
         in_block_comment = False
@@ -277,25 +458,23 @@ class MergeYamlTag(StandaloneTag):  # pragma: no cover
         variable_end_pos = 0
         block_begin_pos = -1
         block_end_pos = 0
-        source_lines = self._source.splitlines()
 
         for token in stream:
             if token.type == 'block_begin' and stream.current.value in self.tags:
                 in_merge = True
-                current_line = source_lines[token.lineno - 1].lstrip()
-                in_block_comment = current_line.startswith('#')
-                block_begin_pos = self._source.index(token.value, block_begin_pos + 1)
+                in_block_comment = self.get_line(token.lineno).lstrip().startswith('#')
+                block_begin_pos = self.find(token.value, token.lineno, block_begin_pos + 1)
 
             if not in_merge:
                 if token.type == 'variable_end':
                     # Find variable end in the source
-                    variable_end_pos = self._source.index(token.value, variable_begin_pos)
+                    variable_end_pos = self.find(token.value, token.lineno, variable_begin_pos)
                     # Extract the variable definition substring and use as token value
                     token_value = self._source[variable_begin_pos:variable_end_pos + len(token.value)]
                     in_variable = False
                 elif token.type == 'variable_begin':
                     # Find variable start in the source
-                    variable_begin_pos = self._source.index(token.value, variable_begin_pos + 1)
+                    variable_begin_pos = self.find(token.value, token.lineno, variable_begin_pos + 1)
                     in_variable = True
                 else:
                     token_value = token.value
@@ -308,7 +487,7 @@ class MergeYamlTag(StandaloneTag):  # pragma: no cover
                 filtered_token = Token(token.lineno, 'data', token_value)
             elif token.type == 'block_end' and in_block_comment:
                 in_block_comment = False
-                block_end_pos = self._source.index(token.value, block_begin_pos)
+                block_end_pos = self.find(token.value, token.lineno, block_begin_pos)
                 token_value = self._source[block_begin_pos:block_end_pos + len(token.value)]
                 filtered_token = Token(token.lineno, 'data', token_value)
             elif in_block_comment:
@@ -322,7 +501,32 @@ class MergeYamlTag(StandaloneTag):  # pragma: no cover
                 in_merge = False
 
 
-def load_configuration(configuration_file: str) -> str:
+class IndentDumper(yaml.Dumper):
+    use_indent: ClassVar[int]
+
+    @classmethod
+    def use_indentation(cls, file: Path) -> type['IndentDumper']:
+        cls.use_indent = get_indentation(file)
+
+        return cls
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+
+        self.best_indent = self.use_indent
+
+    def increase_indent(self, flow: bool = False, indentless: bool = False) -> None:
+        return super().increase_indent(flow, False)
+
+
+@traced('load configuration')
+def load_configuration(configuration_file: str, output_dir: Optional[Path] = None) -> str:
+    """Load environment file, and write the resulting configuration to a lock file in `output_dir` (default is next to the environment file).
+
+    The lock file is readable by others, since the user in the containers is not necessarily the same as the user executing
+    grizzly-cli. If `output_dir` is specified, the returned path is absolute, so it can be rewritten to the path where the
+    execution context is mounted in the containers.
+    """
     file = Path(configuration_file)
 
     if not file.exists():
@@ -333,43 +537,86 @@ def load_configuration(configuration_file: str) -> str:
         logger.error('configuration file must have file extension yml or yaml')
         raise SystemExit(1)
 
-    configuration = load_configuration_file(file)
+    configuration = _load_configuration_layers(file)
 
-    load_from_keyvault = ((configuration or {}).get('configuration', None) or {}).get('keyvault', None)
+    load_from_keyvault = configuration.get('configuration', 'keyvault')
 
     if load_from_keyvault is not None:
-        environment = configuration.get('configuration', {}).get('env', file.stem)
-        configuration = merge_dicts(load_configuration_keyvault(url=load_from_keyvault, environment=environment), configuration)
-
-    environment_lock_file = file.parent / f'{file.stem}.lock{file.suffix}'
-
-    with environment_lock_file.open('w') as fd:
-        yaml.dump(configuration, fd, Dumper=IndentDumper.use_indentation(file), default_flow_style=False, sort_keys=False, allow_unicode=True)
+        environment = configuration.get('configuration', 'env', default=file.stem)
+        # values in the environment file takes precedence over values in the keyvault
+        configuration.prepend(load_configuration_keyvault(url=load_from_keyvault, environment=environment))
+
+    if output_dir is None:
+        environment_lock_file = Path(configuration_file.replace(file.name, f'{file.stem}.lock{file.suffix}'))
+    else:
+        environment_lock_file = output_dir.resolve() / f'{file.stem}.lock{file.suffix}'
+
+    write_file_atomic(
+        environment_lock_file,
+        yaml.dump(configuration.materialize(), Dumper=IndentDumper.use_indentation(file), default_flow_style=False, sort_keys=False, allow_unicode=True),
+        mode=0o644,
+    )
 
-    return configuration_file.replace(file.name, f'{file.stem}.lock{file.suffix}')
+    return environment_lock_file.as_posix()
 
 
+@traced('load configuration file')
 def load_configuration_file(file: Path) -> dict[str, Any]:
     """Load a grizzly environment file and flatten the structure."""
-    configuration: dict[str, Any] = {}
+    return _load_configuration_layers(file).materialize()
 
-    environment = Environment(autoescape=False, extensions=[MergeYamlTag])
+
+def _load_configuration_layers(file: Path) -> LayeredConfiguration:
+    environment = create_environment(MergeYamlTag)
     environment.extend(source_file=file)
     loader = yaml.SafeLoader
 
-    yaml_template = environment.from_string(file.read_text())
+    yaml_template = compile_template(environment, file.read_text())
     yaml_content = yaml_template.render()
 
     yaml_configurations = list(yaml.load_all(yaml_content, Loader=loader))
     yaml_configurations.reverse()
-    for yaml_configuration in yaml_configurations:
-        configuration = merge_dicts(configuration, yaml_configuration)
 
-    return configuration
+    # empty base layer, so that values in all documents are converted the same way
+    return LayeredConfiguration({}, *yaml_configurations)
+
+
+KEYVAULT_MAX_WORKERS = 10
+
+
+def _keyvault_cache_ttl() -> Optional[int]:
+    cache_ttl = os.environ.get('GRIZZLY_CLI_KEYVAULT_CACHE', None)
+
+    if not cache_ttl:
+        return None
+
+    try:
+        return int(cache_ttl)
+    except ValueError:
+        raise ValueError(f'GRIZZLY_CLI_KEYVAULT_CACHE should be number of seconds secrets are cached, not "{cache_ttl}"')
+
+
+def _keyvault_cache_file(url: str, environment: str) -> Path:
+    cache_dir = get_cache_dir('keyvault')
+    # cached values are secrets, only readable by the user
+    cache_dir.chmod(0o700)
 
+    key = sha256('\0'.join([url, environment]).encode('utf-8')).hexdigest()
 
-def load_configuration_keyvault(*, url: str, environment: str) -> dict[str, Any]:
-    """Load grizzly environment configuration from the specified keyvault."""
+    return cache_dir / f'{key}.json'
+
+
+@traced('load configuration keyvault')
+def load_configuration_keyvault(*, url: str, environment: str, client: Optional[SecretClient] = None) -> dict[str, Any]:
+    """Load grizzly environment configuration from the specified keyvault.
+
+    Secret values are retrieved concurrently. If environment variable `GRIZZLY_CLI_KEYVAULT_CACHE` is set to a number of
+    seconds, values are cached locally for that long, unless the secret has been updated in the keyvault.
+    """
+    # azure SDK takes a while to import, and is only needed when there is a keyvault to load configuration from
+    from azure.core.exceptions import ClientAuthenticationError, ServiceRequestError
+    from azure.identity import AzureCliCredential, ManagedIdentityCredential, ChainedTokenCredential
+    from azure.keyvault.secrets import SecretClient
 
     # disable azure.identity warning logs if authentication fails
     azure_logger = logging.getLogger('azure.identity')
@@ -377,14 +624,25 @@ def load_configuration_keyvault(*, url: str, environment: str) -> dict[str, Any]
 
     environment_filter = ['global', environment]
 
+    cache_ttl = _keyvault_cache_ttl()
+    cache_file: Optional[Path] = None
+    cache: dict[str, dict[str, Any]] = {}
+
+    if cache_ttl is not None:
+        cache_file = _keyvault_cache_file(url, environment)
+        with suppress(FileNotFoundError, ValueError):
+            cache = jsonloads(cache_file.read_text())
+
     try:
-        credential = ChainedTokenCredential(AzureCliCredential(), ManagedIdentityCredential())
-        client = SecretClient(vault_url=url, credential=credential)
+        if client is None:
+            credential = ChainedTokenCredential(AzureCliCredential(), ManagedIdentityCredential())
+            client = SecretClient(vault_url=url, credential=credential)
 
         secret_properties = client.list_properties_of_secrets()
 
         keys: dict[str, str] = {}
-        configuration: dict[str, Any] = {}
+        updated: dict[str, Optional[str]] = {}
+        configuration = LayeredConfiguration()
 
         # loop through all secrets to find the ones that we are interested in
         for secret_property in secret_properties:
@@ -399,14 +657,50 @@ def load_configuration_keyvault(*, url: str, environment: str) -> dict[str, Any]
                 continue
 
             keys.update({secret_property.name: name})
-
-        # get value for all secrets that we found
+            updated.update({secret_property.name: secret_property.updated_on.isoformat() if secret_property.updated_on is not None else None})
+
+        now = time()
+        values: dict[str, Optional[str]] = {}
+
+        # cached values are only valid if the secret has not been updated since it was cached
+        if cache_ttl is not None:
+            for secret_key in keys.keys():
+                cached = cache.get(secret_key, None)
+                if (
+                    cached is not None
+                    and updated[secret_key] is not None
+                    and cached.get('updated_on', None) == updated[secret_key]
+                    and now - cached.get('timestamp', 0) < cache_ttl
+                ):
+                    values.update({secret_key: cached['value']})
+
+        # get value for all secrets that we found, that was not cached
+        fetch_keys = [secret_key for secret_key in keys.keys() if secret_key not in values]
+
+        if len(fetch_keys) > 0:
+            with ThreadPoolExecutor(max_workers=min(len(fetch_keys), KEYVAULT_MAX_WORKERS)) as executor:
+                for secret_key, secret in zip(fetch_keys, executor.map(client.get_secret, fetch_keys)):
+                    values.update({secret_key: secret.value})
+
+        if cache_file is not None and len(fetch_keys) > 0:
+            # secrets that no longer exists in the keyvault are removed from the cache
+            cache = {
+                secret_key: {
+                    'updated_on': updated[secret_key],
+                    'value': values[secret_key],
+                    'timestamp': now if secret_key in fetch_keys else cache[secret_key]['timestamp'],
+                }
+                for secret_key in keys.keys()
+                if updated[secret_key] is not None
+            }
+            write_file_atomic(cache_file, jsondumps(cache), mode=0o600)
+
+        # merge in the same order as the secrets are listed, so the result does not depend on when values were retrieved,
+        # where the first listed secret takes precedence
         for secret_key, conf_key in keys.items():
-            secret = client.get_secret(secret_key)
-            conf = unflatten(conf_key, secret.value)
-            configuration = merge_dicts(conf, configuration)
+            configuration.prepend(unflatten(conf_key, values[secret_key]))
 
-        return {'configuration': configuration}
+        return {'configuration': configuration.materialize()}
     except ClientAuthenticationError:
         logger.error('authentication failed, run `az login [--identity]` first.')
         raise SystemExit(1)
@@ -415,146 +709,203 @@ def load_configuration_keyvault(*, url: str, environment: str) -> dict[str, Any]
         raise SystemExit(1)
 
 
-def create_parser(sub_parser: ArgumentSubParser, parent: str) -> None:
-    # grizzly-cli ... run ...
-    run_parser = sub_parser.add_parser('run', description='execute load test scenarios specified in a feature file.')
-    run_parser.add_argument(
-        '--verbose',
-        action='store_true',
-        required=False,
-        help=(
-            'changes the log level to `DEBUG`, regardless of what it says in the feature file. gives more verbose logging '
-            'that can be useful when troubleshooting a problem with a scenario.'
-        )
-    )
-    run_parser.add_argument(
-        '-T', '--testdata-variable',
-        action='append',
-        type=str,
-        required=False,
-        help=(
-            'specified in the format `<name>=<value>`. avoids being asked for an initial value for a scenario variable.'
-        )
-    )
-    run_parser.add_argument(
-        '-y', '--yes',
-        action='store_true',
-        default=False,
-        required=False,
-        help='answer yes on any questions that would require confirmation',
-    )
-    run_parser.add_argument(
-        '-e', '--environment-file',
-        type=BashCompletionTypes.File('*.yaml', '*.yml'),
-        required=False,
-        default=None,
-        help='configuration file with [environment specific information](/grizzly/framework/usage/variables/environment-configuration/)',
-    )
-    run_parser.add_argument(
-        '--csv-prefix',
-        nargs='?',
-        const=True,
-        default=None,
-        help='write log statistics to CSV files with specified prefix, if no value is specified the description of the gherkin Feature tag will be used, suffixed with timestamp',
-    )
-    run_parser.add_argument(
-        '--csv-interval',
-        type=int,
-        default=None,
-        required=False,
-        help='interval that statistics is collected for CSV files, can only be used in combination with `--csv-prefix`',
-    )
-    run_parser.add_argument(
-        '--csv-flush-interval',
-        type=int,
-        default=None,
-        required=False,
-        help='interval that CSV statistics is flushed to disk, can only be used in combination with `--csv-prefix`',
-    )
-    run_parser.add_argument(
-        '-l', '--log-file',
-        type=str,
-        default=None,
-        required=False,
-        help='save all `grizzly-cli` run output in specified log file',
-    )
-    run_parser.add_argument(
-        '--log-dir',
-        type=str,
-        default=None,
-        required=False,
-        help='log directory suffix (relative to `requests/logs`) to save log files generated in a scenario',
-    )
-    run_parser.add_argument(
-        '--dump',
-        nargs='?',
-        default=None,
-        const=True,
-        help=(
-            'Dump parsed contents of file, can be useful when including scenarios from other feature files. If no argument is specified it '
-            'will be dumped to stdout, the argument is treated as a filename'
-        ),
-    )
-    run_parser.add_argument(
-        '--dry-run',
-        action='store_true',
-        required=False,
-        help='Will setup and run anything up until when locust should start. Useful for debugging feature files when developing new tests',
-    )
-    run_parser.add_argument(
-        'file',
-        nargs='+',
-        type=BashCompletionTypes.File('*.feature'),
-        help='path to feature file with one or more scenarios',
+# max bytes of rendered feature files that are cached, least recently used are evicted first
+RENDER_CACHE_MAX_SIZE = 16 * 1024 * 1024
 
-    )
 
-    if run_parser.prog != f'grizzly-cli {parent} run':  # pragma: no cover
-        run_parser.prog = f'grizzly-cli {parent} run'
+def _file_digest(file: Path) -> str:
+    return sha256(file.read_bytes()).hexdigest()
 
 
-@requirements(grizzly_cli.EXECUTION_CONTEXT)
-def run(args: Arguments, run_func: Callable[[Arguments, Dict[str, Any], Dict[str, List[str]]], int]) -> int:
+@traced('render feature file')
+def render_feature_file(feature_file: Path, *, use_cache: bool = True) -> str:
+    """Render feature file, with all `{% scenario ... %}` tags included.
+
+    The result is cached on disk, keyed by path and content of the feature file, and the current working directory, since included
+    feature files are first looked up relative to it. A cached result is only used if all files included when it was rendered
+    still has the same content, in which case the template is neither compiled nor rendered. The cache is limited to
+    `RENDER_CACHE_MAX_SIZE` bytes.
+    """
+    source = FeatureDocument.load(feature_file.as_posix()).content
+    cache_file: Optional[Path] = None
+
+    if use_cache:
+        key = sha256('\0'.join([grizzly_cli.__version__, os.getcwd(), feature_file.resolve().as_posix(), source]).encode('utf-8')).hexdigest()
+        cache_file = get_cache_dir('render') / f'{key}.json'
+
+        with suppress(Exception):
+            cache_entry = jsonloads(cache_file.read_text())
+            dependencies = cast(Dict[str, str], cache_entry['dependencies'])
+
+            if all(_file_digest(Path(dependency)) == digest for dependency, digest in dependencies.items()):
+                # mark as recently used
+                with suppress(OSError):
+                    os.utime(cache_file)
+
+                return cast(str, cache_entry['content'])
+
+    environment = create_environment(ScenarioTag)
+
+    buffer: List[str] = []
+    remove_endif = False
+
+    # remove if-statements containing variables (`{$ .. $}`)
+    for line in source.splitlines():
+        stripped_line = line.strip()
+
+        if stripped_line[:2] == '{%' and stripped_line[-2:] == '%}':
+            if '{$' in stripped_line and '$}' in stripped_line and 'if' in stripped_line:
+                remove_endif = True
+                continue
+
+            if remove_endif and 'endif' in stripped_line:
+                remove_endif = False
+                continue
+
+        buffer.append(line)
+
+    template = compile_template(environment, '\n'.join(buffer))
+
+    # scenario index is shared with all overlay environments used when rendering nested scenario tags
+    scenario_index: Dict[Tuple[str, int, int], ScenarioIndex] = {}
+    environment.extend(feature_file=feature_file, ignore_errors=False, scenario_index=scenario_index)
+    feature_content = template.render()
+
+    if cache_file is not None:
+        # all files that has been indexed, has been included when rendering
+        dependencies = {Path(dependency).resolve().as_posix(): _file_digest(Path(dependency)) for dependency, _, _ in scenario_index.keys()}
+        write_file_atomic(cache_file, jsondumps({'dependencies': dependencies, 'content': feature_content}))
+        evict_least_recently_used(cache_file.parent.as_posix(), '*.json', RENDER_CACHE_MAX_SIZE)
+
+    return feature_content
+
+
+def _create_environ() -> Dict[str, Any]:
     # always set hostname of host where grizzly-cli was executed, could be useful
-    environ: Dict[str, Any] = {
+    return {
         'GRIZZLY_CLI_HOST': get_hostname(),
         'GRIZZLY_EXECUTION_CONTEXT': grizzly_cli.EXECUTION_CONTEXT,
         'GRIZZLY_MOUNT_CONTEXT': grizzly_cli.MOUNT_CONTEXT,
     }
 
-    environment = Environment(autoescape=False, extensions=[ScenarioTag])
-    feature_file = Path(args.file)
-    environment_lock_file: str | None = None
 
-    # during execution, create a temporary .lock.feature file that will be removed when done
-    original_feature_lines = feature_file.read_text().splitlines()
-    feature_lock_file = feature_file.parent / f'{feature_file.stem}.lock{feature_file.suffix}'
+def create_run_directory(feature_file: Path) -> Path:
+    """Create a directory, unique for this invocation, for files rendered during a run.
 
-    try:
-        buffer: List[str] = []
-        remove_endif = False
+    It is created in the same directory as the feature file, so it is available in the containers and behave will find the
+    same steps and environment as for the feature file. The returned path is relative if `feature_file` is.
 
-        # remove if-statements containing variables (`{$ .. $}`)
-        for line in original_feature_lines:
-            stripped_line = line.strip()
+    It is readable by others, since the user in the containers is not necessarily the same as the user executing grizzly-cli,
+    e.g. with rootless podman or an image built by another user.
+    """
+    run_directory = feature_file.parent / Path(mkdtemp(prefix='.grizzly-cli-run-', dir=feature_file.parent)).name
+    run_directory.chmod(0o755)
 
-            if stripped_line[:2] == '{%' and stripped_line[-2:] == '%}':
-                if '{$' in stripped_line and '$}' in stripped_line and 'if' in stripped_line:
-                    remove_endif = True
-                    continue
+    return run_directory
 
-                if remove_endif and 'endif' in stripped_line:
-                    remove_endif = False
-                    continue
 
-            buffer.append(line)
+def _get_feature_lock_file(feature_file: Path, run_directory: Path) -> Path:
+    return run_directory / f'{feature_file.stem}.lock{feature_file.suffix}'
 
-        original_feature_content = '\n'.join(buffer)
 
-        template = environment.from_string(original_feature_content)
-        environment.extend(feature_file=feature_file, ignore_errors=False)
-        feature_content = template.render()
-        feature_lock_file.write_text(feature_content)
+@traced('ask for variable values')
+def _ask_for_variable_values(args: Arguments, variables: List[str], environ: Dict[str, Any]) -> None:
+    questions = len(variables)
+    manual_input = False
+
+    if questions > 0 and not getattr(args, 'validate_config', False):
+        logger.info(f'feature file requires values for {questions} variables')
+
+        for variable in variables:
+            name = f'TESTDATA_VARIABLE_{variable}'
+            value = os.environ.get(name, '')
+            while len(value) < 1:
+                value = get_input(f'initial value for "{variable}": ')
+                manual_input = True
+
+            environ[name] = value
+
+        logger.info('the following values was provided:')
+        for key, value in environ.items():
+            if not key.startswith('TESTDATA_VARIABLE_'):
+                continue
+            logger.info(f'{key.replace("TESTDATA_VARIABLE_", "")} = {value}')
+
+        if manual_input:
+            ask_yes_no('continue?')
+
+
+def _show_notices(args: Arguments, notices: List[str]) -> None:
+    if len(notices) > 0:
+        if args.yes:
+            output_func = cast(Callable[[str], None], logger.info)
+        else:
+            output_func = ask_yes_no
+
+        for notice in notices:
+            output_func(notice)
+
+
+def _update_environ(args: Arguments, environ: Dict[str, Any]) -> None:
+    if args.dry_run:
+        environ.update({'GRIZZLY_DRY_RUN': 'true'})
+
+    if args.log_dir is not None:
+        environ.update({'GRIZZLY_LOG_DIR': args.log_dir})
+
+
+def _create_run_arguments(args: Arguments, description: Callable[[], Optional[str]]) -> Dict[str, List[str]]:
+    run_arguments: Dict[str, List[str]] = {
+        'master': [],
+        'worker': [],
+        'common': [],
+    }
+
+    if args.verbose:
+        run_arguments['common'] += ['--verbose', '--no-logcapture', '--no-capture', '--no-capture-stderr']
+
+    if args.csv_prefix is not None:
+        if args.csv_prefix is True:
+            feature_description = description()
+            if feature_description is None:
+                raise ValueError('feature file does not seem to have a `Feature:` description to use as --csv-prefix')
+
+            csv_prefix = feature_description.replace(' ', '_')
+            timestamp = datetime.now().astimezone().strftime('%Y%m%dT%H%M%S')
+            setattr(args, 'csv_prefix', f'{csv_prefix}_{timestamp}')
+
+        run_arguments['common'] += [f'-Dcsv-prefix="{args.csv_prefix}"']
+
+        if args.csv_interval is not None:
+            run_arguments['common'] += [f'-Dcsv-interval={args.csv_interval}']
+
+        if args.csv_flush_interval is not None:
+            run_arguments['common'] += [f'-Dcsv-flush-interval={args.csv_flush_interval}']
+
+    return run_arguments
+
+
+def _get_feature_description(file: str) -> Optional[str]:
+    return FeatureDocument.load(file).description
+
+
+@requirements(grizzly_cli.EXECUTION_CONTEXT)
+def run(args: Arguments, run_func: Callable[[Arguments, Dict[str, Any], Dict[str, List[str]]], int]) -> int:
+    if len(getattr(args, 'files', None) or []) > 1:
+        return run_features(args, run_func)
+
+    environ = _create_environ()
+
+    feature_file = Path(args.file)
+
+    # during execution, create a temporary .lock.feature file in a directory that will be removed when done
+    run_directory = create_run_directory(feature_file)
+    feature_lock_file = _get_feature_lock_file(feature_file, run_directory)
+
+    try:
+        feature_content = render_feature_file(feature_file, use_cache=getattr(args, 'render_cache', True))
+        write_file_atomic(feature_lock_file, feature_content)
+        FeatureDocument.create(feature_lock_file.as_posix(), feature_content)
 
         if args.dump:
             output: TextIO
@@ -570,85 +921,217 @@ def run(args: Arguments, run_func: Callable[[Arguments, Dict[str, Any], Dict[str
         args.file = feature_lock_file.as_posix()
 
         variables = find_variable_names_in_questions(args.file)
-        questions = len(variables)
-        manual_input = False
+        _ask_for_variable_values(args, variables, environ)
 
-        if questions > 0 and not getattr(args, 'validate_config', False):
-            logger.info(f'feature file requires values for {questions} variables')
+        notices = find_metadata_notices(args.file)
+        _show_notices(args, notices)
 
-            for variable in variables:
-                name = f'TESTDATA_VARIABLE_{variable}'
-                value = os.environ.get(name, '')
-                while len(value) < 1:
-                    value = get_input(f'initial value for "{variable}": ')
-                    manual_input = True
+        if args.environment_file is not None:
+            environment_file = os.path.realpath(args.environment_file)
+            environment_lock_file = load_configuration(environment_file, run_directory)
+            environ.update({'GRIZZLY_CONFIGURATION_FILE': environment_lock_file})
 
-                environ[name] = value
+        _update_environ(args, environ)
 
-            logger.info('the following values was provided:')
-            for key, value in environ.items():
-                if not key.startswith('TESTDATA_VARIABLE_'):
-                    continue
-                logger.info(f'{key.replace("TESTDATA_VARIABLE_", "")} = {value}')
+        if not getattr(args, 'validate_config', False):
+            with span('distribution of users'):
+                distribution_of_users_per_scenario(args, environ)
 
-            if manual_input:
-                ask_yes_no('continue?')
+        run_arguments = _create_run_arguments(args, lambda: _get_feature_description(args.file))
 
-        notices = find_metadata_notices(args.file)
+        with span('execute', file=feature_file.as_posix()):
+            return run_func(args, environ, run_arguments)
+    finally:
+        rmtree(run_directory, ignore_errors=True)
 
-        if len(notices) > 0:
-            if args.yes:
-                output_func = cast(Callable[[str], None], logger.info)
-            else:
-                output_func = ask_yes_no
 
-            for notice in notices:
-                output_func(notice)
+@dataclass
+class PreparedFeature:
+    file: str
+    lock_file: str
+    content: str
+    variables: List[str]
+    notices: List[str]
+    description: Optional[str]
 
-        if args.environment_file is not None:
-            environment_file = os.path.realpath(args.environment_file)
-            environment_lock_file = load_configuration(environment_file)
-            environ.update({'GRIZZLY_CONFIGURATION_FILE': environment_lock_file})
 
-        if args.dry_run:
-            environ.update({'GRIZZLY_DRY_RUN': 'true'})
+class LogBufferHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.buffer: List[str] = []
 
-        if args.log_dir is not None:
-            environ.update({'GRIZZLY_LOG_DIR': args.log_dir})
+    def emit(self, record: logging.LogRecord) -> None:
+        self.buffer.append(record.getMessage())
 
-        if not getattr(args, 'validate_config', False):
-            distribution_of_users_per_scenario(args, environ)
 
-        run_arguments: Dict[str, List[str]] = {
-            'master': [],
-            'worker': [],
-            'common': [],
-        }
+def initialize_pool_worker(level: int) -> None:
+    """Configure logging in a process pool worker, which does not inherit the configuration if it is spawned instead of forked."""
+    logger.setLevel(level)
+    logger.propagate = False
+
 
-        if args.verbose:
-            run_arguments['common'] += ['--verbose', '--no-logcapture', '--no-capture', '--no-capture-stderr']
+def prepare_feature_file(file: str, lock_file: str, *, use_cache: bool = True) -> PreparedFeature:
+    """Render feature file to a lock file, and find everything in it that is needed before it can be executed.
 
-        if args.csv_prefix is not None:
-            if args.csv_prefix is True:
-                parse_feature_file(args.file)
-                if grizzly_cli.FEATURE_DESCRIPTION is None:
-                    raise ValueError('feature file does not seem to have a `Feature:` description to use as --csv-prefix')
+    Executed in a process pool worker, which can be reused for more than one feature file.
+    """
+    content = render_feature_file(Path(file), use_cache=use_cache)
+    write_file_atomic(Path(lock_file), content)
+    document = FeatureDocument.create(lock_file, content)
 
-                csv_prefix = grizzly_cli.FEATURE_DESCRIPTION.replace(' ', '_')
-                timestamp = datetime.now().astimezone().strftime('%Y%m%dT%H%M%S')
-                setattr(args, 'csv_prefix', f'{csv_prefix}_{timestamp}')
+    return PreparedFeature(
+        file=file,
+        lock_file=lock_file,
+        content=content,
+        variables=document.variables,
+        notices=document.notices,
+        description=document.description,
+    )
 
-            run_arguments['common'] += [f'-Dcsv-prefix="{args.csv_prefix}"']
 
-            if args.csv_interval is not None:
-                run_arguments['common'] += [f'-Dcsv-interval={args.csv_interval}']
+def feature_distribution_of_users(args: Arguments, environ: Dict[str, Any]) -> Tuple[List[str], Optional[Dict[str, Any]], Optional[str]]:
+    """Calculate distribution of users per scenario for `args.file`, in a process pool worker.
 
-            if args.csv_flush_interval is not None:
-                run_arguments['common'] += [f'-Dcsv-flush-interval={args.csv_flush_interval}']
+    Returns what would have been logged, the plan, and the error message if the distribution is not valid.
+    """
+    handler = LogBufferHandler()
+    handlers = logger.handlers
+    logger.handlers = [handler]
 
-        return run_func(args, environ, run_arguments)
+    try:
+        plan = distribution_of_users_per_scenario(args, environ)
+        return handler.buffer, plan, None
+    except ValueError as e:
+        return handler.buffer, None, str(e)
     finally:
-        if environment_lock_file is not None:
-            Path(environment_lock_file).unlink(missing_ok=True)
+        logger.handlers = handlers
+
+
+def run_features(args: Arguments, run_func: Callable[[Arguments, Dict[str, Any], Dict[str, List[str]]], int]) -> int:
+    """Run more than one feature file.
+
+    Rendering, configuration, variable discovery and distribution of users are done for all feature files in parallel,
+    followed by one confirmation, before each feature file is executed, one after the other.
+    """
+    files = cast(List[str], args.files)
+    validate_config = getattr(args, 'validate_config', False)
+    use_cache = getattr(args, 'render_cache', True)
+    environ = _create_environ()
+    environment_lock_file: Optional[str] = None
+    prepared_features: List[PreparedFeature] = []
+    # one directory per feature file, since the same feature file can be executed more than once
+    run_directories: List[Path] = []
+
+    try:
+        for file in files:
+            run_directories.append(create_run_directory(Path(file)))
 
-        feature_lock_file.unlink(missing_ok=True)
+        with ProcessPoolExecutor(
+            max_workers=min(len(files) + 1, os.cpu_count() or 1),
+            initializer=initialize_pool_worker,
+            initargs=(logger.getEffectiveLevel(),),
+        ) as executor:
+            environment_future: Optional[Future[str]] = None
+
+            if args.environment_file is not None:
+                environment_future = executor.submit(load_configuration, os.path.realpath(args.environment_file), run_directories[0])
+
+            feature_futures = [
+                executor.submit(prepare_feature_file, file, _get_feature_lock_file(Path(file), run_directory).as_posix(), use_cache=use_cache)
+                for file, run_directory in zip(files, run_directories)
+            ]
+
+            futures: List[Future[Any]] = [*feature_futures]
+            if environment_future is not None:
+                futures.append(environment_future)
+
+            # wait for all, so that errors are reported in the order the files were specified
+            with span('prepare feature files', files=len(files)):
+                wait(futures)
+
+            for future in futures:
+                future.result()
+
+            if environment_future is not None:
+                environment_lock_file = environment_future.result()
+
+            prepared_features = [future.result() for future in feature_futures]
+
+            if args.dump:
+                for prepared_feature in prepared_features:
+                    print(prepared_feature.content)
+
+                return 0
+
+            variables = sorted({variable for prepared_feature in prepared_features for variable in prepared_feature.variables})
+            _ask_for_variable_values(args, variables, environ)
+
+            notices: List[str] = []
+            for prepared_feature in prepared_features:
+                notices += [notice for notice in prepared_feature.notices if notice not in notices]
+            _show_notices(args, notices)
+
+            if environment_lock_file is not None:
+                environ.update({'GRIZZLY_CONFIGURATION_FILE': environment_lock_file})
+
+            _update_environ(args, environ)
+
+            feature_args: List[Arguments] = []
+            for prepared_feature in prepared_features:
+                feature_arg = Arguments(**vars(args))
+                feature_arg.file = prepared_feature.lock_file
+                feature_arg.files = [prepared_feature.lock_file]
+                feature_args.append(feature_arg)
+
+            if not validate_config:
+                distribution_futures = [
+                    executor.submit(feature_distribution_of_users, Arguments(**{**vars(feature_arg), 'yes': True, 'plan_output': None}), environ)
+                    for feature_arg in feature_args
+                ]
+
+                with span('distribution of users', files=len(files)):
+                    wait(distribution_futures)
+
+                errors: List[str] = []
+                plans: List[Dict[str, Any]] = []
+                for prepared_feature, future in zip(prepared_features, distribution_futures):
+                    messages, plan, error = future.result()
+                    for message in messages:
+                        logger.info(message)
+
+                    if error is not None:
+                        errors.append(f'{prepared_feature.file}: {error}')
+                    elif plan is not None:
+                        plans.append({**plan, 'file': prepared_feature.file})
+
+                if len(errors) > 0:
+                    raise ValueError('\n'.join(errors))
+
+                plan_output = getattr(args, 'plan_output', None)
+                if plan_output is not None:
+                    write_plan(plan_output, plans)
+                    logger.info(f'plan written to {plan_output}\n')
+
+                if not args.yes:
+                    ask_yes_no('continue?')
+
+        rc = 0
+        for index, (prepared_feature, feature_arg) in enumerate(zip(prepared_features, feature_args), start=1):
+            logger.info(f'running feature file {prepared_feature.file} ({index}/{len(prepared_features)})')
+
+            description = prepared_feature.description
+            run_arguments = _create_run_arguments(feature_arg, lambda: description)
+
+            with span('execute', file=prepared_feature.file):
+                rc = run_func(feature_arg, environ.copy(), run_arguments)
+
+            if rc != 0:
+                not_executed = [not_executed_feature.file for not_executed_feature in prepared_features[index:]]
+                if len(not_executed) > 0:
+                    logger.error(f'!! {prepared_feature.file} failed with rc={rc}, will not run {", ".join(not_executed)}')
+                break
+
+        return rc
+    finally:
+        for run_directory in run_directories:
+            rmtree(run_directory, ignore_errors=True)
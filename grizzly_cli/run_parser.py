@@ -0,0 +1,118 @@
+from .argparse import ArgumentSubParser
+from .argparse.bashcompletion import BashCompletionTypes
+
+
+def create_parser(sub_parser: ArgumentSubParser, parent: str) -> None:
+    # grizzly-cli ... run ...
+    run_parser = sub_parser.add_parser('run', description='execute load test scenarios specified in a feature file.')
+    run_parser.add_argument(
+        '--verbose',
+        action='store_true',
+        required=False,
+        help=(
+            'changes the log level to `DEBUG`, regardless of what it says in the feature file. gives more verbose logging '
+            'that can be useful when troubleshooting a problem with a scenario.'
+        )
+    )
+    run_parser.add_argument(
+        '-T', '--testdata-variable',
+        action='append',
+        type=str,
+        required=False,
+        help=(
+            'specified in the format `<name>=<value>`. avoids being asked for an initial value for a scenario variable.'
+        )
+    )
+    run_parser.add_argument(
+        '-y', '--yes',
+        action='store_true',
+        default=False,
+        required=False,
+        help='answer yes on any questions that would require confirmation',
+    )
+    run_parser.add_argument(
+        '-e', '--environment-file',
+        type=BashCompletionTypes.File('*.yaml', '*.yml'),
+        required=False,
+        default=None,
+        help='configuration file with [environment specific information](/grizzly/framework/usage/variables/environment-configuration/)',
+    )
+    run_parser.add_argument(
+        '--csv-prefix',
+        nargs='?',
+        const=True,
+        default=None,
+        help='write log statistics to CSV files with specified prefix, if no value is specified the description of the gherkin Feature tag will be used, suffixed with timestamp',
+    )
+    run_parser.add_argument(
+        '--csv-interval',
+        type=int,
+        default=None,
+        required=False,
+        help='interval that statistics is collected for CSV files, can only be used in combination with `--csv-prefix`',
+    )
+    run_parser.add_argument(
+        '--csv-flush-interval',
+        type=int,
+        default=None,
+        required=False,
+        help='interval that CSV statistics is flushed to disk, can only be used in combination with `--csv-prefix`',
+    )
+    run_parser.add_argument(
+        '-l', '--log-file',
+        type=str,
+        default=None,
+        required=False,
+        help='save all `grizzly-cli` run output in specified log file',
+    )
+    run_parser.add_argument(
+        '--log-dir',
+        type=str,
+        default=None,
+        required=False,
+        help='log directory suffix (relative to `requests/logs`) to save log files generated in a scenario',
+    )
+    run_parser.add_argument(
+        '--dump',
+        nargs='?',
+        default=None,
+        const=True,
+        help=(
+            'Dump parsed contents of file, can be useful when including scenarios from other feature files. If no argument is specified it '
+            'will be dumped to stdout, the argument is treated as a filename'
+        ),
+    )
+    run_parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        required=False,
+        help='Will setup and run anything up until when locust should start. Useful for debugging feature files when developing new tests',
+    )
+    run_parser.add_argument(
+        '--plan-output',
+        type=str,
+        default=None,
+        required=False,
+        help=(
+            'write the distribution of users and iterations per scenario, and how they will be allocated on the workers, as JSON to '
+            'specified file, before asking to continue'
+        ),
+    )
+    run_parser.add_argument(
+        '--no-render-cache',
+        dest='render_cache',
+        action='store_false',
+        default=True,
+        required=False,
+        help='always render feature file, instead of using a cached result when neither the feature file nor any included feature files has changed',
+    )
+    run_parser.add_argument(
+        'file',
+        nargs='+',
+        type=BashCompletionTypes.File('*.feature'),
+        help='path to feature file with one or more scenarios, more than one feature file will be executed one after the other',
+
+    )
+
+    if run_parser.prog != f'grizzly-cli {parent} run':  # pragma: no cover
+        run_parser.prog = f'grizzly-cli {parent} run'
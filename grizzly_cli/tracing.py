@@ -0,0 +1,123 @@
+"""Lightweight tracing of where time is spent during a grizzly-cli execution.
+
+Spans are always recorded, since it is cheap. They can be written as a Chrome trace-event file (`--trace-file`), which can
+be opened in `chrome://tracing` or https://ui.perfetto.dev, or printed as a summary table (`--timings`).
+"""
+from __future__ import annotations
+
+import os
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, cast
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from json import dumps as jsondumps
+from pathlib import Path
+from threading import Lock, get_ident
+from time import perf_counter
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    thread_id: int
+    duration: Optional[float] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class Tracer:
+    origin: float
+    spans: List[Span]
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.origin = perf_counter()
+            self.spans = []
+
+    @contextmanager
+    def span(self, name: str, category: str = 'grizzly-cli', **args: Any) -> Iterator[Span]:
+        """Record how long the body of the `with` statement takes, as `name`. `args` are included in the trace-event file."""
+        span = Span(name=name, category=category, start=perf_counter(), thread_id=get_ident(), args=args)
+
+        with self._lock:
+            self.spans.append(span)
+
+        try:
+            yield span
+        finally:
+            span.duration = perf_counter() - span.start
+
+    def traced(self, name: str, category: str = 'grizzly-cli') -> Callable[[F], F]:
+        """Record how long each call to the decorated function takes, as `name`."""
+        def wrapper(func: F) -> F:
+            @wraps(func)
+            def wrapped(*args: Any, **kwargs: Any) -> Any:
+                with self.span(name, category):
+                    return func(*args, **kwargs)
+
+            return cast(F, wrapped)
+
+        return wrapper
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Finished spans as Chrome trace-event format "complete" events, timestamps are in microseconds since the tracer was (re)set."""
+        pid = os.getpid()
+
+        with self._lock:
+            spans = [span for span in self.spans if span.duration is not None]
+
+        return {
+            'displayTimeUnit': 'ms',
+            'traceEvents': [
+                {
+                    'name': span.name,
+                    'cat': span.category,
+                    'ph': 'X',
+                    'ts': round((span.start - self.origin) * 1_000_000, 3),
+                    'dur': round(cast(float, span.duration) * 1_000_000, 3),
+                    'pid': pid,
+                    'tid': span.thread_id,
+                    'args': {key: str(value) for key, value in span.args.items()},
+                }
+                for span in spans
+            ],
+        }
+
+    def write_chrome_trace(self, file: str) -> None:
+        Path(file).write_text(jsondumps(self.chrome_trace()))
+
+    def summary(self) -> str:
+        """Table with number of calls, total and max duration of each finished span name, in the order they were first started."""
+        phases: Dict[str, Tuple[int, float, float]] = {}
+
+        with self._lock:
+            spans = [span for span in self.spans if span.duration is not None]
+
+        for span in spans:
+            count, total, longest = phases.get(span.name, (0, 0.0, 0.0))
+            duration = cast(float, span.duration)
+            phases[span.name] = (count + 1, total + duration, max(longest, duration))
+
+        width = max([len(name) for name in phases.keys()] + [5])
+        lines = [f'{"phase":<{width}}  {"count":>5}  {"total ms":>10}  {"max ms":>10}']
+        lines.append('-' * len(lines[0]))
+
+        for name, (count, total, longest) in phases.items():
+            lines.append(f'{name:<{width}}  {count:>5}  {total * 1000:>10.1f}  {longest * 1000:>10.1f}')
+
+        return '\n'.join(lines)
+
+
+tracer = Tracer()
+
+span = tracer.span
+
+traced = tracer.traced
@@ -8,35 +8,42 @@ import logging
 import logging.config
 import stat
 import os
+import selectors
 
-from typing import Optional, List, Set, Union, Dict, Any, Tuple, Callable, Type, ClassVar, cast
+from typing import TYPE_CHECKING, ClassVar, Optional, List, Set, Union, Dict, Any, Tuple, Callable, Type, Deque, IO, Iterator, Pattern, Sequence, cast
 from types import TracebackType, FrameType
 from os import path, environ
 from shutil import which, rmtree
-from behave.parser import parse_file as feature_file_parser
+from threading import Event, Thread
 from argparse import Namespace as Arguments
-from json import loads as jsonloads
-from functools import wraps
-from packaging import version as versioning
-from tempfile import mkdtemp
-from hashlib import sha1
-from math import ceil
+from json import loads as jsonloads, dumps as jsondumps
+from functools import wraps, lru_cache
+from hashlib import sha1, sha256
+from math import lcm
+from fractions import Fraction
 from datetime import datetime, timezone
+from time import time, perf_counter
 from dataclasses import dataclass, field
 from pathlib import Path
 from copy import deepcopy
 from collections.abc import Mapping
+from collections import deque
+from io import BufferedReader
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
 
-import requests
-import tomli
-
-from behave.model import Scenario
-from jinja2 import Template
 from progress.spinner import Spinner
-from yaml import Dumper
 
 import grizzly_cli
 
+from .tracing import span
+
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+    from jinja2 import Template
+
+    from behave.model import Scenario
+
 
 logger = logging.getLogger('grizzly-cli')
 
@@ -72,7 +79,110 @@ class RunCommandResult:
     output: Optional[List[bytes]] = field(init=False, default=None)
 
 
+# max bytes read from the output of a command at the time
+RUN_COMMAND_CHUNK_SIZE = 64 * 1024
+
+# max number of lines kept in `RunCommandResult.output` for a silent command
+RUN_COMMAND_OUTPUT_LINES = 10000
+
+
+class ProgressSpinner(Spinner):
+    """Spinner that is redrawn by a timer thread, at most every `interval` seconds, regardless of how much output a command has,
+    showing elapsed time and number of bytes received."""
+
+    interval: float = 0.1
+    received: int
+
+    _stop_event: Event
+    _thread: Optional[Thread]
+
+    def __init__(self, message: str = '', **kwargs: Any) -> None:
+        self.received = 0
+        self._stop_event = Event()
+        self._thread = None
+
+        super().__init__(f'{message} %(elapsed_td)s, %(received_size)s ', **kwargs)
+
+    @property
+    def received_size(self) -> str:
+        size = float(self.received)
+        for unit in ['B', 'KB', 'MB']:
+            if size < 1024:
+                return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+
+            size /= 1024
+
+        return f'{size:.1f} GB'
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.next()
+
+    def start(self) -> None:
+        self.update()
+        self._thread = Thread(target=self._run, name='grizzly-cli-spinner', daemon=True)
+        self._thread.start()
+
+    def finish(self) -> None:
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+        # last redraw, so final elapsed time and bytes received are shown
+        self.update()
+        super().finish()
+
+
+def _read_output(process: subprocess.Popen, stdout: IO[bytes]) -> Iterator[bytes]:
+    """Read output of a process in chunks, as soon as it is available, until it has been closed or the process has exited."""
+    if sys.platform == 'win32':  # pragma: no cover
+        # select does not work with pipes on windows, read1 returns what is available, but blocks until there is something
+        while True:
+            chunk = cast(BufferedReader, stdout).read1(RUN_COMMAND_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            yield chunk
+
+        return
+
+    fd = stdout.fileno()
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+
+        while True:
+            if len(selector.select(timeout=0.1)) > 0:
+                chunk = os.read(fd, RUN_COMMAND_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                yield chunk
+            elif process.poll() is not None:
+                # process has exited, but something else is keeping the pipe open, read what it wrote before exiting
+                while len(selector.select(timeout=0)) > 0:
+                    chunk = os.read(fd, RUN_COMMAND_CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    yield chunk
+
+                break
+
+
 def run_command(command: List[str], env: Optional[Dict[str, str]] = None, *, silent: bool = False, verbose: bool = False, spinner: Optional[str] = None) -> RunCommandResult:
+    """Run command, and log the output of it, unless `silent`, where only the last `RUN_COMMAND_OUTPUT_LINES` lines are kept in
+    the returned result.
+
+    Output is read in chunks and logged in batches, to keep up with chatty commands.
+    """
+    # only the executable, arguments can contain secrets
+    with span('run_command', command=os.path.basename(command[0])):
+        return _run_command(command, env, silent=silent, verbose=verbose, spinner=spinner)
+
+
+def _run_command(command: List[str], env: Optional[Dict[str, str]], *, silent: bool, verbose: bool, spinner: Optional[str]) -> RunCommandResult:
     if env is None:
         env = environ.copy()
 
@@ -88,43 +198,62 @@ def run_command(command: List[str], env: Optional[Dict[str, str]] = None, *, sil
 
     result = RunCommandResult(return_code=-1)
 
-    if silent:
-        result.output = []
+    output_buffer: Optional[Deque[bytes]] = None
 
-    _spinner: Optional[Spinner] = None
+    if silent:
+        output_buffer = deque(maxlen=RUN_COMMAND_OUTPUT_LINES)
 
-    if spinner is not None:  # pragma: no cover
-        _spinner = Spinner(f'{spinner} ')
+    _spinner: Optional[ProgressSpinner] = None
 
     def sig_handler(signum: int, frame: Optional[FrameType] = None) -> None:  # pragma: no cover
         if result.abort_timestamp is None:
             result.abort_timestamp = datetime.now(timezone.utc)
             process.terminate()
 
+    def handle_lines(lines: List[bytes], newline: bool = True) -> None:
+        if output_buffer is not None:
+            if newline:
+                output_buffer.extend(line + b'\n' for line in lines)
+            else:
+                output_buffer.extend(lines)
+        elif spinner is None:
+            # one log record per batch, instead of one per line
+            logger.info('\n'.join(line.decode(errors='replace').rstrip() for line in lines))
+
     with SignalHandler(sig_handler, psignal.SIGINT, psignal.SIGTERM):
         try:
-            while process.poll() is None:
-                stdout = process.stdout
-                if stdout is None:
-                    break
+            stdout = process.stdout
 
-                if _spinner is not None:  # pragma: no cover
-                    _spinner.next()
+            if spinner is not None:
+                # spinner is redrawn by its own thread, independent of how often there is output
+                _spinner = ProgressSpinner(spinner)
+                _spinner.start()
 
-                output = stdout.readline()
-                if not output:
-                    break
+            if process.poll() is None and stdout is not None:
+                partial_line = b''
 
-                if result.output is None:
-                    if spinner is None:
-                        logger.info(output.decode().rstrip())
-                else:
-                    result.output.append(output)
+                for chunk in _read_output(process, stdout):
+                    if _spinner is not None:
+                        _spinner.received += len(chunk)
+
+                    lines = (partial_line + chunk).split(b'\n')
+
+                    # last line is not complete, wait for the rest of it in next chunk
+                    partial_line = lines.pop()
+
+                    if len(lines) > 0:
+                        handle_lines(lines)
+
+                if len(partial_line) > 0:
+                    handle_lines([partial_line], newline=False)
 
             process.terminate()
         except KeyboardInterrupt:
             pass
         finally:
+            if _spinner is not None:
+                _spinner.finish()
+
             try:
                 process.kill()
             except Exception:
@@ -132,14 +261,145 @@ def run_command(command: List[str], env: Optional[Dict[str, str]] = None, *, sil
 
     process.wait()
 
-    if spinner is not None:  # pragma: no cover
-        logger.info('')
+    if output_buffer is not None:
+        result.output = list(output_buffer)
 
     result.return_code = process.returncode
 
     return result
 
 
+def run_commands(commands: Dict[str, List[str]], env: Optional[Dict[str, str]] = None, *, verbose: bool = False) -> Dict[str, RunCommandResult]:
+    """Run commands in parallel, and log the output of all of them, where each line is prefixed with the name of the command.
+
+    The first command is the main command, when it exits all other commands that are still running are terminated. All commands are
+    terminated on SIGINT and SIGTERM.
+    """
+    with span('run_commands', commands=len(commands)):
+        return _run_commands(commands, env, verbose=verbose)
+
+
+def _run_commands(commands: Dict[str, List[str]], env: Optional[Dict[str, str]], *, verbose: bool) -> Dict[str, RunCommandResult]:
+    if len(commands) < 1:
+        return {}
+
+    if env is None:
+        env = environ.copy()
+
+    width = max([len(name) for name in commands.keys()])
+    processes: Dict[str, subprocess.Popen] = {}
+    results: Dict[str, RunCommandResult] = {}
+
+    def terminate() -> None:
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+
+    def sig_handler(signum: int, frame: Optional[FrameType] = None) -> None:  # pragma: no cover
+        abort_timestamp = datetime.now(timezone.utc)
+
+        for result in results.values():
+            if result.abort_timestamp is None:
+                result.abort_timestamp = abort_timestamp
+
+        terminate()
+
+    def log_output(name: str, process: subprocess.Popen, stdout: IO[bytes]) -> None:
+        prefix = f'{name:<{width}} | '
+        partial_line = b''
+
+        for chunk in _read_output(process, stdout):
+            lines = (partial_line + chunk).split(b'\n')
+
+            # last line is not complete, wait for the rest of it in next chunk
+            partial_line = lines.pop()
+
+            if len(lines) > 0:
+                # one log record per batch, so lines from different commands are not mixed within a batch
+                logger.info('\n'.join(f'{prefix}{line.decode(errors="replace").rstrip()}' for line in lines))
+
+        if len(partial_line) > 0:
+            logger.info(f'{prefix}{partial_line.decode(errors="replace").rstrip()}')
+
+    threads: List[Thread] = []
+
+    with SignalHandler(sig_handler, psignal.SIGINT, psignal.SIGTERM):
+        try:
+            for name, command in commands.items():
+                if verbose:
+                    logger.info(f'run_commands: {name}: {" ".join(command)}')
+
+                process = subprocess.Popen(
+                    command,
+                    env=env,
+                    stderr=subprocess.STDOUT,
+                    stdout=subprocess.PIPE,
+                )
+                processes.update({name: process})
+                results.update({name: RunCommandResult(return_code=-1)})
+
+                if process.stdout is not None:
+                    thread = Thread(target=log_output, args=(name, process, process.stdout), name=f'grizzly-cli-output-{name}', daemon=True)
+                    thread.start()
+                    threads.append(thread)
+
+            # main command decides when everything is done
+            next(iter(processes.values())).wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            terminate()
+
+            for process in processes.values():
+                process.wait()
+
+            for thread in threads:
+                thread.join()
+
+    for name, process in processes.items():
+        results[name].return_code = process.returncode
+
+    return results
+
+
+def get_cache_dir(*parts: str) -> Path:
+    """Get (and create) a directory in the grizzly-cli user cache.
+
+    Location is `GRIZZLY_CLI_CACHE_DIR` if set, otherwise `grizzly-cli` in `XDG_CACHE_HOME` (default `~/.cache`).
+    """
+    cache_dir = environ.get('GRIZZLY_CLI_CACHE_DIR', None)
+
+    if cache_dir is not None:
+        cache_root = Path(cache_dir)
+    else:
+        xdg_cache_home = environ.get('XDG_CACHE_HOME', None)
+        cache_root = (Path(xdg_cache_home) if xdg_cache_home else Path.home() / '.cache') / 'grizzly-cli'
+
+    cache_path = cache_root.joinpath(*parts)
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    return cache_path
+
+
+def write_file_atomic(file: Path, content: str, mode: int = 0o666) -> None:
+    """Write content to a temporary file next to `file`, which then replaces `file`, so it is never read while partially written.
+
+    `mode` is the permissions of the file, before umask is applied.
+    """
+    file_tmp = file.with_name(f'.{file.name}.{os.getpid()}.tmp')
+
+    try:
+        # permissions are only set when the file is created
+        file_tmp.unlink(missing_ok=True)
+        with open(os.open(file_tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode), 'w') as fd:
+            fd.write(content)
+
+        os.replace(file_tmp, file)
+    except:
+        file_tmp.unlink(missing_ok=True)
+        raise
+
+
 def get_docker_compose_version() -> Tuple[int, int, int]:  # pragma: no cover
     output = subprocess.getoutput('docker compose version')
 
@@ -190,7 +450,244 @@ def rm_rf(path: Union[str, Path], *, missing_ok: bool = False) -> None:
             raise
 
 
-def get_dependency_versions(local_install: Union[bool, str]) -> Tuple[Tuple[Optional[str], Optional[List[str]]], Optional[str]]:
+# seconds a cached pypi response is used without asking pypi if it has changed
+PYPI_CACHE_TTL = 600
+
+_pypi_session: Optional[requests.Session] = None
+
+
+@dataclass
+class PyPiResponse:
+    url: str
+    status_code: int
+    text: str
+
+
+def _get_pypi_session() -> requests.Session:
+    global _pypi_session
+
+    import requests
+
+    # one session, so that connections are reused for all requests
+    if _pypi_session is None:
+        _pypi_session = requests.Session()
+
+    return _pypi_session
+
+
+def get_pypi(url: str, *, offline: bool = False) -> PyPiResponse:
+    """Get a pypi JSON API response, which is cached on disk.
+
+    A cached response is used as is for `GRIZZLY_CLI_PYPI_CACHE_TTL` seconds (default 600), after that pypi is asked if it has
+    changed (ETag). With `offline` only cached responses are used, regardless of age, and status code is 504 if there is none.
+    """
+    import requests
+
+    cache_ttl_value = environ.get('GRIZZLY_CLI_PYPI_CACHE_TTL', None)
+
+    try:
+        cache_ttl = int(cache_ttl_value) if cache_ttl_value else PYPI_CACHE_TTL
+    except ValueError:
+        raise ValueError(f'GRIZZLY_CLI_PYPI_CACHE_TTL should be number of seconds pypi responses are cached, not "{cache_ttl_value}"')
+
+    cache_file = get_cache_dir('pypi') / f'{sha256(url.encode("utf-8")).hexdigest()}.json'
+    cached: Optional[Dict[str, Any]] = None
+
+    try:
+        cached = jsonloads(cache_file.read_text())
+    except (FileNotFoundError, ValueError):
+        pass
+
+    now = time()
+
+    if cached is not None and (offline or now - cached['timestamp'] < cache_ttl):
+        return PyPiResponse(url=url, status_code=200, text=cached['text'])
+
+    if offline:
+        # same as a HTTP cache would respond to a `only-if-cached` request that is not cached
+        return PyPiResponse(url=url, status_code=504, text='')
+
+    headers: Dict[str, str] = {}
+    if cached is not None and cached.get('etag', None) is not None:
+        headers.update({'If-None-Match': cached['etag']})
+
+    try:
+        response = _get_pypi_session().get(url, headers=headers)
+    except requests.exceptions.ConnectionError:
+        # pypi is not reachable, better with a stale response than none
+        if cached is not None:
+            return PyPiResponse(url=url, status_code=200, text=cached['text'])
+
+        raise
+
+    if response.status_code == 304 and cached is not None:
+        cached.update({'timestamp': now})
+    elif response.status_code == 200:
+        cached = {'etag': response.headers.get('ETag', None), 'timestamp': now, 'text': response.text}
+    else:
+        return PyPiResponse(url=response.url, status_code=response.status_code, text=response.text)
+
+    write_file_atomic(cache_file, jsondumps(cached))
+
+    return PyPiResponse(url=url, status_code=200, text=cached['text'])
+
+
+def get_git_mirror(url: str, *, offline: bool = False) -> Optional[Path]:
+    """Get a bare mirror of git repository `url` from the grizzly-cli user cache.
+
+    The mirror is cloned the first time it is used, and updated with `git fetch` after that. With `offline` an existing
+    mirror is used as is, and `None` is returned if there is none.
+    """
+    mirror = get_cache_dir('git') / f'{sha1(url.encode("utf-8")).hexdigest()}.git'
+
+    if mirror.exists():
+        if not offline:
+            try:
+                subprocess.check_call(
+                    ['git', 'fetch', '-q', '--prune', 'origin'],
+                    cwd=mirror,
+                    shell=False,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            except subprocess.CalledProcessError:
+                # repo is not reachable, better with a stale mirror than none
+                pass
+
+        return mirror
+
+    if offline:
+        print(f'!! git repo {url} has not been cached by previous executions', file=sys.stderr)
+        return None
+
+    # clone next to the mirror, so a partial clone is never used
+    mirror_tmp = mirror.with_name(f'.{mirror.name}.{os.getpid()}.tmp')
+
+    try:
+        subprocess.check_call(
+            [
+                'git', 'clone', '--mirror', '--filter=blob:none', '-q',
+                url,
+                str(mirror_tmp),
+            ],
+            shell=False,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except subprocess.CalledProcessError:
+        rm_rf(mirror_tmp, missing_ok=True)
+        print(f'!! unable to clone git repo {url}', file=sys.stderr)
+        return None
+
+    try:
+        mirror_tmp.rename(mirror)
+    except OSError:  # pragma: no cover
+        # cloned by another execution at the same time
+        rm_rf(mirror_tmp)
+
+    return mirror
+
+
+def _git_env(offline: bool) -> Optional[Dict[str, str]]:
+    # the mirror is a partial clone, without file contents, which are fetched when needed, unless offline
+    if not offline:
+        return None
+
+    return {**os.environ, 'GIT_NO_LAZY_FETCH': '1'}
+
+
+def git_show(repo: Path, revision: str, file: str, *, offline: bool = False) -> Optional[str]:
+    """Get the content of `file` in `revision` of git repository `repo`, without checking it out. `None` if it does not exist.
+
+    With `offline` nothing is fetched, and `RuntimeError` is raised if the content of `file` has not been fetched by a previous
+    execution.
+    """
+    try:
+        # only needs the trees, which are always in the mirror
+        subprocess.check_call(
+            ['git', 'rev-parse', '--verify', '-q', f'{revision}:{file}'],
+            cwd=repo,
+            shell=False,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except subprocess.CalledProcessError:
+        return None
+
+    try:
+        return subprocess.check_output(
+            ['git', 'show', f'{revision}:{file}'],
+            cwd=repo,
+            env=_git_env(offline),
+            shell=False,
+            universal_newlines=True,
+            stderr=subprocess.PIPE,
+        )
+    except subprocess.CalledProcessError as e:
+        error = (e.stderr or '').strip()
+        reason = error.splitlines()[-1] if len(error) > 0 else f'exit code {e.returncode}'
+        print(f'!! unable to get {file} in {revision}: {reason}', file=sys.stderr)
+        raise RuntimeError()  # abort
+
+
+def setuptools_scm_version(repo: Path, revision: str, url: str, *, offline: bool = False) -> str:
+    """Version of `revision` in git repository `repo`, according to setuptools_scm and the configuration of the project, in a
+    temporary checkout of the revision."""
+    from tempfile import mkdtemp
+
+    try:
+        import setuptools_scm  # pylint: disable=unused-import  # noqa: F401  # type: ignore
+    except ModuleNotFoundError:  # pragma: no cover
+        subprocess.check_call([
+            sys.executable,
+            '-m',
+            'pip',
+            'install',
+            'setuptools_scm',
+        ])
+
+    tmp_workspace = Path(mkdtemp(prefix='grizzly-cli-'))
+    worktree = tmp_workspace / 'grizzly'
+
+    try:
+        try:
+            subprocess.check_call(
+                ['git', 'worktree', 'add', '-q', '--detach', str(worktree), revision],
+                cwd=repo,
+                env=_git_env(offline),
+                shell=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except subprocess.CalledProcessError:
+            print(f'!! unable to checkout {revision} from git repo {url}', file=sys.stderr)
+            raise RuntimeError()  # abort
+
+        try:
+            return subprocess.check_output(
+                [
+                    sys.executable,
+                    '-m',
+                    'setuptools_scm',
+                ],
+                shell=False,
+                universal_newlines=True,
+                cwd=worktree,
+                stderr=subprocess.DEVNULL,
+            ).strip()
+        except subprocess.CalledProcessError:
+            print(f'!! unable to get setuptools_scm version from {url}', file=sys.stderr)
+            raise RuntimeError()  # abort
+    finally:
+        rm_rf(tmp_workspace, missing_ok=True)
+        subprocess.call(['git', 'worktree', 'prune'], cwd=repo, shell=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def get_dependency_versions(local_install: Union[bool, str], *, offline: bool = False) -> Tuple[Tuple[Optional[str], Optional[List[str]]], Optional[str]]:
+    import tomli
+
+    from packaging import version as versioning
+
     grizzly_requirement: Optional[str] = None
     grizzly_requirement_egg: str
     locust_version: Optional[str] = None
@@ -235,114 +732,31 @@ def get_dependency_versions(local_install: Union[bool, str]) -> Tuple[Tuple[Opti
 
         url, branch = url.rsplit('@', 1)
         url = url[4:]  # remove git+
-        suffix = sha1(grizzly_requirement.encode('utf-8')).hexdigest()
-
-        # extras_requirement normalization
-        egg = grizzly_requirement_egg.replace('[', '__').replace(']', '__').replace(',', '_')
-
-        tmp_workspace = mkdtemp(prefix='grizzly-cli-')
-        repo_destination = path.join(tmp_workspace, f'{egg}_{suffix}')
 
         try:
-            rc = subprocess.check_call(
-                [
-                    'git', 'clone', '--filter=blob:none', '-q',
-                    url,
-                    repo_destination
-                ],
-                shell=False,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
+            mirror = get_git_mirror(url, offline=offline)
 
-            if rc != 0:
-                print(f'!! unable to clone git repo {url}', file=sys.stderr)
+            if mirror is None:
                 raise RuntimeError()  # abort
 
-            active_branch = branch
-
             try:
-                active_branch = subprocess.check_output(
-                    ['git', 'rev-parse', '--abbrev-ref', 'HEAD'],
-                    cwd=repo_destination,
+                revision = subprocess.check_output(
+                    ['git', 'rev-parse', '--verify', '-q', f'{branch}^{{commit}}'],
+                    cwd=mirror,
                     shell=False,
                     universal_newlines=True,
+                    stderr=subprocess.DEVNULL,
                 ).strip()
-                rc = 0
-            except subprocess.CalledProcessError as cpe:
-                rc = cpe.returncode
-
-            if rc != 0:
-                print(f'!! unable to check branch name of HEAD in git repo {url}', file=sys.stderr)
+            except subprocess.CalledProcessError:
+                print(f'!! unable to find {branch} in git repo {url}', file=sys.stderr)
                 raise RuntimeError()  # abort
 
-            if active_branch != branch:
-                try:
-                    git_object_type = subprocess.check_output(
-                        ['git', 'cat-file', '-t', branch],
-                        cwd=repo_destination,
-                        shell=False,
-                        universal_newlines=True,
-                        stderr=subprocess.STDOUT,
-                    ).strip()
-                except subprocess.CalledProcessError as cpe:  # pragma: no cover
-                    if 'Not a valid object name' in cpe.output:
-                        git_object_type = 'branch'  # assume remote branch
-                    else:
-                        print(f'!! unable to determine git object type for {branch}')
-                        raise RuntimeError()
-
-                if git_object_type == 'tag':  # pragma: no cover
-                    rc += subprocess.check_call(
-                        [
-                            'git', 'checkout',
-                            f'tags/{branch}',
-                            '-b', branch,
-                        ],
-                        cwd=repo_destination,
-                        shell=False,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                    )
-
-                    if rc != 0:  # pragma: no cover
-                        print(f'!! unable to checkout tag {branch} from git repo {url}', file=sys.stderr)
-                        raise RuntimeError()  # abort
-                elif git_object_type == 'commit':
-                    rc += subprocess.check_call(
-                        [
-                            'git', 'checkout',
-                            branch,
-                        ],
-                        cwd=repo_destination,
-                        shell=False,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                    )
-
-                    if rc != 0:  # pragma: no cover
-                        print(f'!! unable to checkout commit {branch} from git repo {url}', file=sys.stderr)
-                        raise RuntimeError()  # abort
-                else:
-                    rc += subprocess.check_call(
-                        [
-                            'git', 'checkout',
-                            '-b', branch,
-                            '--track', f'origin/{branch}',
-                        ],
-                        cwd=repo_destination,
-                        shell=False,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                    )
-
-                    if rc != 0:
-                        print(f'!! unable to checkout branch {branch} from git repo {url}', file=sys.stderr)
-                        raise RuntimeError()  # abort
+            pyproject = git_show(mirror, revision, 'pyproject.toml', offline=offline)
 
-            if not path.exists(path.join(repo_destination, 'pyproject.toml')):
-                with open(path.join(repo_destination, 'grizzly', '__init__.py'), encoding='utf-8') as fd:
-                    version_raw = [line.strip() for line in fd.readlines() if line.strip().startswith('__version__ =')]
+            if pyproject is None:
+                version_raw = [
+                    line.strip() for line in (git_show(mirror, revision, 'grizzly/__init__.py', offline=offline) or '').splitlines() if line.strip().startswith('__version__ =')
+                ]
 
                 if len(version_raw) != 1:
                     print(f'!! unable to find "__version__" declaration in grizzly/__init__.py from {url}', file=sys.stderr)
@@ -350,48 +764,26 @@ def get_dependency_versions(local_install: Union[bool, str]) -> Tuple[Tuple[Opti
 
                 _, grizzly_version, _ = version_raw[-1].split("'")
             else:
-                try:
-                    with open(path.join(repo_destination, 'setup.cfg'), encoding='utf-8') as fd:
-                        version_raw = [line.strip() for line in fd.readlines() if line.strip().startswith('version = ')]
+                setup_cfg = git_show(mirror, revision, 'setup.cfg', offline=offline)
+
+                if setup_cfg is not None:
+                    version_raw = [line.strip() for line in setup_cfg.splitlines() if line.strip().startswith('version = ')]
 
                     if len(version_raw) != 1:
                         print(f'!! unable to find "version" declaration in setup.cfg from {url}', file=sys.stderr)
                         raise RuntimeError()  # abort
 
                     _, grizzly_version = version_raw[-1].split(' = ')
-                except FileNotFoundError:
-                    try:
-                        import setuptools_scm  # pylint: disable=unused-import  # noqa: F401  # type: ignore
-                    except ModuleNotFoundError:  # pragma: no cover
-                        rc = subprocess.check_call([
-                            sys.executable,
-                            '-m',
-                            'pip',
-                            'install',
-                            'setuptools_scm',
-                        ])
-
-                    try:
-                        grizzly_version = subprocess.check_output(
-                            [
-                                sys.executable,
-                                '-m',
-                                'setuptools_scm',
-                            ],
-                            shell=False,
-                            universal_newlines=True,
-                            cwd=repo_destination,
-                        ).strip()
-                    except subprocess.CalledProcessError:  # pragma: no cover
-                        print(f'!! unable to get setuptools_scm version from {url}', file=sys.stderr)
-                        raise RuntimeError()  # abort
+                else:
+                    grizzly_version = setuptools_scm_version(mirror, revision, url, offline=offline)
 
             if grizzly_version == '0.0.0':
                 grizzly_version = '(development)'
 
-            try:
-                with open(path.join(repo_destination, 'requirements.txt'), encoding='utf-8') as fd:
-                    version_raw = [line.strip() for line in fd.readlines() if line.strip().startswith('locust')]
+            requirements_txt = git_show(mirror, revision, 'requirements.txt', offline=offline)
+
+            if requirements_txt is not None:
+                version_raw = [line.strip() for line in requirements_txt.splitlines() if line.strip().startswith('locust')]
 
                 if len(version_raw) != 1:
                     print(f'!! unable to find "locust" dependency in requirements.txt from {url}', file=sys.stderr)
@@ -403,25 +795,19 @@ def get_dependency_versions(local_install: Union[bool, str]) -> Tuple[Tuple[Opti
                     print(f'!! unable to find locust version in "{version_raw[-1].strip()}" specified in requirements.txt from {url}', file=sys.stderr)
                 else:
                     locust_version = match.group(1).strip()
-            except FileNotFoundError:  # pragma: no cover
-                with open(path.join(repo_destination, 'pyproject.toml'), 'rb') as fdt:
-                    toml_dict = tomli.load(fdt)
-                    dependencies = toml_dict.get('project', {}).get('dependencies', [])
-                    for dependency in dependencies:
-                        if not dependency.startswith('locust'):
-                            continue
+            elif pyproject is not None:
+                dependencies = tomli.loads(pyproject).get('project', {}).get('dependencies', [])
+                for dependency in dependencies:
+                    if not dependency.startswith('locust'):
+                        continue
 
-                        _, locust_version = dependency.strip().split(' ', 1)
+                    _, locust_version = dependency.strip().split(' ', 1)
 
-                        break
+                    break
         except RuntimeError:
             pass
-        finally:
-            rm_rf(tmp_workspace)
     else:
-        response = requests.get(
-            'https://pypi.org/pypi/grizzly-loadtester/json'
-        )
+        response = get_pypi('https://pypi.org/pypi/grizzly-loadtester/json', offline=offline)
 
         if response.status_code != 200:
             print(f'!! unable to get grizzly package information from {response.url} ({response.status_code})', file=sys.stderr)
@@ -472,9 +858,7 @@ def get_dependency_versions(local_install: Union[bool, str]) -> Tuple[Tuple[Opti
 
             if grizzly_version is not None:
                 # get version from pypi, to be able to get locust version
-                response = requests.get(
-                    f'https://pypi.org/pypi/grizzly-loadtester/{grizzly_version}/json'
-                )
+                response = get_pypi(f'https://pypi.org/pypi/grizzly-loadtester/{grizzly_version}/json', offline=offline)
 
                 if response.status_code != 200:
                     print(f'!! unable to get grizzly {grizzly_version} package information from {response.url} ({response.status_code})', file=sys.stderr)
@@ -519,32 +903,57 @@ def get_dependency_versions(local_install: Union[bool, str]) -> Tuple[Tuple[Opti
     return (grizzly_version, grizzly_extras, ), locust_version
 
 
-def list_images(args: Arguments) -> Dict[str, Any]:
-    images: Dict[str, Any] = {}
-    output = subprocess.check_output([
-        f'{args.container_system}',
-        'image',
-        'ls',
-        '--format',
-        '{"name": "{{.Repository}}", "tag": "{{.Tag}}", "size": "{{.Size}}", "created": "{{.CreatedAt}}", "id": "{{.ID}}"}',
-    ]).decode('utf-8')
+@dataclass
+class ContainerImage:
+    name: str
+    id: str
+    created: str
+    labels: Dict[str, str] = field(default_factory=dict)
+
+
+# result of `inspect_image`, per container system and image, for the rest of the execution
+_inspected_images: Dict[Tuple[str, str], Optional[ContainerImage]] = {}
+
+
+def inspect_image(args: Arguments, name: str) -> Optional[ContainerImage]:
+    """Get information about image `name` (`<repository>:<tag>`), `None` if it does not exist.
+
+    Only the image in question is looked up, and the result is remembered until `forget_image` is called for it.
+    """
+    key = (args.container_system, name,)
+
+    if key not in _inspected_images:
+        try:
+            output = subprocess.check_output(
+                [
+                    f'{args.container_system}',
+                    'image',
+                    'inspect',
+                    '--format',
+                    '{"id": {{ json .Id }}, "created": {{ json .Created }}, "labels": {{ json .Config.Labels }}}',
+                    name,
+                ],
+                stderr=subprocess.DEVNULL,
+            ).decode('utf-8')
 
-    for line in output.split('\n'):
-        if len(line) < 1:
-            continue
-        image = jsonloads(line)
-        name = image['name']
-        tag = image['tag']
-        del image['name']
-        del image['tag']
+            # one line per image, but there can only be one image with the specified name
+            image = jsonloads(output.strip().split('\n')[0])
 
-        version = {tag: image}
+            _inspected_images[key] = ContainerImage(
+                name=name,
+                id=image['id'],
+                created=image['created'],
+                labels=image['labels'] or {},
+            )
+        except subprocess.CalledProcessError:
+            _inspected_images[key] = None
+
+    return _inspected_images[key]
 
-        if name not in images:
-            images[name] = {}
-        images[name].update(version)
 
-    return images
+def forget_image(args: Arguments, name: str) -> None:
+    """Image `name` has been built or removed, so it must be inspected again."""
+    _inspected_images.pop((args.container_system, name,), None)
 
 
 def get_default_mtu(args: Arguments) -> Optional[str]:
@@ -599,6 +1008,68 @@ def get_distributed_system() -> Optional[str]:
     return container_system
 
 
+@dataclass
+class ProbeResult:
+    name: str
+    value: Any = None
+    duration: Optional[float] = None
+    error: Optional[BaseException] = None
+
+
+class ProbeError(ValueError):
+    def __init__(self, results: List[ProbeResult]) -> None:
+        self.results = results
+
+        super().__init__('\n'.join(f'!! {result.name} failed: {result.error}' for result in results))
+
+
+# seconds to wait for other probes to finish, after the first probe has failed
+PROBE_FAILURE_GRACE = 0.05
+
+
+def run_probes(probes: Dict[str, Callable[[], Any]], *, verbose: bool = False) -> Dict[str, ProbeResult]:
+    """Run independent `probes` (checks of the environment) concurrently, and time them.
+
+    As soon as a probe fails, a `ProbeError` is raised, without waiting for the probes that are still running. The error
+    always contains the first probe that failed, and any other probe that failed within `PROBE_FAILURE_GRACE` seconds of it.
+    """
+    results = {name: ProbeResult(name=name) for name in probes.keys()}
+
+    def execute(result: ProbeResult) -> None:
+        with span(result.name, 'probe') as trace:
+            try:
+                result.value = probes[result.name]()
+            except BaseException as e:
+                result.error = e
+                raise
+            finally:
+                result.duration = perf_counter() - trace.start
+
+    executor = ThreadPoolExecutor(max_workers=max(len(probes), 1), thread_name_prefix='grizzly-cli-probe')
+
+    try:
+        futures = [executor.submit(execute, result) for result in results.values()]
+        _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+
+        if len(not_done) > 0:
+            # probes that fails at the same time as the first one should also be reported
+            wait(not_done, timeout=PROBE_FAILURE_GRACE)
+    finally:
+        executor.shutdown(wait=False)
+
+    if verbose:
+        for result in results.values():
+            duration = f'{result.duration * 1000:.0f} ms' if result.duration is not None else 'not finished'
+            logger.info(f'probe {result.name}: {duration}')
+
+    failed = [result for result in results.values() if result.error is not None]
+
+    if len(failed) > 0:
+        raise ProbeError(failed)
+
+    return results
+
+
 def get_input(text: str) -> str:  # pragma: no cover
     return input(text).strip()
 
@@ -614,44 +1085,255 @@ def ask_yes_no(question: str) -> None:
             raise KeyboardInterrupt()
 
 
-def parse_feature_file(file: str) -> None:
-    if len(grizzly_cli.SCENARIOS) > 0:
-        return
+class FeatureDocument:
+    """Feature file, read once, with everything grizzly-cli needs to know about it before it is executed.
+
+    Metadata (`# grizzly-cli ...`) and notices (`# grizzly-cli:notice ...`) are found in one pass over the content, scenarios and
+    description are parsed with behave the first time they are needed. Loaded documents are cached by path, and reused as long
+    as the modification time and size of the file are the same.
+    """
+
+    file: str
+    content: str
+    metadata: List[List[str]]
+    notices: List[str]
+
+    _scenarios: Optional[List[Scenario]]
+    _description: Optional[str]
+    _variables: Optional[List[str]]
+
+    _documents: ClassVar[Dict[str, Tuple[Tuple[int, int], FeatureDocument]]] = {}
+
+    def __init__(self, file: str, content: str) -> None:
+        self.file = file
+        self.content = content
+        self.metadata = []
+        self.notices = []
+        self._scenarios = None
+        self._description = None
+        self._variables = None
+
+        for line in content.splitlines():
+            line = line.strip()
+
+            if not line.startswith('# grizzly-cli'):
+                continue
+
+            if line.startswith('# grizzly-cli:notice '):
+                self.notices.append(line.replace('# grizzly-cli:notice ', ''))
+            elif line.startswith('# grizzly-cli '):
+                self.metadata.append(line.replace('# grizzly-cli ', '').split(' '))
+
+    @staticmethod
+    def _key(file: str) -> Tuple[str, Tuple[int, int]]:
+        stat_result = os.stat(file)
+
+        return path.realpath(file), (stat_result.st_mtime_ns, stat_result.st_size)
+
+    @classmethod
+    def load(cls, file: str) -> FeatureDocument:
+        """Read `file`, unless it has not changed since it was last read."""
+        key, version = cls._key(file)
+        cached = cls._documents.get(key, None)
+
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with open(file, encoding='utf-8') as fd:
+            document = cls(file, fd.read())
+
+        cls._documents.update({key: (version, document)})
+
+        return document
+
+    @classmethod
+    def create(cls, file: str, content: str) -> FeatureDocument:
+        """Document for `content`, that has just been written to `file`, so it does not have to be read again."""
+        key, version = cls._key(file)
+        document = cls(file, content)
+        cls._documents.update({key: (version, document)})
+
+        return document
+
+    def _parse(self) -> None:
+        from behave.parser import parse_feature
+
+        feature = parse_feature(self.content, filename=self.file)
+
+        if feature is None:
+            self._scenarios = []
+        else:
+            self._scenarios = list(feature.scenarios)
+            self._description = feature.name
+
+    @property
+    def scenarios(self) -> List[Scenario]:
+        if self._scenarios is None:
+            self._parse()
+
+        return cast(List['Scenario'], self._scenarios)
+
+    @property
+    def description(self) -> Optional[str]:
+        if self._scenarios is None:
+            self._parse()
+
+        return self._description
+
+    @property
+    def variables(self) -> List[str]:
+        """Names of all variables that there are questions for (`ask for value of variable "..."`)."""
+        if self._variables is None:
+            unique_variables: Set[str] = set()
+
+            for scenario in self.scenarios:
+                for step in scenario.steps + scenario.background_steps or []:
+                    if not step.name.startswith('ask for value of variable'):
+                        continue
+
+                    match = re.match(r'ask for value of variable "([^"]*)"', step.name)
+
+                    if not match:
+                        raise ValueError(f'could not find variable name in "{step.name}"')
 
-    feature = feature_file_parser(file)
+                    unique_variables.add(match.group(1))
 
-    grizzly_cli.FEATURE_DESCRIPTION = feature.name
+            self._variables = sorted(list(unique_variables))
 
-    for scenario in feature.scenarios:
-        grizzly_cli.SCENARIOS.append(scenario)
+        return self._variables
 
 
 def find_metadata_notices(file: str) -> List[str]:
-    with open(file) as fd:
-        return [line.strip().replace('# grizzly-cli:notice ', '') for line in fd.readlines() if line.strip().startswith('# grizzly-cli:notice ')]
+    return FeatureDocument.load(file).notices
 
 
 def find_variable_names_in_questions(file: str) -> List[str]:
-    unique_variables: Set[str] = set()
+    return FeatureDocument.load(file).variables
 
-    parse_feature_file(file)
 
-    for scenario in grizzly_cli.SCENARIOS:
-        for step in scenario.steps + scenario.background_steps or []:
-            if not step.name.startswith('ask for value of variable'):
+def apportion(total: int, weights: Sequence[float], minimum: int = 1) -> List[int]:
+    """Divide `total` into shares proportional to `weights`, with the largest remainder (Hamilton) method, where each share
+    with a weight is at least `minimum`.
+
+    Shares whose quota is less than `minimum` gets `minimum`, and the rest is divided between the other shares. Each share
+    is then the integer part of its quota, and what is left is given, one each, to the shares with the largest remainders
+    (first share wins a tie). Shares with weight 0 gets nothing, the sum of the shares is `total` unless all weights are 0.
+    """
+    if any([weight < 0 for weight in weights]):
+        raise ValueError('weights can not be negative')
+
+    # calculate with integers, so that quotas and remainders are exact
+    if all([float(weight).is_integer() for weight in weights]):
+        integer_weights = [int(weight) for weight in weights]
+    else:
+        fractions = [Fraction(weight) for weight in weights]
+        denominator = lcm(*[fraction.denominator for fraction in fractions])
+        integer_weights = [int(fraction * denominator) for fraction in fractions]
+
+    shares = [0] * len(weights)
+    weighted = [index for index, weight in enumerate(integer_weights) if weight > 0]
+
+    if total < len(weighted) * minimum:
+        raise ValueError(f'{total} can not be divided in {len(weighted)} shares of at least {minimum}')
+
+    remaining_total = total
+    remaining_weight = sum(integer_weights)
+
+    # the threshold for a quota to be less than minimum only increases when a share gets minimum, so the shares with
+    # the smallest weights can be checked in order, until one has a large enough quota
+    order = sorted(weighted, key=lambda index: integer_weights[index])
+    fixed = 0
+
+    for index in order:
+        if remaining_total * integer_weights[index] >= minimum * remaining_weight:
+            break
+
+        shares[index] = minimum
+        remaining_total -= minimum
+        remaining_weight -= integer_weights[index]
+        fixed += 1
+
+    remainders: List[Tuple[int, int]] = []
+
+    for index in order[fixed:]:
+        share, remainder = divmod(remaining_total * integer_weights[index], remaining_weight)
+        shares[index] = share
+        remainders.append((remainder, index))
+
+    left_over = remaining_total - sum([shares[index] for index in order[fixed:]])
+
+    for _, index in sorted(remainders, key=lambda remainder: (-remainder[0], remainder[1]))[:left_over]:
+        shares[index] += 1
+
+    return shares
+
+
+def allocate_users_to_workers(user_counts: Sequence[int], workers: int) -> List[List[int]]:
+    """Project how many users of each scenario that each worker will get, when `user_counts` users are started on `workers` workers.
+
+    Users are started in the same order as locust dispatches users with a fixed count; one user of each scenario at a time, skipping
+    scenarios that already has all of their users, and each started user is given to the next worker, round-robin.
+    """
+    if workers < 1:
+        raise ValueError('there must be at least 1 worker')
+
+    allocation = [[0] * len(user_counts) for _ in range(workers)]
+    remaining = list(user_counts)
+    worker = 0
+
+    while any([count > 0 for count in remaining]):
+        for index, count in enumerate(remaining):
+            if count < 1:
                 continue
 
-            match = re.match(r'ask for value of variable "([^"]*)"', step.name)
+            allocation[worker][index] += 1
+            remaining[index] -= 1
+            worker = (worker + 1) % workers
 
-            if not match:
-                raise ValueError(f'could not find variable name in "{step.name}"')
+    return allocation
+
+
+def write_plan(file: str, plans: List[Dict[str, Any]]) -> None:
+    """Write the distribution of users and iterations, for one or more feature files, as JSON."""
+    write_file_atomic(Path(file), jsondumps({'features': plans}, indent=2) + '\n')
 
-            unique_variables.add(match.group(1))
 
-    return sorted(list(unique_variables))
+# steps that affects the distribution of users between scenarios. the first matching filter decides which pattern to match
+# a step with, so only one regular expression is evaluated per step
+DISTRIBUTION_STEPS: List[Tuple[str, Callable[[str], bool], Pattern[str]]] = [
+    ('variable', lambda name: name.startswith('value for variable'), re.compile(r'value for variable "([^"]*)" is "([^"]*)"')),
+    ('user', lambda name: name.startswith('a user of type'), re.compile(r'a user of type "([^"]*)" (with weight "([^"]*)")?.*')),
+    ('iterations', lambda name: name.startswith('repeat for'), re.compile(r'repeat for "([^"]*)" iteration[s]?')),
+    ('user_count', lambda name: 'users of type' in name or 'user of type' in name, re.compile(r'"([^"]*)" user[s]? of type "([^"]*)".*')),
+]
 
+DISTRIBUTION_USERS_STEP = re.compile(r'"([^"]*)" user(s)?')
+
+
+@lru_cache(maxsize=1024)
+def _compile_template(source: str) -> Template:
+    from jinja2 import Template
+
+    return Template(source)
+
+
+@lru_cache(maxsize=4096)
+def _render_template(source: str, variables: Tuple[Tuple[str, Any], ...]) -> str:
+    """Render `source` with `variables`, the same expression is often used in many scenarios with the same variables."""
+    # nothing to render, which is the case for most values
+    if '{' not in source:
+        return source
+
+    return _compile_template(source).render(**dict(variables))
+
+
+def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any]) -> Dict[str, Any]:
+    """Calculate, and log, how many users and iterations each scenario in `args.file` will have.
+
+    Returns the plan, with the projected allocation of users and iterations on `args.workers` workers, which is also written to
+    `args.plan_output`, if specified.
+    """
 
-def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any]) -> None:
     def _guess_datatype(value: str) -> Union[str, int, float, bool]:
         check_value = value.replace('.', '', 1)
 
@@ -724,6 +1406,9 @@ def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any])
     distribution: Dict[str, ScenarioProperties] = {}
     variables = {key.replace('TESTDATA_VARIABLE_', ''): _guess_datatype(value) for key, value in environ.items() if key.startswith('TESTDATA_VARIABLE_')}
 
+    def render(source: str, scenario_variables: Optional[Dict[str, Any]] = None) -> str:
+        return _render_template(source, tuple({**variables, **(scenario_variables or {})}.items()))
+
     def _pre_populate_scenario(scenario: Scenario, index: int) -> None:
         if scenario.name not in distribution:
             distribution[scenario.name] = ScenarioProperties(
@@ -737,7 +1422,9 @@ def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any])
     scenario_user_count_total: Optional[int] = None
     use_weights = True
 
-    for index, scenario in enumerate(grizzly_cli.SCENARIOS):
+    scenarios = FeatureDocument.load(args.file).scenarios
+
+    for index, scenario in enumerate(scenarios):
         scenario_variables: Dict[str, Any] = {}
         if len(scenario.steps) < 1:
             raise ValueError(f'scenario "{scenario.name}" does not have any steps')
@@ -747,42 +1434,43 @@ def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any])
         if index == 0:  # background_steps is only processed for first scenario in grizzly
             for step in scenario.background_steps or []:
                 if (step.name.endswith(' users') or step.name.endswith(' user')) and step.keyword == 'Given':
-                    match = re.match(r'"([^"]*)" user(s)?', step.name)
+                    match = DISTRIBUTION_USERS_STEP.match(step.name)
                     if match:
-                        scenario_user_count_total = int(round(float(Template(match.group(1)).render(**variables)), 0))
+                        scenario_user_count_total = int(round(float(render(match.group(1))), 0))
 
         if scenario_user_count_total is None:
             use_weights = False
             scenario_user_count_total = 0
 
         for step in (scenario.background_steps or []) + scenario.steps:
-            if step.name.startswith('value for variable'):  # pragma: no cover
-                match = re.match(r'value for variable "([^"]*)" is "([^"]*)"', step.name)
-                if match:
-                    try:
-                        variable_name = match.group(1)
-                        variable_value = Template(match.group(2)).render(**variables, **scenario_variables)
-                        scenario_variables.update({variable_name: variable_value})
-                    except:
-                        continue
-            elif step.name.startswith('a user of type'):
-                match = re.match(r'a user of type "([^"]*)" (with weight "([^"]*)")?.*', step.name)
-                if match:
-                    distribution[scenario.name].user = match.group(1)
-                    distribution[scenario.name].weight = int(float(Template(match.group(3) or '1.0').render(**variables, **scenario_variables)))
-            elif step.name.startswith('repeat for'):
-                match = re.match(r'repeat for "([^"]*)" iteration[s]?', step.name)
-                if match:
-                    distribution[scenario.name].iterations = int(round(float(Template(match.group(1)).render(**variables, **scenario_variables)), 0))
-                    (distribution[scenario.name].iterations)
-            elif any([pattern in step.name for pattern in ['users of type', 'user of type']]):
-                match = re.match(r'"([^"]*)" user[s]? of type "([^"]*)".*', step.name)
-                if match:
-                    scenario_user_count = int(round(float(Template(match.group(1)).render(**variables, **scenario_variables)), 0))
-                    scenario_user_count_total += scenario_user_count
+            for kind, is_kind, pattern in DISTRIBUTION_STEPS:
+                if is_kind(step.name):
+                    match = pattern.match(step.name)
+                    break
+            else:
+                continue
+
+            if not match:
+                continue
 
-                    distribution[scenario.name].user_count = scenario_user_count
-                    distribution[scenario.name].user = match.group(2)
+            if kind == 'variable':  # pragma: no cover
+                try:
+                    variable_name = match.group(1)
+                    variable_value = render(match.group(2), scenario_variables)
+                    scenario_variables.update({variable_name: variable_value})
+                except:
+                    continue
+            elif kind == 'user':
+                distribution[scenario.name].user = match.group(1)
+                distribution[scenario.name].weight = int(float(render(match.group(3) or '1.0', scenario_variables)))
+            elif kind == 'iterations':
+                distribution[scenario.name].iterations = int(round(float(render(match.group(1), scenario_variables)), 0))
+            elif kind == 'user_count':
+                scenario_user_count = int(round(float(render(match.group(1), scenario_variables)), 0))
+                scenario_user_count_total += scenario_user_count
+
+                distribution[scenario.name].user_count = scenario_user_count
+                distribution[scenario.name].user = match.group(2)
 
             if distribution[scenario.name].is_fulfilled():
                 break
@@ -802,23 +1490,10 @@ def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any])
         total_iterations += scenario.iterations
 
     if use_weights:
-        for scenario in distribution.values():
-            scenario.user_count = ceil(scenario_user_count_total * (scenario.weight / total_weight))
-
-        # smooth assigned user count based on weight, so that the sum of scenario.user_count == total_user_count
-        total_user_count = sum([scenario.user_count for scenario in distribution.values()])
-        user_overflow = total_user_count - scenario_user_count_total
-
-        while user_overflow > 0:
-            for scenario in dict(sorted(distribution.items(), key=lambda d: d[1].user_count, reverse=True)).values():
-                if scenario.user_count <= 1:
-                    continue
-
-                scenario.user_count -= 1
-                user_overflow -= 1
+        user_counts = apportion(scenario_user_count_total, [scenario.weight for scenario in distribution.values()])
 
-                if user_overflow < 1:
-                    break
+        for scenario, user_count in zip(distribution.values(), user_counts):
+            scenario.user_count = user_count
 
     def print_table_lines(max_length_iterations: int, max_length_users: int, max_length_description: int, max_length_errors: int) -> None:
         line = ['-' * 5, '-|-', '-' * 6, '|-', '-' * max_length_iterations, '|-', '-' * max_length_users, '|-', '-' * max_length_description, '-|']
@@ -836,7 +1511,7 @@ def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any])
     max_length_users = len('#user')
     max_length_errors = len('errors')
 
-    message = f'\nfeature file {args.file} will execute in total {total_iterations} iterations divided on {len(grizzly_cli.SCENARIOS)} scenarios'
+    message = f'\nfeature file {args.file} will execute in total {total_iterations} iterations divided on {len(scenarios)} scenarios'
     if hasattr(args, 'environment_file') and args.environment_file is not None:
         message = f'{message} with environment file {args.environment_file}'
 
@@ -940,9 +1615,54 @@ def distribution_of_users_per_scenario(args: Arguments, environ: Dict[str, Any])
         if scenario.iterations < scenario.user_count:
             raise ValueError(f'{scenario.name} will have {scenario.user_count} users to run {scenario.iterations} iterations, increase iterations or lower user count')
 
+    workers = getattr(args, 'workers', None) or 1
+    allocation = allocate_users_to_workers([scenario.user_count for scenario in distribution.values()], workers)
+    # iterations of a scenario are divided between its users, so each worker gets iterations in proportion to its users
+    iteration_allocation = [
+        apportion(scenario.iterations, [worker_users[index] for worker_users in allocation], minimum=0)
+        for index, scenario in enumerate(distribution.values())
+    ]
+
+    plan: Dict[str, Any] = {
+        # `args.file` is the rendered lock file when executed via `run`, which has the specified file in `args.files`
+        'file': (getattr(args, 'files', None) or [args.file])[0],
+        'users': sum([scenario.user_count for scenario in distribution.values()]),
+        'iterations': total_iterations,
+        'scenarios': [
+            {
+                'identifier': scenario.identifier,
+                'name': scenario.name,
+                'user': scenario.user,
+                'weight': scenario.weight if use_weights else None,
+                'iterations': scenario.iterations,
+                'users': scenario.user_count,
+            } for scenario in distribution.values()
+        ],
+        'workers': [
+            {
+                'worker': worker + 1,
+                'users': sum(worker_users),
+                'iterations': sum([iterations[worker] for iterations in iteration_allocation]),
+                'scenarios': {
+                    scenario.identifier: {
+                        'users': worker_users[index],
+                        'iterations': iteration_allocation[index][worker],
+                    } for index, scenario in enumerate(distribution.values()) if worker_users[index] > 0
+                },
+            } for worker, worker_users in enumerate(allocation)
+        ],
+    }
+
+    plan_output = getattr(args, 'plan_output', None)
+    if plan_output is not None:
+        write_plan(plan_output, [plan])
+        logger.info(f'plan written to {plan_output}\n')
+
     if not args.yes:
         ask_yes_no('continue?')
 
+    return plan
+
 
 def setup_logging(logfile: Optional[str] = None) -> None:
     logging_config: dict = {
@@ -1022,28 +1742,92 @@ def merge_dicts(merged: dict[str, Any], source: dict[str, Any]) -> dict[str, Any
     return merged
 
 
-def get_indentation(file: Path) -> int:
-    try:
-        first_indent_line = file.read_text().splitlines()[1]
-        return len(first_indent_line.rstrip()) - len(first_indent_line.strip())
-    except IndexError:
-        # use 2 as default indentation when it is not possible to detect from file
-        return 2
+class LayeredConfiguration:
+    """Ordered configuration layers, where values in later layers takes precedence over values in earlier layers.
+
+    Gives the same result as merging the layers, one after the other, with `merge_dicts`, without copying anything. Values
+    are looked up lazily with `get`, and the complete configuration is created once with `materialize`. Parts of the
+    configuration that only comes from one layer are not copied, so layers should not be modified afterwards.
+    """
+
+    layers: List[Dict[str, Any]]
+
+    def __init__(self, *layers: Dict[str, Any]) -> None:
+        self.layers = list(layers)
 
+    def append(self, layer: Dict[str, Any]) -> None:
+        """Add a layer with the highest precedence."""
+        self.layers.append(layer)
 
-class IndentDumper(Dumper):
-    use_indent: ClassVar[int]
+    def prepend(self, layer: Dict[str, Any]) -> None:
+        """Add a layer with the lowest precedence."""
+        self.layers.insert(0, layer)
+
+    @staticmethod
+    def _chain(values: List[Tuple[Any, bool]]) -> List[Tuple[Any, bool]]:
+        # a value that is not a dict replaces all values before it, and is replaced by any value after it
+        start = len(values) - 1
+        while start > 0 and isinstance(values[start][0], dict) and isinstance(values[start - 1][0], dict):
+            start -= 1
+
+        return values[start:]
 
     @classmethod
-    def use_indentation(cls, file: Path) -> type['IndentDumper']:
-        cls.use_indent = get_indentation(file)
+    def _merge(cls, values: List[Tuple[Any, bool]]) -> Any:
+        """Merge all values for one key, ordered by precedence. Each value has a flag, which is `False` only for a value
+        that is the base of the merge, which is never converted."""
+        chain = cls._chain(values)
+        value, convert = chain[-1]
+
+        if not isinstance(value, dict):
+            if convert and isinstance(value, str) and value.lower() == 'none':
+                value = None
+
+            return value
+
+        if len(chain) == 1:
+            return value
+
+        merged: Dict[str, Any] = {}
+        keys: Dict[str, None] = {}
+        for layer, _ in chain:
+            keys.update(dict.fromkeys(layer.keys()))
+
+        for key in keys:
+            merged[key] = cls._merge([(layer[key], index > 0) for index, (layer, _) in enumerate(chain) if key in layer])
+
+        return merged
+
+    def get(self, *keys: str, default: Any = None) -> Any:
+        """Get the value for the path `keys`, without merging anything that is not part of the value."""
+        values: List[Tuple[Any, bool]] = [(layer, index > 0) for index, layer in enumerate(self.layers)]
+
+        for key in keys:
+            if len(values) < 1:
+                break
+
+            chain = self._chain(values)
+            if not isinstance(chain[-1][0], dict):
+                return default
+
+            values = [(layer[key], index > 0) for index, (layer, _) in enumerate(chain) if key in layer]
 
-        return cls
+        if len(values) < 1:
+            return default
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
+        return self._merge(values)
 
-        self.best_indent = self.use_indent
+    def materialize(self) -> Dict[str, Any]:
+        if len(self.layers) < 1:
+            return {}
 
-    def increase_indent(self, flow: bool = False, indentless: bool = False) -> None:
-        return super().increase_indent(flow, False)
+        return cast(Dict[str, Any], self.get())
+
+
+def get_indentation(file: Path) -> int:
+    try:
+        first_indent_line = file.read_text().splitlines()[1]
+        return len(first_indent_line.rstrip()) - len(first_indent_line.strip())
+    except IndexError:
+        # use 2 as default indentation when it is not possible to detect from file
+        return 2
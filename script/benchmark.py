@@ -0,0 +1,507 @@
+#!/usr/bin/env python
+"""Micro benchmarks for hot paths in grizzly-cli.
+
+usage: python script/benchmark.py [name ...]
+
+without arguments all benchmarks are executed.
+"""
+
+import sys
+
+from typing import Callable, Dict, List, Tuple, Union
+from os import path
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+REPO_ROOT = path.realpath(path.join(path.dirname(__file__), '..'))
+
+sys.path.insert(0, REPO_ROOT)
+
+# size, or label, and duration in seconds
+Result = Tuple[Union[int, str], float]
+
+BENCHMARKS: Dict[str, Callable[[], List[Result]]] = {}
+
+
+def benchmark(name: str) -> Callable[[Callable[[], List[Result]]], Callable[[], List[Result]]]:
+    def wrapper(func: Callable[[], List[Result]]) -> Callable[[], List[Result]]:
+        BENCHMARKS.update({name: func})
+
+        return func
+
+    return wrapper
+
+
+def timeit(func: Callable[[], object], repeat: int = 3) -> float:
+    """Best of `repeat` executions, in seconds."""
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+
+    return best
+
+
+@benchmark('scenario-include')
+def benchmark_scenario_include() -> List[Result]:
+    """Render time of a feature file against number of `{% scenario ... %}` includes from one library feature file."""
+    from jinja2 import Environment
+    from grizzly_cli.run import ScenarioTag
+
+    results: List[Result] = []
+
+    with TemporaryDirectory() as tmp_dir:
+        context = Path(tmp_dir)
+        library_scenarios = 50
+
+        library = ['Feature: library']
+        for index in range(library_scenarios):
+            library += [
+                f'    Scenario: scenario-{index}',
+                '        Given a user of type "RestApi" load testing "https://localhost"',
+                f'        Then get request with name "get-{index}" from endpoint "/api/{index} | content_type=json"',
+                '',
+            ]
+        (context / 'library.feature').write_text('\n'.join(library))
+
+        for includes in [10, 20, 40, 80, 160]:
+            feature = ['Feature: benchmark']
+            for index in range(includes):
+                feature += [
+                    f'    Scenario: include-{index}',
+                    f'        {{% scenario "scenario-{index % library_scenarios}", feature="library.feature" %}}',
+                    '',
+                ]
+            source = '\n'.join(feature)
+            feature_file = context / 'benchmark.feature'
+
+            def render() -> None:
+                environment = Environment(autoescape=False, extensions=[ScenarioTag])
+                template = environment.from_string(source)
+                environment.extend(feature_file=feature_file, ignore_errors=False, scenario_index={})
+                template.render()
+
+            results.append((includes, timeit(render)))
+
+    return results
+
+
+@benchmark('filter-stream')
+def benchmark_filter_stream() -> List[Result]:
+    """Compile and render time of a feature file against number of lines, where every other line has `{{ .. }}` expressions."""
+    from jinja2 import Environment
+    from grizzly_cli.run import ScenarioTag
+
+    results: List[Result] = []
+
+    for lines in [1250, 2500, 5000, 10000]:
+        feature = ['Feature: benchmark', '    Scenario: generated']
+        for index in range(lines):
+            if index % 2 == 0:
+                feature.append(f'        # step number {index}')
+            else:
+                feature.append(f'        Then get request with name "{{{{ name_{index} }}}}" from endpoint "/api/{{{{ id | int + {index} }}}}"')
+
+        source = '\n'.join(feature)
+
+        def render() -> None:
+            environment = Environment(autoescape=False, extensions=[ScenarioTag])
+            environment.extend(feature_file=None, ignore_errors=False, scenario_index={})
+            environment.from_string(source).render()
+
+        results.append((lines, timeit(render)))
+
+    return results
+
+
+@benchmark('keyvault')
+def benchmark_keyvault() -> List[Result]:
+    """Time to load configuration from a fake keyvault, with 20 ms latency per request, against number of secrets."""
+    from datetime import datetime, timezone
+    from time import sleep
+    from types import SimpleNamespace
+    from grizzly_cli.run import load_configuration_keyvault
+
+    class FakeSecretClient:
+        def __init__(self, secrets: int) -> None:
+            self.names = [f'grizzly--global--key{index}-value' for index in range(secrets)]
+
+        def list_properties_of_secrets(self) -> List[SimpleNamespace]:
+            return [SimpleNamespace(name=name, updated_on=datetime(2024, 1, 1, tzinfo=timezone.utc)) for name in self.names]
+
+        def get_secret(self, name: str) -> SimpleNamespace:
+            sleep(0.02)
+            return SimpleNamespace(name=name, value='foobar')
+
+    results: List[Result] = []
+
+    for secrets in [10, 50, 150]:
+        client = FakeSecretClient(secrets)
+        results.append((secrets, timeit(lambda: load_configuration_keyvault(url='https://benchmark', environment='local', client=client), repeat=1)))  # type: ignore[arg-type]
+
+    return results
+
+
+@benchmark('configuration-merge')
+def benchmark_configuration_merge() -> List[Result]:
+    """Time to merge a 1k key configuration with number of keyvault secrets, one layer per secret, with `LayeredConfiguration`
+    compared to `merge_dicts`, one secret at the time."""
+    from grizzly_cli.utils import LayeredConfiguration, merge_dicts, unflatten
+
+    results: List[Result] = []
+
+    configuration = {'configuration': {f'group{group}': {f'key{key}': f'value{key}' for key in range(100)} for group in range(10)}}
+
+    for secrets in [100, 250, 500, 1000]:
+        conf_secrets = [unflatten(f'configuration.group{index % 10}.secret{index}', 'secret') for index in range(secrets)]
+
+        def layered() -> None:
+            layers = LayeredConfiguration(configuration)
+            for conf in conf_secrets:
+                layers.prepend(conf)
+            layers.materialize()
+
+        def merged() -> None:
+            result: dict = {}
+            for conf in conf_secrets:
+                result = merge_dicts(conf, result)
+            merge_dicts(result, configuration)
+
+        results.append((f'layered {secrets}', timeit(layered)))
+        results.append((f'merge_dicts {secrets}', timeit(merged, repeat=1)))
+
+    return results
+
+
+@benchmark('run-command')
+def benchmark_run_command() -> List[Result]:
+    """Time to run a fake chatty command, that outputs number of lines as fast as it can, logged to a file with `run_command`,
+    compared to reading and logging one line at the time."""
+    import logging
+    import os
+    import subprocess
+    from grizzly_cli.utils import logger, run_command
+
+    results: List[Result] = []
+
+    def readline(command: List[str]) -> None:
+        process = subprocess.Popen(command, stderr=subprocess.STDOUT, stdout=subprocess.PIPE)
+        assert process.stdout is not None
+
+        while process.poll() is None:
+            output = process.stdout.readline()
+            if not output:
+                break
+
+            logger.info(output.decode().rstrip())
+
+        process.wait()
+
+    handlers = logger.handlers
+    propagate = logger.propagate
+
+    with open(os.devnull, 'w') as devnull:
+        logger.handlers = [logging.StreamHandler(devnull)]
+        logger.propagate = False
+
+        try:
+            for lines in [10000, 100000, 500000]:
+                # output is generated up front, so the time is spent reading it, not producing it
+                command = [
+                    sys.executable, '-c',
+                    (
+                        'import sys; '
+                        f'block = "".join(f"worker_{{index % 10}} | line {{index}} with some text from locust\\n" for index in range(1000)).encode(); '
+                        f'[sys.stdout.buffer.write(block) for _ in range({lines // 1000})]'
+                    ),
+                ]
+
+                results.append((f'run_command {lines}', timeit(lambda: run_command(command), repeat=1)))
+                results.append((f'readline {lines}', timeit(lambda: readline(command), repeat=1)))
+        finally:
+            logger.handlers = handlers
+            logger.propagate = propagate
+
+    return results
+
+
+@benchmark('git-mirror')
+def benchmark_git_mirror() -> List[Result]:
+    """Time to get grizzly versions from a local git repository, against number of files in the repository, the first time
+    (mirror is cloned) compared to following times (mirror is fetched)."""
+    import os
+    import subprocess
+    from unittest.mock import patch
+    from grizzly_cli.utils import get_dependency_versions
+
+    results: List[Result] = []
+
+    def git(cwd: Path, *args: str) -> None:
+        subprocess.check_call(['git', '-c', 'user.name=grizzly', '-c', 'user.email=grizzly@example.com', *args], cwd=cwd, stdout=subprocess.DEVNULL)
+
+    for files in [100, 1000, 5000]:
+        with TemporaryDirectory() as tmp_dir:
+            context = Path(tmp_dir)
+            repo = context / 'grizzly'
+            (repo / 'grizzly').mkdir(parents=True)
+            (repo / 'grizzly' / '__init__.py').write_text("__version__ = '1.5.3'\n")
+            (repo / 'requirements.txt').write_text('locust==2.2.1\n')
+            for index in range(files):
+                (repo / 'grizzly' / f'module_{index}.py').write_text(f'value = {index}\n' * 100)
+            git(repo, 'init', '-q')
+            git(repo, 'add', '-A')
+            git(repo, 'commit', '-q', '-m', 'benchmark')
+            git(repo, 'tag', 'v1.5.3')
+
+            (context / 'requirements.txt').write_text(f'git+{repo.as_uri()}@v1.5.3#egg=grizzly-loadtester')
+
+            with patch('grizzly_cli.EXECUTION_CONTEXT', tmp_dir), patch.dict(os.environ, {'GRIZZLY_CLI_CACHE_DIR': str(context / 'cache')}):
+                results.append((f'clone {files}', timeit(lambda: get_dependency_versions(False), repeat=1)))
+                results.append((f'fetch {files}', timeit(lambda: get_dependency_versions(False))))
+
+    return results
+
+
+@benchmark('list-files')
+def benchmark_list_files() -> List[Result]:
+    """Time to list completion suggestions for `*.yaml` files, against number of files in a synthetic project with deep `.git`,
+    `.venv`, `node_modules` and `features/requests/logs` directories, with a recursive glob compared to the file index, the first
+    time (nothing indexed) and following times (index read from disk)."""
+    import os
+    from glob import glob
+    from unittest.mock import patch
+    from grizzly_cli.argparse.bashcompletion.types import BashCompletionTypes, FileIndex
+
+    results: List[Result] = []
+
+    def create_tree(root: Path, files: int, depth: int = 4, width: int = 5) -> None:
+        directories = [root]
+        for _ in range(depth):
+            directories = [directory / f'dir{index}' for directory in directories for index in range(width)]
+
+        for index in range(files):
+            directory = directories[index % len(directories)]
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / f'file{index}.yaml').write_text('')
+
+    cwd = os.getcwd()
+
+    for files in [1000, 10000, 50000]:
+        with TemporaryDirectory() as tmp_dir:
+            context = Path(tmp_dir) / 'project'
+            (context / 'environments').mkdir(parents=True)
+            (context / 'environments' / 'local.yaml').write_text('')
+            (context / 'features').mkdir()
+            (context / 'features' / 'test.feature').write_text('Feature:')
+
+            for ignored in ['.git', '.venv', 'node_modules', 'features/requests/logs']:
+                create_tree(context / ignored, files // 4)
+
+            impl = BashCompletionTypes.File('*.yaml', '*.yml')
+
+            def globbed() -> None:
+                for pattern in impl.patterns:
+                    [path for path in glob(f'**/{pattern}', recursive=True) if not path.startswith('.')]
+
+            def indexed() -> None:
+                FileIndex._indexes.clear()
+                impl.list_files(None)
+                impl.list_files('environments/')
+
+            os.chdir(context)
+            try:
+                with patch.dict(os.environ, {'GRIZZLY_CLI_CACHE_DIR': str(Path(tmp_dir) / 'cache')}):
+                    results.append((f'glob {files}', timeit(globbed, repeat=1)))
+                    results.append((f'index cold {files}', timeit(indexed, repeat=1)))
+                    results.append((f'index warm {files}', timeit(indexed)))
+            finally:
+                os.chdir(cwd)
+
+    return results
+
+
+@benchmark('distribution')
+def benchmark_distribution() -> List[Result]:
+    """Time to calculate and print the distribution of users per scenario, against number of scenarios, where all values in
+    the steps are jinja2 expressions."""
+    import logging
+    import os
+    from argparse import Namespace
+    from unittest.mock import patch
+    from behave.parser import parse_feature
+    from grizzly_cli.utils import logger, distribution_of_users_per_scenario, _render_template, FeatureDocument
+
+    results: List[Result] = []
+
+    environ = {'TESTDATA_VARIABLE_users': '4000', 'TESTDATA_VARIABLE_iterations': '100', 'TESTDATA_VARIABLE_host': 'localhost'}
+    arguments = Namespace(file='benchmark.feature', yes=True)
+
+    handlers = logger.handlers
+    propagate = logger.propagate
+
+    with open(os.devnull, 'w') as devnull:
+        logger.handlers = [logging.StreamHandler(devnull)]
+        logger.propagate = False
+
+        try:
+            for scenarios in [125, 250, 500, 1000]:
+                feature = ['Feature: benchmark', '    Background: common', '        Given "{{ users | int }}" users', '']
+                for index in range(scenarios):
+                    feature += [
+                        f'    Scenario: scenario-{index}',
+                        f'        Given a user of type "RestApi" with weight "{{{{ {index % 10} + 1 }}}}" load testing "https://{{{{ host }}}}"',
+                        f'        And value for variable "offset" is "{{{{ {index % 5} * 2 }}}}"',
+                        '        And repeat for "{{ (iterations | int) + (offset | int) }}" iterations',
+                        '        Then get request with name "get" from endpoint "/api/{{ offset }}"',
+                        '',
+                    ]
+
+                parsed = parse_feature('\n'.join(feature))
+                assert parsed is not None
+
+                def distribution() -> None:
+                    _render_template.cache_clear()
+                    distribution_of_users_per_scenario(arguments, environ)
+
+                document = FeatureDocument('benchmark.feature', '')
+                document._scenarios = parsed.scenarios
+
+                with patch('grizzly_cli.utils.FeatureDocument.load', return_value=document):
+                    results.append((scenarios, timeit(distribution)))
+        finally:
+            logger.handlers = handlers
+            logger.propagate = propagate
+
+    return results
+
+
+@benchmark('apportion')
+def benchmark_apportion() -> List[Result]:
+    """Time to divide users between number of weighted scenarios, with `apportion` compared to rounding up and removing the
+    overflow one user at the time."""
+    from math import ceil
+    from random import Random
+    from grizzly_cli.utils import apportion
+
+    results: List[Result] = []
+    random = Random(1337)
+
+    def ceil_and_smooth(total: int, weights: List[int]) -> List[int]:
+        total_weight = sum(weights)
+        user_counts = {index: ceil(total * (weight / total_weight)) for index, weight in enumerate(weights)}
+        user_overflow = sum(user_counts.values()) - total
+
+        while user_overflow > 0:
+            for index, user_count in dict(sorted(user_counts.items(), key=lambda d: d[1], reverse=True)).items():
+                if user_count <= 1:
+                    continue
+
+                user_counts[index] -= 1
+                user_overflow -= 1
+
+                if user_overflow < 1:
+                    break
+
+        return list(user_counts.values())
+
+    for scenarios in [100, 500, 1000, 2000]:
+        # a few heavy scenarios and many light, with not many more users than scenarios, so most scenarios only gets one
+        # user, and the overflow from rounding up can only be removed from a few of them
+        weights = [random.randint(1, 100) * (100 if index % 50 == 0 else 1) for index in range(scenarios)]
+        total = scenarios + scenarios // 10
+
+        results.append((f'apportion {scenarios}', timeit(lambda: apportion(total, weights))))
+        results.append((f'ceil {scenarios}', timeit(lambda: ceil_and_smooth(total, weights), repeat=1)))
+
+    return results
+
+
+@benchmark('arguments')
+def benchmark_arguments() -> List[Result]:
+    """Time to parse `local run` arguments, when the parser tree is created for each parse compared to when it is reused."""
+    from grizzly_cli.__main__ import _create_parser, _get_parser
+
+    results: List[Result] = []
+
+    with TemporaryDirectory() as tmp_dir:
+        feature_file = Path(tmp_dir) / 'benchmark.feature'
+        feature_file.write_text('Feature: benchmark\n')
+        argv = ['local', 'run', '--yes', '--verbose', '-T', 'key=value', feature_file.as_posix()]
+
+        results.append(('create', timeit(lambda: _create_parser().parse_args(argv))))
+        _get_parser()
+        results.append(('cached', timeit(lambda: _get_parser().parse_args(argv))))
+
+    return results
+
+
+@benchmark('feature-document')
+def benchmark_feature_document() -> List[Result]:
+    """Time to find metadata, notices, variables and description of a feature file, with one `FeatureDocument` compared to
+    scanning the file for each of them, and parsing it once for variables and once for distribution of users."""
+    from behave.parser import parse_file
+    from grizzly_cli.utils import FeatureDocument
+
+    results: List[Result] = []
+
+    def separate(file: str) -> None:
+        for prefix in ['# grizzly-cli ', '# grizzly-cli:notice ']:
+            with open(file) as fd:
+                [line for line in fd.readlines() if line.strip().startswith(prefix)]
+
+        for _ in range(2):
+            feature = parse_file(file)
+            assert feature is not None
+            [step.name for scenario in feature.scenarios for step in scenario.steps if step.name.startswith('ask for value of variable')]
+
+    def document(file: str) -> None:
+        FeatureDocument._documents.clear()
+        feature_document = FeatureDocument.load(file)
+        feature_document.metadata
+        feature_document.notices
+        feature_document.variables
+        feature_document.description
+        FeatureDocument.load(file).scenarios
+
+    with TemporaryDirectory() as tmp_dir:
+        feature_file = Path(tmp_dir) / 'benchmark.feature'
+
+        for scenarios in [100, 500, 1000]:
+            feature = ['# grizzly-cli run --verbose', '# grizzly-cli:notice have you created testdata?', 'Feature: benchmark']
+            for index in range(scenarios):
+                feature += [
+                    f'    Scenario: scenario-{index}',
+                    '        Given a user of type "RestApi" load testing "https://localhost"',
+                    f'        And ask for value of variable "variable_{index % 10}"',
+                    '        And repeat for "10" iterations',
+                    f'        Then get request with name "get-{index}" from endpoint "/api/{index}"',
+                    '',
+                ]
+            feature_file.write_text('\n'.join(feature))
+
+            results.append((f'separate {scenarios}', timeit(lambda: separate(feature_file.as_posix()))))
+            results.append((f'document {scenarios}', timeit(lambda: document(feature_file.as_posix()))))
+
+    return results
+
+
+def main() -> int:
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f'!! unknown benchmark {name}, available: {", ".join(BENCHMARKS.keys())}', file=sys.stderr)
+            return 1
+
+        print(f'{name}:')
+        for size, duration in BENCHMARKS[name]():
+            print(f'  {size!s:>18}  {duration * 1000:10.2f} ms')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,7 @@ import pytest
 from _pytest.tmpdir import TempPathFactory
 from _pytest.config import Config
 from _pytest.fixtures import SubRequest
+from _pytest.monkeypatch import MonkeyPatch
 
 from .fixtures import (
     End2EndFixture,
@@ -37,6 +38,12 @@ def pytest_collection_modifyitems(items: List[pytest.Function]) -> None:
             item.add_marker(pytest.mark.timeout(PYTEST_TIMEOUT))
 
 
+# never use the real user cache when running tests
+@pytest.fixture(autouse=True)
+def _grizzly_cli_cache_dir(tmp_path_factory: TempPathFactory, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setenv('GRIZZLY_CLI_CACHE_DIR', str(tmp_path_factory.getbasetemp() / 'grizzly-cli-cache'))
+
+
 def _e2e_fixture(tmp_path_factory: TempPathFactory, request: SubRequest) -> Generator[End2EndFixture, None, None]:
     distributed = request.param if hasattr(request, 'param') else E2E_RUN_MODE == 'dist'
 
@@ -11,7 +11,9 @@ from behave.model import Scenario, Step
 from setuptools_scm import Configuration as SetuptoolsScmConfiguration
 from setuptools_scm._cli import _get_version as setuptools_scm_get_version
 
-from grizzly_cli.utils import rm_rf
+from pytest_mock import MockerFixture
+
+from grizzly_cli.utils import rm_rf, FeatureDocument
 
 __all__ = ['rm_rf']
 
@@ -100,6 +102,17 @@ def create_scenario(name: str, background_steps: List[str], steps: List[str]) ->
     return scenario
 
 
+def patch_feature_document(mocker: MockerFixture, scenarios: List[Scenario], description: Optional[str] = None) -> FeatureDocument:
+    """Any feature file that is loaded will have `scenarios`."""
+    document = FeatureDocument('test.feature', '')
+    document._scenarios = scenarios
+    document._description = description
+
+    mocker.patch('grizzly_cli.utils.FeatureDocument.load', return_value=document)
+
+    return document
+
+
 def get_current_version() -> str:
     root = (Path(__file__).parent / '..').resolve()
 
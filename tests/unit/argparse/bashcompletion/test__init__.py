@@ -1,8 +1,12 @@
+import sys
 import argparse
 import inspect
+import subprocess
 
-from typing import Optional, Generator
+from typing import Optional, Generator, List
 from os import path, chdir, getcwd
+from shutil import which
+from shlex import quote
 
 import pytest
 
@@ -10,7 +14,8 @@ from pytest_mock import MockerFixture
 from _pytest.capture import CaptureFixture, CaptureResult
 from _pytest.tmpdir import TempPathFactory
 
-from grizzly_cli.argparse.bashcompletion import BashCompleteAction, BashCompletionAction, hook
+from grizzly_cli.argparse.bashcompletion import BashCompleteAction, BashCompletionAction, BashCompletionTypes, completion_table, hook
+from grizzly_cli.argparse.bashcompletion.daemon import CLIENT, get_socket_path
 from grizzly_cli.argparse import ArgumentParser
 from grizzly_cli.__main__ import _create_parser
 
@@ -94,6 +99,7 @@ class TestBashCompletionAction:
 
     def test___call__(self, capsys: CaptureFixture) -> None:
         parser = argparse.ArgumentParser(prog='test-prog')
+        parser.add_argument('--verbose', action='store_true')
         action = BashCompletionAction(['--bash-completion'])
 
         with pytest.raises(SystemExit) as e:
@@ -104,11 +110,85 @@ class TestBashCompletionAction:
         bash_script_path = path.join(path.dirname(inspect.getfile(action.__class__)), 'bashcompletion.bash')
 
         with open(bash_script_path, encoding='utf-8') as fd:
-            bash_script = fd.read().replace('bashcompletion_template', parser.prog) + '\n'
+            bash_script = (
+                fd.read()
+                .replace('bashcompletion_template', parser.prog)
+                .replace('bashcompletion_table', '_test_prog_completion')
+                .replace('bashcompletion_socket', str(get_socket_path('test-prog')))
+                .replace('bashcompletion_python', sys.executable)
+                .replace('bashcompletion_client', quote(CLIENT))
+            ) + '\n'
 
         capture = capsys.readouterr()
         assert capture.err == ''
-        assert capture.out == bash_script
+        assert capture.out == bash_script.replace('bashcompletion_declaration', '\n'.join([
+            'declare -gA _test_prog_completion=(',
+            "    ['aliases||-h']='-h --help'",
+            "    ['arity||-h']=0",
+            "    ['aliases||--help']='-h --help'",
+            "    ['arity||--help']=0",
+            "    ['aliases||--verbose']=--verbose",
+            "    ['arity||--verbose']=0",
+            "    ['options|']='-h --help --verbose'",
+            ')',
+        ]))
+
+    @pytest.mark.skipif(which('bash') is None, reason='bash is not available')
+    @pytest.mark.parametrize(
+        'line,expected',
+        [
+            ('grizzly-cli ', '-h --help --version --offline --trace-file --timings init local dist auth'),
+            ('grizzly-cli --', '--help --version --offline --trace-file --timings'),
+            ('grizzly-cli lo', 'local'),
+            ('grizzly-cli --version ', 'all -h --help --offline --trace-file --timings init local dist auth'),
+            ('grizzly-cli --trace-file ', ''),
+            ('grizzly-cli --trace-file = ', ''),
+            ('grizzly-cli --trace-file trace.json --timings ', '-h --help --version --offline init local dist auth'),
+            (
+                'grizzly-cli dist --build --',
+                '--help --workers --id --limit-nofile --health-retries --health-timeout --health-interval --registry --tty --wait-for-worker --project-name',
+            ),
+            ('grizzly-cli dist --workers 3 b', 'build'),
+            ('grizzly-cli dist build --', '--help --no-cache --registry --no-progress --verbose'),
+            (
+                'grizzly-cli local run -T key=value --yes -',
+                (
+                    '-h --help --verbose -T --testdata-variable -e --environment-file --csv-prefix --csv-interval --csv-flush-interval -l --log-file --log-dir '
+                    '--dump --dry-run --plan-output --no-render-cache --workers'
+                ),
+            ),
+            ('grizzly-cli local run -T ', ''),
+            ('grizzly-cli local run --help ', ''),
+            ('grizzly-cli init --yes ', '-h --help --grizzly-version --with-mq'),
+        ]
+    )
+    def test___call___bash(self, line: str, expected: str, capsys: CaptureFixture, tmp_path_factory: TempPathFactory) -> None:
+        test_context = tmp_path_factory.mktemp('bash_context')
+
+        try:
+            parser = _create_parser()
+
+            with pytest.raises(SystemExit):
+                parser.parse_args(['--bash-completion'])
+
+            script = test_context / 'completion.bash'
+            script.write_text(capsys.readouterr().out)
+
+            # none of the cases are dynamic, so the command must not be executed
+            output = subprocess.check_output([
+                'bash', '-c', (
+                    f'source {script}\n'
+                    'grizzly-cli() { echo "grizzly-cli was executed"; }\n'
+                    'read -ra COMP_WORDS <<< "$1"; [[ "$1" == *" " ]] && COMP_WORDS+=("")\n'
+                    'COMP_CWORD=$(( ${#COMP_WORDS[@]} - 1 ))\n'
+                    '_grizzly-cli\n'
+                    'echo "${COMPREPLY[*]}"'
+                ), 'bash', line,
+            ]).decode()
+
+            assert output.strip() == expected
+        finally:
+            rm_rf(test_context)
 
 
 class TestBashCompleteAction:
@@ -216,9 +296,9 @@ class TestBashCompleteAction:
     @pytest.mark.parametrize(
         'input,expected',
         [
-            ('grizzly-cli ', '-h\n--help\n--version\ninit\nlocal\ndist\nauth',),
-            ('grizzly-cli -', '-h\n--help\n--version'),
-            ('grizzly-cli --', '--help\n--version'),
+            ('grizzly-cli ', '-h\n--help\n--version\n--offline\n--trace-file\n--timings\ninit\nlocal\ndist\nauth',),
+            ('grizzly-cli -', '-h\n--help\n--version\n--offline\n--trace-file\n--timings'),
+            ('grizzly-cli --', '--help\n--version\n--offline\n--trace-file\n--timings'),
             ('grizzly-cli lo', 'local'),
             ('grizzly-cli -h', ''),
         ]
@@ -237,25 +317,28 @@ class TestBashCompleteAction:
                 'grizzly-cli local run ',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-y\n--yes\n-e\n--environment-file\n--csv-prefix\n--csv-interval\n'
-                    '--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\ntest.feature\ntest-dir'
+                    '--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers\ntest.feature\ntest-dir'
                 ),
             ),
             (
                 'grizzly-cli local run -',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-y\n--yes\n-e\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n'
-                    '--log-dir\n--dump\n--dry-run'
+                    '--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers'
                 ),
             ),
             (
                 'grizzly-cli local run --',
-                '--help\n--verbose\n--testdata-variable\n--yes\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n--log-file\n--log-dir\n--dump\n--dry-run',
+                (
+                    '--help\n--verbose\n--testdata-variable\n--yes\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers'
+                ),
             ),
             (
                 'grizzly-cli local run --yes',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-e\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n'
-                    '--dump\n--dry-run'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers'
                 ),
             ),
             ('grizzly-cli local run --help --yes', ''),
@@ -264,7 +347,7 @@ class TestBashCompleteAction:
                 'grizzly-cli local run --yes -T key=value',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-e\n--environment-file\n--csv-prefix\n--csv-interval\n'
-                    '--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\ntest.feature\ntest-dir'
+                    '--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers\ntest.feature\ntest-dir'
                 ),
             ),
             ('grizzly-cli local run --yes -T key=value --env', '--environment-file'),
@@ -273,19 +356,26 @@ class TestBashCompleteAction:
             ('grizzly-cli local run --yes -T key=value --environment-file test-', 'test-dir'),
             (
                 'grizzly-cli local run --yes -T key=value --environment-file test-dir',
-                '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run',
+                (
+                    '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers'
+                ),
             ),
             ('grizzly-cli local run --yes -T key=value --environment-file test.', 'test.yaml'),
             (
                 'grizzly-cli local run --yes -T key=value --environment-file test.yaml',
-                '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run',
+                (
+                    '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers'
+                ),
             ),
             ('grizzly-cli local run --yes -T key=value --environment-file test.yaml --test', '--testdata-variable'),
             ('grizzly-cli local run --yes -T key=value --environment-file test.yaml --testdata-variable', ''),
             (
                 'grizzly-cli local run --yes -T key=value --environment-file test.yaml --testdata-variable key=value',
                 (
-                    '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\n'
+                    '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers\n'
                     'test.feature\ntest-dir'
                 ),
             ),
@@ -298,7 +388,10 @@ class TestBashCompleteAction:
             ),
             (
                 f'grizzly-cli local run --yes -T key=value --environment-file test.yaml --testdata-variable key=value test-dir{path.sep}test.feature',
-                '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run',
+                (
+                    '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache\n--workers'
+                ),
             ),
             ('grizzly-cli local run --yes -T key=value --environment-file test.yaml --testdata-variable key=value test.fe', 'test.feature'),
             ('grizzly-cli local run --yes -T key=value --environment-file test.yaml --testdata-variable key=value --help', ''),
@@ -351,25 +444,28 @@ class TestBashCompleteAction:
                 'grizzly-cli dist run ',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-y\n--yes\n-e\n--environment-file\n'
-                    '--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\ntest.feature\ntest-dir'
+                    '--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache\ntest.feature\ntest-dir'
                 ),
             ),
             (
                 'grizzly-cli dist run -',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-y\n--yes\n-e\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n'
-                    '--log-file\n--log-dir\n--dump\n--dry-run'
+                    '--log-file\n--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache'
                 ),
             ),
             (
                 'grizzly-cli dist run --',
-                '--help\n--verbose\n--testdata-variable\n--yes\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n--log-file\n--log-dir\n--dump\n--dry-run',
+                (
+                    '--help\n--verbose\n--testdata-variable\n--yes\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache'
+                ),
             ),
             (
                 'grizzly-cli dist run --yes',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-e\n--environment-file\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n'
-                    '-l\n--log-file\n--log-dir\n--dump\n--dry-run'
+                    '-l\n--log-file\n--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache'
                 )
             ),
             ('grizzly-cli dist run --help --yes', ''),
@@ -378,7 +474,7 @@ class TestBashCompleteAction:
                 'grizzly-cli dist run --yes -T key=value',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n-e\n--environment-file\n--csv-prefix\n--csv-interval\n'
-                    '--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\ntest.feature\ntest-dir'
+                    '--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache\ntest.feature\ntest-dir'
                 ),
             ),
             ('grizzly-cli dist run --yes -T key=value --env', '--environment-file'),
@@ -387,12 +483,18 @@ class TestBashCompleteAction:
             ('grizzly-cli dist run --yes -T key=value --environment-file test-', 'test-dir'),
             (
                 'grizzly-cli dist run --yes -T key=value --environment-file test-dir',
-                '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run',
+                (
+                    '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache'
+                ),
             ),
             ('grizzly-cli dist run --yes -T key=value --environment-file test.', 'test.yaml'),
             (
                 'grizzly-cli dist run --yes -T key=value --environment-file test.yaml',
-                '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n--dump\n--dry-run',
+                (
+                    '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\n-l\n--log-file\n--log-dir\n'
+                    '--dump\n--dry-run\n--plan-output\n--no-render-cache'
+                ),
             ),
             ('grizzly-cli dist run --yes -T key=value --environment-file test.yaml --test', '--testdata-variable'),
             ('grizzly-cli dist run --yes -T key=value --environment-file test.yaml --testdata-variable', ''),
@@ -400,7 +502,7 @@ class TestBashCompleteAction:
                 'grizzly-cli dist run --yes -T key=value --environment-file test.yaml --testdata-variable key=value',
                 (
                     '-h\n--help\n--verbose\n-T\n--testdata-variable\n--csv-prefix\n--csv-interval\n--csv-flush-interval\ntest.feature\ntest-dir\n-l\n--log-file\n'
-                    '--log-dir\n--dump\n--dry-run'
+                    '--log-dir\n--dump\n--dry-run\n--plan-output\n--no-render-cache'
                 ),
             ),
             ('grizzly-cli dist run --yes -T key=value --environment-file test.yaml --testdata-variable key=value test', 'test.feature\ntest-dir'),
@@ -694,3 +796,73 @@ def test_hook(mocker: MockerFixture) -> None:
     with pytest.raises(RuntimeError) as re:
         hook(parser)
     assert 'something else' in str(re)
+
+
+def test_completion_table() -> None:
+    parser = _create_parser()
+    table = completion_table(parser)
+    action = BashCompleteAction(['--bash-complete'])
+
+    # every parser in the live tree should be in the table, and the table should not contain anything else
+    keys: List[str] = []
+
+    def verify(parser: argparse.ArgumentParser, parser_path: str) -> None:
+        options: List[str] = []
+        commands: List[str] = []
+
+        for argument in parser._actions:
+            if argument.help == argparse.SUPPRESS and argument.dest != 'help':
+                continue
+
+            if isinstance(argument, argparse._SubParsersAction):
+                for command, subparser in argument.choices.items():
+                    commands.append(command)
+                    verify(subparser, f'{parser_path} {command}'.strip())
+                continue
+
+            if len(argument.option_strings) == 0:
+                keys.append(f'positional|{parser_path}')
+                assert table[keys[-1]] == ('@file' if isinstance(argument.type, BashCompletionTypes.File) else 'value')
+                continue
+
+            for option in argument.option_strings:
+                options.append(option)
+                keys.extend([f'aliases|{parser_path}|{option}', f'arity|{parser_path}|{option}'])
+                assert table[f'aliases|{parser_path}|{option}'] == ' '.join(argument.option_strings)
+
+                if argument.nargs == 0:
+                    assert table[f'arity|{parser_path}|{option}'] == '0'
+                    assert f'values|{parser_path}|{option}' not in table
+                    continue
+
+                assert table[f'arity|{parser_path}|{option}'] == ('a' if isinstance(argument, argparse._AppendAction) else argument.nargs or '1')
+
+                if isinstance(argument.type, BashCompletionTypes.File):
+                    keys.append(f'values|{parser_path}|{option}')
+                    assert table[keys[-1]] == '@file'
+                elif argument.choices is not None:
+                    keys.append(f'values|{parser_path}|{option}')
+                    assert table[keys[-1]].split(' ') == [str(choice) for choice in argument.choices if choice is not None]
+
+        for group in parser._mutually_exclusive_groups:
+            exclusives = [option for argument in group._group_actions for option in argument.option_strings]
+            for option in exclusives:
+                keys.append(f'exclusive|{parser_path}|{option}')
+                assert table[keys[-1]].split(' ') == [exclusive for exclusive in exclusives if exclusive != option]
+
+        keys.append(f'options|{parser_path}')
+        assert table[keys[-1]].split(' ') == options
+
+        if len(commands) > 0:
+            keys.append(f'commands|{parser_path}')
+            assert table[keys[-1]].split(' ') == commands
+
+        assert sorted(options + commands) == sorted([key for key in action.get_suggestions(parser).keys() if key.startswith('-') or key in commands])
+
+    verify(parser, '')
+
+    assert sorted(table.keys()) == sorted(keys)
+    assert table['commands|'] == 'init local dist auth'
+    assert table['positional|local run'] == '@file'
+    assert table['values|dist run|--environment-file'] == '@file'
+    assert table['exclusive|dist|--build'] == '--force-build --validate-config'
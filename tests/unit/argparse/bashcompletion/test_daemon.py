@@ -0,0 +1,295 @@
+import sys
+import subprocess
+
+from os import chdir, getcwd, environ
+from pathlib import Path
+from shutil import which
+from threading import Thread
+from time import sleep
+
+import pytest
+
+from pytest_mock import MockerFixture
+from _pytest.capture import CaptureFixture
+from _pytest.tmpdir import TempPathFactory
+
+from grizzly_cli.argparse.bashcompletion import daemon
+from grizzly_cli.__main__ import _create_parser
+
+from tests.helpers import rm_rf
+
+
+CWD = getcwd()
+
+
+def test_enabled(mocker: MockerFixture) -> None:
+    mocker.patch.dict(environ, {}, clear=False)
+    environ.pop('GRIZZLY_CLI_COMPLETION_DAEMON', None)
+
+    assert not daemon.enabled()
+
+    for value in ['1', 'true', 'True', 'yes']:
+        environ['GRIZZLY_CLI_COMPLETION_DAEMON'] = value
+        assert daemon.enabled()
+
+    environ['GRIZZLY_CLI_COMPLETION_DAEMON'] = 'false'
+    assert not daemon.enabled()
+
+
+def test_get_socket_path() -> None:
+    socket_path = daemon.get_socket_path('grizzly-cli')
+
+    assert socket_path.name == 'grizzly_cli.sock'
+    assert socket_path.parent == Path(environ['GRIZZLY_CLI_CACHE_DIR']) / 'completion'
+
+    # only the user can connect to the socket
+    socket_path.parent.chmod(0o775)
+    assert not daemon.is_private(socket_path.parent)
+
+    socket_path = daemon.get_socket_path('grizzly-cli')
+    assert socket_path.parent.stat().st_mode & 0o777 == 0o700
+    assert daemon.is_private(socket_path.parent)
+
+
+def test_get_installed_version(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    import grizzly_cli
+
+    test_context = tmp_path_factory.mktemp('daemon_context')
+
+    try:
+        assert daemon.get_installed_version() == grizzly_cli.__version__
+
+        mocker.patch.object(grizzly_cli, '__file__', str(test_context / '__init__.py'))
+        assert daemon.get_installed_version() is None
+
+        (test_context / '__version__.py').write_text("__version__ = version = '2.0.0'\n__version_tuple__ = version_tuple = (2, 0, 0)\n")
+        assert daemon.get_installed_version() == '2.0.0'
+    finally:
+        rm_rf(test_context)
+
+
+def test_start(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('daemon_context')
+    socket_path = test_context / 'test.sock'
+
+    mocker.patch('grizzly_cli.argparse.bashcompletion.daemon.get_socket_path', return_value=socket_path)
+    popen_mock = mocker.patch('grizzly_cli.argparse.bashcompletion.daemon.subprocess.Popen', return_value=None)
+    is_running_mock = mocker.patch('grizzly_cli.argparse.bashcompletion.daemon.is_running', return_value=True)
+
+    try:
+        daemon.start('grizzly-cli')
+        popen_mock.assert_not_called()
+
+        # stale socket is removed, and the server is started with the same command as the current process
+        is_running_mock.return_value = False
+        socket_path.write_text('')
+        mocker.patch.object(sys.modules['__main__'], '__spec__', None)
+        assert daemon.get_command() == [sys.executable, sys.argv[0]]
+
+        daemon.start('grizzly-cli')
+
+        assert not socket_path.exists()
+        popen_mock.assert_called_once_with(
+            [sys.executable, sys.argv[0], '--bash-complete-daemon'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    finally:
+        rm_rf(test_context)
+
+
+def test_handle(capsys: CaptureFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('daemon_context')
+    (test_context / 'test.yaml').write_text('test:')
+    (test_context / 'test.feature').write_text('Feature:')
+
+    parser = _create_parser()
+
+    try:
+        assert daemon.handle(parser, b'') == b''
+        assert daemon.handle(parser, str(test_context).encode()) == b''
+
+        request = '\0'.join([str(test_context), 'grizzly-cli', 'local', 'run', '--bash-complete=grizzly-cli local run -e ', ''])
+        assert daemon.handle(parser, request.encode()) == b'test.yaml\n'
+        assert getcwd() == str(test_context)
+
+        # errors are not part of the response
+        request = '\0'.join([str(test_context), 'grizzly-cli', 'foobar'])
+        assert daemon.handle(parser, request.encode()) == b''
+
+        capture = capsys.readouterr()
+        assert capture.out == ''
+        assert capture.err == ''
+    finally:
+        chdir(CWD)
+        rm_rf(test_context)
+
+
+def test_serve(tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('daemon_context')
+    (test_context / 'test.yaml').write_text('test:')
+    socket_path = test_context / 'test.sock'
+
+    parser = _create_parser()
+    server = Thread(target=daemon.serve, args=(parser, socket_path, 1.0), daemon=True)
+
+    try:
+        server.start()
+
+        for _ in range(50):
+            if socket_path.exists():
+                break
+            sleep(0.01)
+
+        assert daemon.is_running(socket_path)
+        assert getattr(daemon, 'serving')
+
+        # another server can not be started on the same socket
+        daemon.serve(parser, socket_path, 1.0)
+        assert getattr(daemon, 'serving')
+
+        request = '\0'.join([str(test_context), 'grizzly-cli', 'local', 'run', '--bash-complete=grizzly-cli local run -e '])
+        output = subprocess.check_output([sys.executable, '-I', '-S', '-c', daemon.CLIENT, str(socket_path)], input=request.encode())
+        assert output == b'test.yaml\n'
+
+        # exits when there has not been any requests within the idle timeout
+        server.join(timeout=5)
+        assert not server.is_alive()
+        assert not daemon.serving
+        assert not socket_path.exists()
+        assert not daemon.is_running(socket_path)
+
+        # not started if other users can access the socket directory
+        test_context.chmod(0o770)
+        daemon.serve(parser, socket_path, 1.0)
+        assert not daemon.serving
+        assert not socket_path.exists()
+    finally:
+        chdir(CWD)
+        rm_rf(test_context)
+
+
+def test_serve_upgraded(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('daemon_context')
+    socket_path = test_context / 'test.sock'
+
+    get_installed_version_mock = mocker.patch('grizzly_cli.argparse.bashcompletion.daemon.get_installed_version', return_value='1.0.0')
+    execute_mock = mocker.patch('grizzly_cli.argparse.bashcompletion.daemon.execute', return_value=b'test.yml\n')
+
+    parser = _create_parser()
+    server = Thread(target=daemon.serve, args=(parser, socket_path, 5.0), daemon=True)
+
+    try:
+        server.start()
+
+        for _ in range(50):
+            if socket_path.exists():
+                break
+            sleep(0.01)
+
+        # another version is installed, request is answered by the installed version, and the server exits
+        get_installed_version_mock.return_value = '2.0.0'
+
+        request = '\0'.join([str(test_context), 'grizzly-cli', 'local', 'run', '--bash-complete=grizzly-cli local run -e '])
+        output = subprocess.check_output([sys.executable, '-I', '-S', '-c', daemon.CLIENT, str(socket_path)], input=request.encode())
+        assert output == b'test.yml\n'
+        execute_mock.assert_called_once_with(request.encode())
+
+        server.join(timeout=1)
+        assert not server.is_alive()
+        assert not socket_path.exists()
+    finally:
+        chdir(CWD)
+        rm_rf(test_context)
+
+
+def test_execute(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('daemon_context')
+    (test_context / 'test.yaml').write_text('test:')
+
+    try:
+        assert daemon.execute(b'') == b''
+
+        # executed as the current process was started, from the working directory in the request
+        request = '\0'.join([str(test_context), 'grizzly-cli', 'local', 'run', '--bash-complete=grizzly-cli local run -e '])
+        script = test_context / 'grizzly-cli'
+        script.write_text('import sys\nfrom grizzly_cli.__main__ import main\nsys.exit(main())\n')
+        mocker.patch.object(sys.modules['__main__'], '__spec__', None)
+        mocker.patch.object(sys, 'argv', [str(script)])
+        assert daemon.execute(request.encode()) == b'test.yaml\n'
+    finally:
+        rm_rf(test_context)
+
+
+def test_bash_complete_starts_daemon(mocker: MockerFixture, capsys: CaptureFixture) -> None:
+    start_mock = mocker.patch('grizzly_cli.argparse.bashcompletion.daemon.start', return_value=None)
+    mocker.patch.dict(environ, {'GRIZZLY_CLI_COMPLETION_DAEMON': 'false'})
+
+    parser = _create_parser()
+
+    with pytest.raises(SystemExit):
+        parser.parse_args(['local', 'run', '--bash-complete=grizzly-cli local run -'])
+    start_mock.assert_not_called()
+
+    environ['GRIZZLY_CLI_COMPLETION_DAEMON'] = 'true'
+
+    with pytest.raises(SystemExit):
+        parser.parse_args(['local', 'run', '--bash-complete=grizzly-cli local run -'])
+    start_mock.assert_called_once_with('grizzly-cli')
+
+    # not started by requests the daemon handles
+    start_mock.reset_mock()
+    mocker.patch('grizzly_cli.argparse.bashcompletion.daemon.serving', True)
+
+    with pytest.raises(SystemExit):
+        parser.parse_args(['local', 'run', '--bash-complete=grizzly-cli local run -'])
+    start_mock.assert_not_called()
+
+    capsys.readouterr()
+
+
+@pytest.mark.skipif(which('bash') is None, reason='bash is not available')
+def test_bashcompletion(capsys: CaptureFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('daemon_context')
+    (test_context / 'test.yaml').write_text('test:')
+
+    parser = _create_parser()
+
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--bash-completion'])
+
+    script = test_context / 'completion.bash'
+    script.write_text(capsys.readouterr().out)
+
+    def complete(line: str) -> str:
+        return subprocess.check_output([
+            'bash', '-c', (
+                f'source {script}\n'
+                'grizzly-cli() { echo "grizzly-cli was executed"; }\n'
+                'read -ra COMP_WORDS <<< "$1"; [[ "$1" == *" " ]] && COMP_WORDS+=("")\n'
+                'COMP_CWORD=$(( ${#COMP_WORDS[@]} - 1 ))\n'
+                '_grizzly-cli\n'
+                'echo "${COMPREPLY[*]}"'
+            ), 'bash', line,
+        ], cwd=test_context).decode().strip()
+
+    server = Thread(target=daemon.serve, args=(parser, daemon.get_socket_path('grizzly-cli'), 2.0), daemon=True)
+
+    try:
+        # daemon is not running
+        assert complete('grizzly-cli local run -e ') == 'grizzly-cli was executed'
+
+        server.start()
+
+        for _ in range(50):
+            if daemon.get_socket_path('grizzly-cli').exists():
+                break
+            sleep(0.01)
+
+        assert complete('grizzly-cli local run -e ') == 'test.yaml'
+    finally:
+        server.join(timeout=5)
+        chdir(CWD)
+        rm_rf(test_context)
@@ -1,11 +1,14 @@
+import os
+
 from os import chdir, getcwd, sep
 from argparse import ArgumentTypeError
+from json import loads as jsonloads, dumps as jsondumps
 
 import pytest
 
 from _pytest.tmpdir import TempPathFactory
 
-from grizzly_cli.argparse.bashcompletion.types import BashCompletionTypes
+from grizzly_cli.argparse.bashcompletion.types import BashCompletionTypes, FileIndex, FILE_INDEX_TTL
 
 from tests.helpers import rm_rf
 
@@ -114,3 +117,91 @@ class TestBashCompletionTypes:
             finally:
                 chdir(CWD)
                 rm_rf(test_context_root)
+
+        def test_list_files_pruned(self, tmp_path_factory: TempPathFactory) -> None:
+            test_context = tmp_path_factory.mktemp('pruned_context')
+            (test_context / 'features' / 'requests' / 'logs').mkdir(parents=True)
+            (test_context / 'features' / 'requests' / 'logs' / 'old.yaml').write_text('')
+            (test_context / 'features' / 'requests' / 'payload.j2.json').write_text('{}')
+            (test_context / 'environments' / 'nested').mkdir(parents=True)
+            (test_context / 'environments' / 'nested' / 'local.yaml').write_text('')
+            # links to a parent directory
+            (test_context / 'environments' / 'nested' / 'loop').symlink_to(test_context / 'environments', target_is_directory=True)
+            (test_context / 'logs').mkdir()
+            (test_context / 'logs' / 'logging.yaml').write_text('')
+            (test_context / 'node_modules' / 'package').mkdir(parents=True)
+            (test_context / 'node_modules' / 'package' / 'package.yaml').write_text('')
+            (test_context / 'venv').mkdir()
+            (test_context / 'venv' / 'pyvenv.cfg').write_text('')
+            (test_context / 'venv' / 'site.yaml').write_text('')
+            (test_context / '.git').mkdir()
+            (test_context / '.git' / 'config.yaml').write_text('')
+            (test_context / 'test space (1).yaml').write_text('')
+            test_context_root = str(test_context)
+
+            chdir(test_context_root)
+
+            try:
+                FileIndex._indexes.clear()
+                impl = BashCompletionTypes.File('*.yaml')
+
+                # only log directories of scenarios are pruned
+                assert impl.list_files(None) == {
+                    'environments': 'dir',
+                    'logs': 'dir',
+                    'test\\ space\\ \\(1\\).yaml': 'file',
+                }
+                assert impl.list_files('test\\ sp') == {
+                    'test\\ space\\ \\(1\\).yaml': 'file',
+                }
+
+                # pruned directories are only listed when explicitly typed
+                assert impl.list_files(f'features{sep}requests{sep}') == {}
+                assert impl.list_files(f'node_modules{sep}package{sep}') == {
+                    f'node_modules{sep}package{sep}package.yaml': 'file',
+                }
+                assert impl.list_files(f'.git{sep}') == {}
+                assert impl.list_files(f'{sep}etc{sep}') == {}
+
+                # only directories along the typed prefix, or that had to be searched for matching files, has been listed
+                index = FileIndex.get(test_context_root)
+                assert sorted(index.directories.keys()) == sorted([
+                    '',
+                    'environments',
+                    f'environments{sep}nested',
+                    'features',
+                    f'features{sep}requests',
+                    'logs',
+                    f'node_modules{sep}package',
+                    'venv',
+                ])
+
+                # index is persisted, and reused by the next completion
+                persisted = jsonloads(index.file.read_text())
+                assert sorted(persisted['directories'].keys()) == sorted(index.directories.keys())
+
+                FileIndex._indexes.clear()
+                index = FileIndex.get(test_context_root)
+                assert index.directories.keys() == persisted['directories'].keys()
+
+                # stale listings are not used when directory has been modified
+                (test_context / 'environments' / 'nested' / 'test.yaml').write_text('')
+                stat = os.stat(test_context / 'environments' / 'nested')
+                os.utime(test_context / 'environments' / 'nested', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+                assert impl.list_files(f'environments{sep}nested{sep}') == {
+                    f'environments{sep}nested{sep}local.yaml': 'file',
+                    f'environments{sep}nested{sep}loop': 'dir',
+                    f'environments{sep}nested{sep}test.yaml': 'file',
+                }
+
+                # expired index is not used
+                persisted = jsonloads(index.file.read_text())
+                persisted['timestamp'] -= FILE_INDEX_TTL
+                index.file.write_text(jsondumps(persisted))
+                FileIndex._indexes.clear()
+                assert FileIndex.get(test_context_root).directories == {}
+            finally:
+                FileIndex._indexes.clear()
+                chdir(CWD)
+                rm_rf(test_context_root)
@@ -12,7 +12,7 @@ from _pytest.capture import CaptureFixture
 from _pytest.tmpdir import TempPathFactory
 from pytest_mock import MockerFixture
 
-from grizzly_cli.utils import RunCommandResult, rm_rf
+from grizzly_cli.utils import RunCommandResult, ContainerImage, rm_rf
 from grizzly_cli.distributed import create_parser, distributed_run, distributed
 
 
@@ -20,7 +20,7 @@ CWD = getcwd()
 
 
 def test_distributed(mocker: MockerFixture) -> None:
-    run_mocked = mocker.patch('grizzly_cli.distributed.run', return_value=0)
+    run_mocked = mocker.patch('grizzly_cli.run.run', return_value=0)
     build_mocked = mocker.patch('grizzly_cli.distributed.do_build', return_value=5)
     clean_mocked = mocker.patch('grizzly_cli.distributed.do_clean', return_value=10)
 
@@ -66,7 +66,7 @@ def test_distributed_run(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
     mocker.patch('grizzly_cli.distributed.getuser', return_value='test-user')
     get_default_mtu_mock = mocker.patch('grizzly_cli.distributed.get_default_mtu', return_value=None)
     do_build_mock = mocker.patch('grizzly_cli.distributed.do_build', return_value=None)
-    list_images_mock = mocker.patch('grizzly_cli.distributed.list_images', return_value=None)
+    inspect_image_mock = mocker.patch('grizzly_cli.distributed.inspect_image', return_value=None)
 
     import grizzly_cli.distributed
     mocker.patch.object(grizzly_cli.distributed, 'EXECUTION_CONTEXT', '/tmp/execution-context')
@@ -117,7 +117,7 @@ def test_distributed_run(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
         do_build_mock.return_value = 255
         check_output_mock.return_value = '{}'
         get_default_mtu_mock.return_value = None
-        list_images_mock.return_value = {}
+        inspect_image_mock.return_value = None
 
         assert distributed_run(arguments, {}, {}) == 255
         capture = capsys.readouterr()
@@ -126,6 +126,7 @@ def test_distributed_run(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
             '!! unable to determine MTU, try manually setting GRIZZLY_MTU environment variable if anything other than 1500 is needed\n'
             '!! failed to build grizzly-cli-test-project, rc=255\n'
         )
+        inspect_image_mock.assert_called_with(arguments, 'grizzly-cli-test-project:test-user')
         assert environ.get('GRIZZLY_MTU', None) == '1500'
         assert environ.get('GRIZZLY_EXECUTION_CONTEXT', None) == '/tmp/execution-context'
         assert environ.get('GRIZZLY_STATIC_CONTEXT', None) == '/tmp/static-context'
@@ -177,7 +178,7 @@ def test_distributed_run(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
         check_output_mock.return_value = None
         check_output_mock.side_effect = ['{}', '{}', '<!-- here is the missing logs -->']
         get_default_mtu_mock.return_value = '1400'
-        list_images_mock.return_value = {'grizzly-cli-test-project': {'test-user': {}}}
+        inspect_image_mock.return_value = ContainerImage(name='grizzly-cli-test-project:test-user', id='sha256:a05f8cc8454b', created='2021-12-02T22:46:55Z')
 
         assert distributed_run(
             arguments,
@@ -276,7 +277,7 @@ def test_distributed_run(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
         check_output_mock.return_value = None
         check_output_mock.side_effect = [json.dumps([{'Source': '/tmp/mount-context', 'Destination': '/tmp'}]), '13']
         get_default_mtu_mock.return_value = '1800'
-        list_images_mock.return_value = {'grizzly-cli-test-project': {'test-user': {}}}
+        inspect_image_mock.return_value = ContainerImage(name='grizzly-cli-test-project:test-user', id='sha256:a05f8cc8454b', created='2021-12-02T22:46:55Z')
 
         assert distributed_run(
             arguments,
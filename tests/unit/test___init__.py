@@ -31,7 +31,6 @@ def test___import__(tmp_path_factory: TempPathFactory, mocker: MockerFixture) ->
         assert grizzly_cli.MOUNT_CONTEXT == '/var/tmp'
         assert grizzly_cli.STATIC_CONTEXT == static_context
         assert grizzly_cli.PROJECT_NAME == path.basename(test_context_root)
-        assert len(grizzly_cli.SCENARIOS) == 0
     finally:
         chdir(CWD)
         rm_rf(test_context_root)
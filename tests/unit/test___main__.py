@@ -1,9 +1,11 @@
+import re
 import sys
+import json
+import subprocess
 
-from hashlib import sha1
-from typing import Dict, Optional, cast
+from typing import Dict, List, Optional, Set, Tuple, cast
 from argparse import ArgumentParser as CoreArgumentParser, Namespace
-from os import getcwd, environ, chdir, path
+from os import getcwd, environ, chdir
 
 import pytest
 
@@ -11,7 +13,8 @@ from _pytest.capture import CaptureFixture
 from _pytest.tmpdir import TempPathFactory
 from pytest_mock import MockerFixture
 
-from grizzly_cli.__main__ import _create_parser, _parse_arguments, _inject_additional_arguments_from_metadata, main
+from grizzly_cli.__main__ import _create_parser, _get_parser, _parse_arguments, _inject_additional_arguments_from_metadata, main
+from grizzly_cli.tracing import tracer
 
 from tests.helpers import rm_rf
 
@@ -30,8 +33,12 @@ def test__create_parser() -> None:
     assert sorted([option_string for action in parser._actions for option_string in action.option_strings]) == sorted([
         '-h', '--help',
         '--version',
+        '--offline',
+        '--trace-file',
+        '--timings',
         '--md-help',
         '--bash-completion',
+        '--bash-complete-daemon',
     ])
     assert sorted([action.dest for action in parser._actions if len(action.option_strings) == 0]) == ['command']
     subparser = parser._subparsers._group_actions[0]
@@ -64,6 +71,7 @@ def test__create_parser() -> None:
     assert getattr(local_parser, 'prog', None) == 'grizzly-cli local'
     assert sorted([option_string for action in local_parser._actions for option_string in action.option_strings]) == sorted([
         '-h', '--help',
+        '--workers',
     ])
     assert len(local_parser._subparsers._group_actions) == 1
     local_subparser = local_parser._subparsers._group_actions[0]
@@ -138,6 +146,10 @@ def test__create_parser() -> None:
             '-l', '--log-dir', '--log-file',
             '--dump',
             '--dry-run',
+            '--plan-output',
+            '--no-render-cache',
+            # worker processes in local mode can be specified before, or after, run
+            *(['--workers'] if parent == 'local' else []),
         ])
         assert sorted([action.dest for action in run_parser._actions if len(action.option_strings) == 0]) == ['file']
 
@@ -183,14 +195,13 @@ def test__parse_argument(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
         assert se.value.code == 2
         capture = capsys.readouterr()
         err = capture.err.split('\n')
-        assert len(err) == 3
         assert err[0].startswith('usage: grizzly-cli')
-        assert err[1] == (
+        assert err[-2] == (
             "grizzly-cli: error: argument --version: invalid choice: 'foo' (choose from 'all')"
         ) or (
             "grizzly-cli: error: argument --version: invalid choice: 'foo' (choose from all)"
         )
-        assert err[2] == ''
+        assert err[-1] == ''
         assert capture.out == ''
 
         requirements_file = test_context / 'requirements.txt'
@@ -243,22 +254,18 @@ def test__parse_argument(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
             '    └── locust 2.2.1\n'
         )
 
-        def mocked_mkdtemp(prefix: Optional[str] = '') -> str:
-            tmp_dir = path.join(test_context, f'{prefix}test')
-
-            return tmp_dir
+        # repository content, as read from the mirror with `git show <revision>:<file>`
+        git_files = {
+            'pyproject.toml': '',
+            'setup.cfg': 'name = grizzly-loadtester\nversion = 0.0.0\n',
+            'requirements.txt': 'locust==2.8.4  \\ \n',
+        }
 
-        mocker.patch('grizzly_cli.utils.mkdtemp', mocked_mkdtemp)
-        mocker.patch('grizzly_cli.utils.subprocess.check_call', return_value=0)
-        mocker.patch('grizzly_cli.utils.subprocess.check_output', return_value='main\n')
+        mocker.patch('grizzly_cli.utils.get_git_mirror', return_value=test_context / 'grizzly.git')
+        mocker.patch('grizzly_cli.utils.subprocess.check_output', return_value='f2f5b6a\n')
+        mocker.patch('grizzly_cli.utils.git_show', side_effect=lambda repo, revision, file: git_files.get(file, None))
 
         repo = 'git+https://git@github.com/biometria-se/grizzly.git@main#egg=grizzly-loadtester'
-        repo_suffix = sha1(repo.encode('utf-8')).hexdigest()
-        repo_dir = test_context / 'grizzly-cli-test' / f'grizzly-loadtester_{repo_suffix}'
-        repo_dir.mkdir(parents=True)
-        (repo_dir / 'pyproject.toml').touch()
-        (repo_dir / 'setup.cfg').write_text('name = grizzly-loadtester\nversion = 0.0.0\n')
-        (repo_dir / 'requirements.txt').write_text('locust==2.8.4  \\ \n')
 
         requirements_file.unlink()
         requirements_file.write_text(f'{repo}\n')
@@ -279,12 +286,6 @@ def test__parse_argument(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
         )
 
         repo = 'git+https://git@github.com/biometria-se/grizzly.git@main#egg=grizzly-loadtester[mq,dev]'
-        repo_suffix = sha1(repo.encode('utf-8')).hexdigest()
-        repo_dir = test_context / 'grizzly-cli-test' / f'grizzly-loadtester__mq_dev___{repo_suffix}'
-        repo_dir.mkdir(parents=True)
-        (repo_dir / 'pyproject.toml').touch()
-        (repo_dir / 'setup.cfg').write_text('name = grizzly-loadtester\nversion = 0.0.0\n')
-        (repo_dir / 'requirements.txt').write_text('locust==2.8.4  \\ \n')
 
         requirements_file.unlink()
         requirements_file.write_text(f'{repo}\n')
@@ -461,6 +462,28 @@ def test__parse_argument(capsys: CaptureFixture, mocker: MockerFixture, tmp_path
         assert environ.get('TESTDATA_VARIABLE_key', None) == 'value'
         # // -T/--testdata-variable
 
+        # more than one feature file
+        (test_context / 'other.feature').write_text('Feature: other')
+        sys.argv = ['grizzly-cli', 'local', 'run', 'test.feature', 'other.feature']
+        mocker.patch('grizzly_cli.__main__.which', side_effect=['behave'])
+
+        arguments = _parse_arguments()
+        assert arguments.file == 'test.feature'
+        assert arguments.files == ['test.feature', 'other.feature']
+
+        sys.argv = ['grizzly-cli', 'local', 'run', 'test.feature', 'other.feature', '--dump', 'output.feature']
+        mocker.patch('grizzly_cli.__main__.which', side_effect=['behave'])
+
+        with pytest.raises(SystemExit) as se:
+            _parse_arguments()
+        assert se.type == SystemExit
+        assert se.value.code == 2
+
+        capture = capsys.readouterr()
+        assert capture.out == ''
+        assert capture.err == 'grizzly-cli: error: argument --dump: can only dump to a file when running one feature file\n'
+        # // more than one feature file
+
         mocker.patch('grizzly_cli.__main__.get_distributed_system', side_effect=['docker'] * 3)
 
         sys.argv = ['grizzly-cli', 'dist', 'build']
@@ -558,6 +581,55 @@ def test__inject_additional_arguments_from_metadata(tmp_path_factory: TempPathFa
         capture = capsys.readouterr()
         assert capture.err == ''
         assert capture.out == ''
+
+        # metadata from all feature files, same metadata only once
+        other_feature_file = test_context / 'other.feature'
+        other_feature_file.write_text('# grizzly-cli dist --health-interval 5\n# grizzly-cli run --verbose\nFeature:\n')
+        sys.argv = ['grizzly-cli', 'dist', 'run', 'test.feature', 'other.feature']
+
+        orig_args = _parse_arguments()
+        parse_args_spy = mocker.spy(_get_parser(), 'parse_args')
+        args = _inject_additional_arguments_from_metadata(orig_args)
+
+        assert args.health_timeout == 100
+        assert args.health_retries == 101
+        assert args.health_interval == 5
+        assert args.verbose
+        assert args.files == ['test.feature', 'other.feature']
+        parse_args_spy.assert_called_once()
+        assert parse_args_spy.call_args.args[0].count('--health-interval') == 1
+        assert sys.argv == ['grizzly-cli', 'dist', 'run', 'test.feature', 'other.feature']
+
+        capture = capsys.readouterr()
+        assert capture.err == ''
+        assert capture.out == ''
+
+        # parser is only created once, and injecting arguments has no side effects
+        create_parser_spy = mocker.spy(sys.modules['grizzly_cli.__main__'], '_create_parser')
+        get_distributed_system_spy = mocker.patch('grizzly_cli.__main__.get_distributed_system', return_value='docker')
+        setup_logging_spy = mocker.patch('grizzly_cli.__main__.setup_logging', return_value=None)
+        ask_yes_no_spy = mocker.patch('grizzly_cli.__main__.ask_yes_no', return_value=None)
+        assert _get_parser() is _get_parser()
+
+        test_feature_file.write_text('# grizzly-cli dist --limit-nofile 100\n# grizzly-cli run -T foo=bar --log-file test.log\nFeature:\n')
+        environ.pop('TESTDATA_VARIABLE_foo', None)
+        sys.argv = ['grizzly-cli', 'dist', 'run', 'test.feature']
+        orig_args = _parse_arguments()
+        get_distributed_system_spy.reset_mock()
+        setup_logging_spy.reset_mock()
+
+        args = _inject_additional_arguments_from_metadata(orig_args)
+
+        assert args.limit_nofile == 100
+        assert args.log_file == 'test.log'
+        assert args.testdata_variable == ['foo=bar']
+        assert sys.argv == ['grizzly-cli', 'dist', 'run', 'test.feature']
+        create_parser_spy.assert_not_called()
+        get_distributed_system_spy.assert_not_called()
+        setup_logging_spy.assert_not_called()
+        ask_yes_no_spy.assert_not_called()
+        assert 'TESTDATA_VARIABLE_foo' not in environ
+        assert capsys.readouterr().out == ''
     finally:
         chdir(CWD)
         rm_rf(test_context)
@@ -571,7 +643,8 @@ def test_main(mocker: MockerFixture, capsys: CaptureFixture) -> None:
         'grizzly_cli.__main__._inject_additional_arguments_from_metadata',
         return_value=Namespace(command='dist', file='test.feature'),
     )
-    mocker.patch('grizzly_cli.__main__._parse_arguments', side_effect=[
+    prepare_arguments_mock = mocker.patch('grizzly_cli.__main__._prepare_arguments', return_value=None)
+    mocker.patch('grizzly_cli.__main__._read_arguments', side_effect=[
         Namespace(command='local'),
         Namespace(command='dist'),
         Namespace(command='init'),
@@ -625,3 +698,118 @@ def test_main(mocker: MockerFixture, capsys: CaptureFixture) -> None:
     assert dist_mock.call_count == 2
     assert init_mock.call_count == 1
     assert inject_additional_arguments_from_metadata_mock.call_count == 1
+
+    # environment is only prepared once, for the arguments with injected metadata arguments
+    args, _ = prepare_arguments_mock.call_args_list[-1]
+    assert args[0] is inject_additional_arguments_from_metadata_mock.return_value
+
+
+def test_main_tracing(mocker: MockerFixture, capsys: CaptureFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    trace_file = test_context / 'trace.json'
+
+    mocker.patch('grizzly_cli.__main__.local', side_effect=[0, ValueError('hello there'), 3])
+    mocker.patch('grizzly_cli.__main__._prepare_arguments', return_value=None)
+    mocker.patch('grizzly_cli.__main__._read_arguments', side_effect=[
+        Namespace(command='local', trace_file=str(trace_file), timings=False),
+        Namespace(command='local', trace_file=None, timings=True),
+        Namespace(command='local', trace_file=str(test_context / 'missing' / 'trace.json'), timings=False),
+    ])
+
+    tracer.reset()
+
+    try:
+        assert main() == 0
+
+        capture = capsys.readouterr()
+        assert capture.err == ''
+        assert capture.out == ''
+
+        trace = json.loads(trace_file.read_text())
+        assert [event['name'] for event in trace['traceEvents']] == ['parse arguments', 'local']
+        for event in trace['traceEvents']:
+            assert event['ph'] == 'X'
+
+        assert main() == 1
+
+        capture = capsys.readouterr()
+        assert capture.out == '\nhello there\n\n!! aborted grizzly-cli\n'
+        # timings does not mix with the output of the command
+        lines = capture.err.split('\n')
+        assert lines[0] == ''
+        assert lines[1].startswith('phase')
+        assert [line.split(' ', 1)[0] for line in lines[3:-1]] == ['parse', 'local']
+        assert len(lines) == 6
+
+        # failing to write the trace file does not change the return code
+        assert main() == 3
+
+        capture = capsys.readouterr()
+        assert capture.out == ''
+        assert capture.err.startswith(f'!! unable to write trace file {test_context.as_posix()}/missing/trace.json: ')
+    finally:
+        tracer.reset()
+        rm_rf(test_context)
+
+
+def _import_times(argv: List[str], cwd: str, env: Dict[str, str]) -> Tuple[Set[str], float]:
+    """Modules imported when running grizzly-cli with `argv`, and how long it took to import them, in milliseconds."""
+    result = subprocess.run(
+        [
+            sys.executable, '-X', 'importtime', '-c',
+            'import sys; sys.stderr.write("-- grizzly-cli\\n"); from grizzly_cli.__main__ import main; sys.exit(main())',
+            *argv,
+        ],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        universal_newlines=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    modules: Set[str] = set()
+    import_time = 0
+    started = False
+
+    for line in result.stderr.splitlines():
+        # everything before is interpreter startup
+        started = started or line == '-- grizzly-cli'
+
+        match = re.match(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$', line)
+        if match is None:
+            continue
+
+        _, cumulative, indent, module = match.groups()
+
+        if not started:
+            continue
+
+        modules.add(module)
+
+        # only top level imports, nested imports are included in their cumulative time
+        if len(indent) == 1:
+            import_time += int(cumulative)
+
+    return modules, import_time / 1000
+
+
+@pytest.mark.parametrize('argv,forbidden,budget', [
+    (['--version'], ['azure', 'jinja2', 'jinja2_simple_tags', 'behave', 'yaml', 'requests', 'tomli', 'pyotp', 'grizzly_cli.run'], 500),
+    (['auth'], ['azure', 'jinja2', 'jinja2_simple_tags', 'behave', 'yaml', 'requests', 'tomli', 'grizzly_cli.run'], 500),
+    (['local', 'run', 'test.feature', '--dump'], ['azure', 'requests', 'tomli', 'pyotp'], 1000),
+])
+def test_import_time(tmp_path_factory: TempPathFactory, argv: List[str], forbidden: List[str], budget: int) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    (test_context / 'test.feature').write_text('Feature: test\n    Scenario: test\n        Given a user of type "RestApi" load testing "http://localhost"\n')
+
+    env = environ.copy()
+    env.update({'OTP_SECRET': 'JBSWY3DPEHPK3PXP'})
+
+    try:
+        modules, import_time = _import_times(argv, str(test_context), env)
+
+        assert 'grizzly_cli.__main__' in modules
+        assert sorted(module for module in modules if module.split('.', 1)[0] in forbidden or module in forbidden) == []
+        assert import_time < budget, f'importing modules for grizzly-cli {" ".join(argv)} took {import_time:.0f} ms, budget is {budget} ms'
+    finally:
+        rm_rf(test_context)
@@ -30,7 +30,7 @@ def test_auth_env(capsys: CaptureFixture, mocker: MockerFixture) -> None:
         assert str(ve.value) == 'unable to generate TOTP code: Non-base32 digit found'
 
         environ['OTP_SECRET'] = 'asdfasdf'
-        mocker.patch('grizzly_cli.auth.TOTP.now', return_value=111111)
+        mocker.patch('pyotp.TOTP.now', return_value=111111)
 
         assert auth(arguments) == 0
 
@@ -69,7 +69,7 @@ def test_auth_stdin(capsys: CaptureFixture, mocker: MockerFixture) -> None:
 
     capsys.readouterr()
 
-    mocker.patch('grizzly_cli.auth.TOTP.now', return_value=222222)
+    mocker.patch('pyotp.TOTP.now', return_value=222222)
     mocker.patch('sys.stdin.read', return_value='asdfasdf')
 
     assert auth(arguments) == 0
@@ -117,7 +117,7 @@ def test_auth_file(capsys: CaptureFixture, mocker: MockerFixture, tmp_path_facto
     assert str(ve.value) == 'unable to generate TOTP code: Non-base32 digit found'
 
     file.write_text('asdfasdf')
-    mocker.patch('grizzly_cli.auth.TOTP.now', return_value=333333)
+    mocker.patch('pyotp.TOTP.now', return_value=333333)
 
     assert auth(arguments) == 0
 
@@ -1,6 +1,6 @@
 
 from os import getcwd, environ
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 
 import pytest
 
@@ -8,14 +8,15 @@ from _pytest.tmpdir import TempPathFactory
 from pytest_mock import MockerFixture
 
 from grizzly_cli.utils import RunCommandResult, rm_rf
-from grizzly_cli.local import create_parser, local_run, local
+from grizzly_cli.local import create_parser, local_run, local, workers_type
+from grizzly_cli.__main__ import _read_arguments
 
 
 CWD = getcwd()
 
 
 def test_local(mocker: MockerFixture) -> None:
-    run_mocked = mocker.patch('grizzly_cli.local.run', return_value=0)
+    run_mocked = mocker.patch('grizzly_cli.run.run', return_value=0)
 
     arguments = Namespace(subcommand='run')
 
@@ -105,3 +106,79 @@ def test_local_run(mocker: MockerFixture, tmp_path_factory: TempPathFactory) ->
             del environ['GRIZZLY_TEST_VAR']
         except:
             pass
+
+
+def test_workers_type(mocker: MockerFixture) -> None:
+    mocker.patch('grizzly_cli.local.os.cpu_count', return_value=8)
+
+    assert workers_type('auto') == 8
+    assert workers_type('3') == 3
+
+    mocker.patch('grizzly_cli.local.os.cpu_count', return_value=None)
+    assert workers_type('auto') == 1
+
+    with pytest.raises(ArgumentTypeError) as ate:
+        workers_type('foo')
+    assert str(ate.value) == '"foo" is not a number or "auto"'
+
+    with pytest.raises(ArgumentTypeError) as ate:
+        workers_type('0')
+    assert str(ate.value) == 'there must be at least 1 worker'
+
+
+def test_local_run_workers(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    run_command = mocker.patch('grizzly_cli.local.run_command', return_value=RunCommandResult(return_code=0))
+    run_commands = mocker.patch('grizzly_cli.local.run_commands', return_value={
+        'master': RunCommandResult(return_code=3),
+        'worker-1': RunCommandResult(return_code=0),
+        'worker-2': RunCommandResult(return_code=0),
+    })
+    test_context = tmp_path_factory.mktemp('test_context')
+    (test_context / 'test.feature').write_text('Feature:')
+
+    try:
+        # can be specified before, or after, run
+        arguments = _read_arguments(['local', 'run', '--workers', '2', f'{test_context}/test.feature'])
+        assert arguments.workers == 2
+        assert arguments.file == f'{test_context}/test.feature'
+
+        arguments = _read_arguments(['local', '--workers', '3', 'run', '--workers', '2', f'{test_context}/test.feature'])
+        assert arguments.workers == 2
+
+        arguments = _read_arguments(['local', '--workers', '2', 'run', '--verbose', f'{test_context}/test.feature'])
+        assert arguments.workers == 2
+
+        assert local_run(
+            arguments,
+            {},
+            {
+                'master': ['--master'],
+                'worker': ['--worker'],
+                'common': ['--common', 'true'],
+            },
+        ) == 3
+
+        run_command.assert_not_called()
+        run_commands.assert_called_once_with({
+            'master': [
+                'behave', '-D', 'master=true', '-D', 'expected-workers=2', f'{test_context}/test.feature', '--master', '--common', 'true',
+            ],
+            'worker-1': [
+                'behave', '-q', '--no-summary', '--format', 'null', '-D', 'worker=true', '-D', 'master-host=127.0.0.1', f'{test_context}/test.feature',
+                '--worker', '--common', 'true',
+            ],
+            'worker-2': [
+                'behave', '-q', '--no-summary', '--format', 'null', '-D', 'worker=true', '-D', 'master-host=127.0.0.1', f'{test_context}/test.feature',
+                '--worker', '--common', 'true',
+            ],
+        }, verbose=True)
+
+        # without workers, everything is executed in one process
+        arguments = _read_arguments(['local', 'run', f'{test_context}/test.feature'])
+
+        assert arguments.workers is None
+        assert local_run(arguments, {}, {}) == 0
+        assert run_commands.call_count == 1
+        run_command.assert_called_once_with(['behave', f'{test_context}/test.feature'])
+    finally:
+        rm_rf(test_context)
@@ -1,9 +1,16 @@
 import logging
+import os
 from os import path
-from argparse import ArgumentParser
-from datetime import datetime
+from typing import Dict, List, Tuple, cast
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import MagicMock
+from threading import Lock
+from time import sleep, time
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 
 import pytest
 from _pytest.capture import CaptureFixture
@@ -15,7 +22,25 @@ from azure.core.exceptions import ClientAuthenticationError, ServiceRequestError
 from azure.identity import ChainedTokenCredential
 from azure.keyvault.secrets import SecretClient, SecretProperties, KeyVaultSecret
 
-from grizzly_cli.run import run, create_parser, ScenarioTag, load_configuration_file, load_configuration, load_configuration_keyvault
+import grizzly_cli.run
+from grizzly_cli.run import (
+    run,
+    render_feature_file,
+    create_run_directory,
+    create_environment,
+    compile_template,
+    BoundedBytecodeCache,
+    ScenarioTag,
+    ScenarioIndex,
+    load_configuration_file,
+    load_configuration,
+    load_configuration_keyvault,
+    feature_distribution_of_users,
+    initialize_pool_worker,
+    _keyvault_cache_file,
+    KEYVAULT_MAX_WORKERS,
+)
+from grizzly_cli.run_parser import create_parser
 from grizzly_cli.utils import setup_logging
 
 from tests.helpers import CaseInsensitive, rm_rf, cwd, ANY
@@ -46,6 +71,13 @@ def test_run(capsys: CaptureFixture, mocker: MockerFixture, tmp_path_factory: Te
         mocker.patch('grizzly_cli.run.grizzly_cli.EXECUTION_CONTEXT', str(execution_context))
         mocker.patch('grizzly_cli.run.grizzly_cli.MOUNT_CONTEXT', str(mount_context))
         mocker.patch('grizzly_cli.run.get_hostname', return_value='localhost')
+        run_directory = execution_context / 'features' / '.grizzly-cli-run-test'
+
+        def create_run_directory(feature_file: Path) -> Path:
+            run_directory.mkdir()
+            return run_directory
+
+        mocker.patch('grizzly_cli.run.create_run_directory', side_effect=create_run_directory)
         mocker.patch('grizzly_cli.run.find_variable_names_in_questions', side_effect=[['foo', 'bar'], [], [], [], [], [], [], []])
         mocker.patch('grizzly_cli.run.find_metadata_notices', side_effect=[[], ['is the event log cleared?'], ['hello world', 'foo bar'], [], [], [], [], []])
         mocker.patch('grizzly_cli.run.distribution_of_users_per_scenario', autospec=True)
@@ -81,7 +113,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
                 'TESTDATA_VARIABLE_foo': 'bar',
                 'TESTDATA_VARIABLE_bar': 'foo',
             }, {
@@ -129,7 +161,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
             }, {
                 'master': [],
                 'worker': [],
@@ -164,7 +196,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
             }, {
                 'master': [],
                 'worker': [],
@@ -197,7 +229,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
             }, {
                 'master': [],
                 'worker': [],
@@ -227,7 +259,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
             }, {
                 'master': [],
                 'worker': [],
@@ -262,7 +294,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
             }, {
                 'master': [],
                 'worker': [],
@@ -293,7 +325,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
                 'GRIZZLY_LOG_DIR': 'foobar',
             }, {
                 'master': [],
@@ -325,7 +357,7 @@ bar = foo
                 'GRIZZLY_CLI_HOST': 'localhost',
                 'GRIZZLY_EXECUTION_CONTEXT': str(execution_context),
                 'GRIZZLY_MOUNT_CONTEXT': str(mount_context),
-                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(execution_context, 'configuration.lock.yaml')),
+                'GRIZZLY_CONFIGURATION_FILE': CaseInsensitive(path.join(run_directory, 'configuration.lock.yaml')),
                 'GRIZZLY_LOG_DIR': 'foobar',
                 'GRIZZLY_DRY_RUN': 'true',
             }, {
@@ -814,6 +846,381 @@ the following variables was used in ../second.feature#second but was not declare
         rm_rf(test_context)
 
 
+def test_run_features(capsys: CaptureFixture, mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    setup_logging()
+
+    original_tmp_path = tmp_path_factory._basetemp
+    tmp_path_factory._basetemp = Path.cwd() / '.pytest_tmp'
+    test_context = tmp_path_factory.mktemp('test_context')
+    execution_context = test_context / 'execution-context'
+    execution_context.mkdir()
+    mount_context = test_context / 'mount-context'
+    mount_context.mkdir()
+    (execution_context / 'configuration.yaml').write_text('configuration:\n  foo: bar')
+    (execution_context / 'features').mkdir()
+
+    feature_template = """# grizzly-cli:notice {notice}
+Feature: feature {name}
+    Background: common
+        Given "1" user
+
+    Scenario: {name}
+        Given a user of type "RestApi" load testing "https://localhost"
+        And repeat for "{iterations}" iteration
+        And ask for value of variable "{variable}"
+"""
+
+    feature_file_1 = execution_context / 'features' / 'first.feature'
+    feature_file_1.write_text(feature_template.format(notice='is the event log cleared?', name='first', iterations=1, variable='foo'))
+    feature_file_2 = execution_context / 'features' / 'second.feature'
+    feature_file_2.write_text(feature_template.format(notice='is the event log cleared?', name='second', iterations=1, variable='bar'))
+
+    parser = ArgumentParser()
+
+    sub_parsers = parser.add_subparsers(dest='test')
+
+    create_parser(sub_parsers, parent='local')
+
+    def parse_args(*args: str) -> Namespace:
+        arguments = parser.parse_args(['run', '-e', f'{execution_context}/configuration.yaml', feature_file_1.as_posix(), feature_file_2.as_posix(), *args])
+        setattr(arguments, 'files', arguments.file)
+        setattr(arguments, 'file', arguments.file[0])
+
+        return arguments
+
+    try:
+        mocker.patch('grizzly_cli.run.grizzly_cli.EXECUTION_CONTEXT', str(execution_context))
+        mocker.patch('grizzly_cli.run.grizzly_cli.MOUNT_CONTEXT', str(mount_context))
+        mocker.patch('grizzly_cli.run.get_hostname', return_value='localhost')
+        ask_yes_no_mock = mocker.patch('grizzly_cli.run.ask_yes_no', autospec=True)
+        get_input_mock = mocker.patch('grizzly_cli.run.get_input', side_effect=['hello', 'world'])
+        run_func_mock = mocker.MagicMock(return_value=0)
+
+        setattr(getattr(run, '__wrapped__'), '__value__', str(execution_context))
+
+        arguments = parse_args('--csv-prefix')
+
+        assert run(arguments, run_func_mock) == 0
+
+        # values are asked for once, for all feature files
+        assert get_input_mock.call_count == 2
+        get_input_mock.assert_any_call('initial value for "bar": ')
+        get_input_mock.assert_any_call('initial value for "foo": ')
+
+        # same notice is only shown once, followed by one confirmation for all feature files
+        assert ask_yes_no_mock.call_count == 3
+        assert [call.args[0] for call in ask_yes_no_mock.call_args_list] == ['continue?', 'is the event log cleared?', 'continue?']
+
+        assert run_func_mock.call_count == 2
+        run_directories: List[Path] = []
+        for call, feature_file in zip(run_func_mock.call_args_list, [feature_file_1, feature_file_2]):
+            feature_args, environ, run_arguments = call.args
+            feature_lock_file = Path(feature_args.file)
+            assert feature_lock_file.name == f'{feature_file.stem}.lock.feature'
+            assert feature_lock_file.parent.name.startswith('.grizzly-cli-run-')
+            assert feature_lock_file.parent.parent == feature_file.parent
+            run_directories.append(feature_lock_file.parent)
+            assert feature_args.csv_prefix.startswith(f'feature_{feature_file.stem}_')
+            assert environ['TESTDATA_VARIABLE_bar'] == 'hello'
+            assert environ['TESTDATA_VARIABLE_foo'] == 'world'
+            assert environ['GRIZZLY_CONFIGURATION_FILE'] == (run_directories[0] / 'configuration.lock.yaml').as_posix()
+            assert run_arguments['common'] == [f'-Dcsv-prefix="{feature_args.csv_prefix}"']
+
+        # original arguments are not modified
+        assert arguments.csv_prefix is True
+        assert arguments.file == feature_file_1.as_posix()
+
+        capture = capsys.readouterr()
+        assert capture.out == ''
+        assert 'feature file requires values for 2 variables' in capture.err
+        assert f'feature file {run_directories[0]}/first.lock.feature will execute in total 1 iterations divided on 1 scenarios' in capture.err
+        assert f'feature file {run_directories[1]}/second.lock.feature will execute in total 1 iterations divided on 1 scenarios' in capture.err
+        assert capture.err.index('first.lock.feature will execute') < capture.err.index('second.lock.feature will execute')
+        assert f'running feature file {feature_file_2.as_posix()} (2/2)' in capture.err
+
+        assert sorted(path.name for path in (execution_context / 'features').iterdir()) == ['first.feature', 'second.feature']
+        assert not (execution_context / 'configuration.lock.yaml').exists()
+
+        # first feature file fails, second is not executed
+        ask_yes_no_mock.reset_mock()
+        run_func_mock = mocker.MagicMock(return_value=1)
+        mocker.patch.dict(os.environ, {'TESTDATA_VARIABLE_foo': 'world', 'TESTDATA_VARIABLE_bar': 'hello'})
+
+        assert run(parse_args('--yes'), run_func_mock) == 1
+
+        ask_yes_no_mock.assert_not_called()
+        run_func_mock.assert_called_once()
+        capture = capsys.readouterr()
+        assert f'!! {feature_file_1.as_posix()} failed with rc=1, will not run {feature_file_2.as_posix()}' in capture.err
+
+        # errors in distribution for all feature files are reported before anything is executed
+        feature_file_2.write_text(feature_template.format(notice='is the event log cleared?', name='second', iterations=0, variable='bar'))
+
+        with pytest.raises(ValueError) as ve:
+            run(parse_args('--yes'), run_func_mock)
+        assert str(ve.value).startswith(f'{feature_file_2.as_posix()}: ')
+        assert feature_file_1.as_posix() not in str(ve.value)
+
+        run_func_mock.assert_called_once()
+        assert sorted(path.name for path in (execution_context / 'features').iterdir()) == ['first.feature', 'second.feature']
+
+        # error when rendering one feature file, lock file of the other is removed
+        feature_file_2.write_text('Feature: second\n    Scenario: include\n        {% scenario "foo", feature="missing.feature" %}')
+
+        with pytest.raises(FileNotFoundError):
+            run(parse_args('--yes'), run_func_mock)
+
+        run_func_mock.assert_called_once()
+        assert sorted(path.name for path in (execution_context / 'features').iterdir()) == ['first.feature', 'second.feature']
+        assert not (execution_context / 'configuration.lock.yaml').exists()
+    finally:
+        tmp_path_factory._basetemp = original_tmp_path
+        rm_rf(test_context)
+
+
+def test_feature_distribution_of_users_spawn(tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    feature_file = test_context / 'test.feature'
+    feature_file.write_text("""Feature: test
+    Background: common
+        Given "1" user
+
+    Scenario: first
+        Given a user of type "RestApi" load testing "https://localhost"
+        And repeat for "2" iterations
+""")
+
+    arguments = Namespace(file=feature_file.as_posix(), yes=True, plan_output=None)
+
+    try:
+        # spawned workers does not inherit the logging configuration, which must be done by the initializer
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=get_context('spawn'),
+            initializer=initialize_pool_worker,
+            initargs=(logging.INFO,),
+        ) as executor:
+            messages, plan, error = executor.submit(feature_distribution_of_users, arguments, {}).result()
+
+        assert error is None
+        assert plan is not None
+        assert f'feature file {feature_file.as_posix()} will execute in total 2 iterations divided on 1 scenarios' in '\n'.join(messages)
+    finally:
+        rm_rf(test_context)
+
+
+def test_render_feature_file(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    cache_context = tmp_path_factory.mktemp('cache')
+    feature_file = test_context / 'test.feature'
+    included_feature_file = test_context / 'included.feature'
+
+    mocker.patch.dict('os.environ', {'GRIZZLY_CLI_CACHE_DIR': str(cache_context)})
+    environment_spy = mocker.spy(grizzly_cli.run, 'Environment')
+
+    try:
+        feature_file.write_text("""Feature: a feature
+    Scenario: first
+        {% scenario "first", feature="./included.feature", foo="bar" %}
+""")
+        included_feature_file.write_text("""Feature: included
+    Scenario: first
+        Given a variable with value "{{ {$ foo $} }}"
+""")
+
+        expected_content = (
+            'Feature: a feature\n'
+            '    Scenario: first\n'
+            '        Given a variable with value "{{ bar }}"'
+        )
+
+        assert render_feature_file(feature_file) == expected_content
+        assert environment_spy.call_count == 1
+        assert len(list((cache_context / 'render').glob('*.json'))) == 1
+
+        # cache hit, nothing is rendered
+        assert render_feature_file(feature_file) == expected_content
+        assert environment_spy.call_count == 1
+
+        # cache disabled
+        assert render_feature_file(feature_file, use_cache=False) == expected_content
+        assert environment_spy.call_count == 2
+
+        # included file changed, cache entry is not valid anymore
+        included_feature_file.write_text("""Feature: included
+    Scenario: first
+        Given a variable with value "{{ {$ foo $}_foo }}"
+""")
+
+        assert render_feature_file(feature_file) == expected_content.replace('bar', 'bar_foo')
+        assert environment_spy.call_count == 3
+
+        assert render_feature_file(feature_file) == expected_content.replace('bar', 'bar_foo')
+        assert environment_spy.call_count == 3
+
+        # variables in scenario tag changed, which is a different feature file content
+        feature_file.write_text(feature_file.read_text().replace('foo="bar"', 'foo="foo"'))
+
+        assert render_feature_file(feature_file) == expected_content.replace('bar', 'foo_foo')
+        assert environment_spy.call_count == 4
+        assert len(list((cache_context / 'render').glob('*.json'))) == 2
+
+        # included feature files are first looked up relative to the current working directory
+        feature_file = test_context / 'features' / 'test.feature'
+        feature_file.parent.mkdir()
+        feature_file.write_text("""Feature: a feature
+    Scenario: first
+        {% scenario "first", feature="included.feature", foo="bar" %}
+""")
+
+        for name in ['a', 'b']:
+            (test_context / name).mkdir()
+            (test_context / name / 'included.feature').write_text(f"""Feature: included
+    Scenario: first
+        Given a variable with value "{{{{ {{$ foo $}}_{name} }}}}"
+""")
+
+        with cwd(test_context / 'a'):
+            assert render_feature_file(feature_file) == expected_content.replace('bar', 'bar_a')
+            assert environment_spy.call_count == 5
+
+        with cwd(test_context / 'b'):
+            assert render_feature_file(feature_file) == expected_content.replace('bar', 'bar_b')
+            assert environment_spy.call_count == 6
+
+            assert render_feature_file(feature_file) == expected_content.replace('bar', 'bar_b')
+            assert environment_spy.call_count == 6
+
+        with cwd(test_context / 'a'):
+            assert render_feature_file(feature_file) == expected_content.replace('bar', 'bar_a')
+            assert environment_spy.call_count == 6
+
+        # cache is bounded, least recently used entries are evicted first
+        cache_files = list((cache_context / 'render').glob('*.json'))
+        assert len(cache_files) == 4
+        for index, cache_file in enumerate(cache_files):
+            os.utime(cache_file, (1000 + index, 1000 + index))
+
+        with cwd(test_context / 'a'):
+            assert render_feature_file(feature_file) == expected_content.replace('bar', 'bar_a')
+            assert environment_spy.call_count == 6
+
+        most_recently_used = max(cache_files, key=lambda file: file.stat().st_mtime)
+        assert most_recently_used.stat().st_mtime > 1000 + len(cache_files)
+        mocker.patch('grizzly_cli.run.RENDER_CACHE_MAX_SIZE', most_recently_used.stat().st_size * 2)
+
+        with cwd(test_context / 'b'):
+            feature_file.write_text(feature_file.read_text().replace('foo="bar"', 'foo="baz"'))
+            assert render_feature_file(feature_file) == expected_content.replace('bar', 'baz_b')
+            assert environment_spy.call_count == 7
+
+        cache_files = list((cache_context / 'render').glob('*.json'))
+        assert len(cache_files) == 2
+        assert most_recently_used in cache_files
+    finally:
+        rm_rf(test_context)
+        rm_rf(cache_context)
+
+
+def test_create_environment(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    cache_context = tmp_path_factory.mktemp('cache')
+
+    mocker.patch.dict('os.environ', {'GRIZZLY_CLI_CACHE_DIR': str(cache_context)})
+
+    try:
+        environment = create_environment(ScenarioTag)
+        assert environment.bytecode_cache is None
+        assert list(environment.extensions.keys()) == ['grizzly_cli.run.ScenarioTag']
+
+        mocker.patch.dict('os.environ', {'GRIZZLY_CLI_BYTECODE_CACHE': 'foo'})
+
+        with pytest.raises(ValueError, match='GRIZZLY_CLI_BYTECODE_CACHE should be max size of cache in MB, not "foo"'):
+            create_environment(ScenarioTag)
+
+        mocker.patch.dict('os.environ', {'GRIZZLY_CLI_BYTECODE_CACHE': '2'})
+
+        environment = create_environment(ScenarioTag)
+        assert isinstance(environment.bytecode_cache, BoundedBytecodeCache)
+        assert environment.bytecode_cache.directory == (cache_context / 'bytecode').as_posix()
+        assert environment.bytecode_cache.max_size == 2 * 1024 * 1024
+    finally:
+        rm_rf(cache_context)
+
+
+def test_compile_template(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    cache_context = tmp_path_factory.mktemp('cache')
+
+    try:
+        environment = Environment(autoescape=False, extensions=[ScenarioTag])
+        compile_spy = mocker.spy(environment, 'compile')
+
+        # no bytecode cache, compiled every time
+        assert compile_template(environment, 'hello {{ name }}!').render() == 'hello {{ name }}!'
+        assert compile_template(environment, 'hello {{ name }}!').render() == 'hello {{ name }}!'
+        assert compile_spy.call_count == 2
+        assert list(cache_context.iterdir()) == []
+
+        bytecode_cache = BoundedBytecodeCache(cache_context.as_posix(), max_size=1024 * 1024)
+        environment = Environment(autoescape=False, extensions=[ScenarioTag], bytecode_cache=bytecode_cache)
+        compile_spy = mocker.spy(environment, 'compile')
+
+        assert compile_template(environment, 'hello {{ name }}!').render() == 'hello {{ name }}!'
+        assert compile_spy.call_count == 1
+        assert len(list(cache_context.glob('__grizzly_cli_*.cache'))) == 1
+
+        assert compile_template(environment, 'hello {{ name }}!').render() == 'hello {{ name }}!'
+        assert compile_template(environment.overlay(), 'hello {{ name }}!').render() == 'hello {{ name }}!'
+        assert compile_spy.call_count == 1
+
+        assert compile_template(environment, 'hello {{ world }}!').render() == 'hello {{ world }}!'
+        assert compile_spy.call_count == 2
+        assert len(list(cache_context.glob('__grizzly_cli_*.cache'))) == 2
+
+        # extensions are part of the key
+        environment = Environment(autoescape=False, bytecode_cache=bytecode_cache)
+        assert compile_template(environment, 'hello {{ name }}!').render(name='world') == 'hello world!'
+        assert len(list(cache_context.glob('__grizzly_cli_*.cache'))) == 3
+    finally:
+        rm_rf(cache_context)
+
+
+def test_bounded_bytecode_cache(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    cache_context = tmp_path_factory.mktemp('cache')
+
+    try:
+        bytecode_cache = BoundedBytecodeCache(cache_context.as_posix(), max_size=1024 * 1024)
+        environment = Environment(autoescape=False, bytecode_cache=bytecode_cache)
+
+        compile_template(environment, 'first {{ value }}')
+        entry_size = next(iter(cache_context.glob('__grizzly_cli_*.cache'))).stat().st_size
+
+        # room for two entries
+        bytecode_cache.max_size = entry_size * 2 + entry_size // 2
+
+        first, = list(cache_context.glob('__grizzly_cli_*.cache'))
+        os.utime(first, ns=(1, 1))
+
+        compile_template(environment, 'other {{ value }}')
+        second, = [entry for entry in cache_context.glob('__grizzly_cli_*.cache') if entry != first]
+        os.utime(second, ns=(2, 2))
+
+        # first is used, and should be the most recently used
+        compile_spy = mocker.spy(environment, 'compile')
+        compile_template(environment, 'first {{ value }}')
+        assert compile_spy.call_count == 0
+
+        # least recently used entry (second) is evicted
+        compile_template(environment, 'third {{ value }}')
+        assert compile_spy.call_count == 1
+
+        entries = list(cache_context.glob('__grizzly_cli_*.cache'))
+        assert len(entries) == 2
+        assert first in entries
+        assert second not in entries
+    finally:
+        rm_rf(cache_context)
+
+
 def test_if_condition_with_scenario_tag_ext(caplog: LogCaptureFixture) -> None:
     environment = Environment(autoescape=False, extensions=[ScenarioTag])
 
@@ -878,6 +1285,27 @@ world""")
 
 
 class TestScenarioTag:
+    def test_filter_stream(self) -> None:
+        environment = Environment(autoescape=False, extensions=[ScenarioTag])
+
+        source_lines = ['Feature: a feature', '    Scenario: first']
+        for index in range(500):
+            source_lines += [
+                f'        Given a variable with value "{{{{ variable_{index} | int }}}}" and "{{{{foo}}}}"',
+                '        {%- if True %}',
+                f'        Then get "{{{{ bar{index} }}}}" from "{{{{baz}}}}"',
+                '        {%- endif %}',
+            ]
+
+        source = '\n'.join(source_lines)
+
+        stream = environment._tokenize(source, None)
+        token_types = [token.type for token in stream]
+
+        # everything between the if-statements are merged to one data token
+        assert token_types.count('data') == 500 * 2
+        assert environment.from_string(source).render() == source.replace('\n        {%- if True %}', '').replace('\n        {%- endif %}', '')
+
     def test_get_scenario_text(self, tmp_path_factory: TempPathFactory) -> None:
         original_tmp_path = tmp_path_factory._basetemp
         tmp_path_factory._basetemp = Path.cwd() / '.pytest_tmp'
@@ -943,6 +1371,86 @@ class TestScenarioTag:
             tmp_path_factory._basetemp = original_tmp_path
             rm_rf(test_context)
 
+    def test_get_scenario_text_index(self, mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+        original_tmp_path = tmp_path_factory._basetemp
+        tmp_path_factory._basetemp = Path.cwd() / '.pytest_tmp'
+        test_context = tmp_path_factory.mktemp('context')
+        test_feature = test_context / 'test.feature'
+
+        parse_feature_spy = mocker.spy(grizzly_cli.run, 'parse_feature')
+
+        try:
+            test_feature.write_text("""Feature: test
+    Scenario: first
+        Given the first scenario
+
+    Scenario: second
+        Given the second scenario
+        And {$ foo $} steps
+
+    Scenario: first
+        Given a duplicate first scenario
+""")
+
+            cache: Dict[Tuple[str, int, int], ScenarioIndex] = {}
+
+            assert ScenarioTag.get_scenario_text('first', test_feature, cache) == 'Given the first scenario'
+            assert ScenarioTag.get_scenario_text('second', test_feature, cache) == """Given the second scenario
+        And {$ foo $} steps"""
+            assert ScenarioTag.get_scenario_text('first', test_feature, cache) == 'Given the first scenario'
+
+            assert parse_feature_spy.call_count == 1
+            assert len(cache) == 1
+
+            with pytest.raises(ValueError, match='scenario "third" does not exist in'):
+                ScenarioTag.get_scenario_text('third', test_feature, cache)
+
+            assert parse_feature_spy.call_count == 1
+
+            # modified file should be indexed again
+            test_feature.write_text("""Feature: test
+    Scenario: third
+        Given the third scenario
+""")
+
+            assert ScenarioTag.get_scenario_text('third', test_feature, cache) == 'Given the third scenario'
+            assert parse_feature_spy.call_count == 2
+            assert len(cache) == 2
+
+            # without cache, file is always parsed
+            assert ScenarioTag.get_scenario_text('third', test_feature) == 'Given the third scenario'
+            assert parse_feature_spy.call_count == 3
+        finally:
+            tmp_path_factory._basetemp = original_tmp_path
+            rm_rf(test_context)
+
+
+def test_create_run_directory(tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    feature_file = test_context / 'features' / 'test.feature'
+    feature_file.parent.mkdir()
+    feature_file.write_text('Feature: test')
+
+    try:
+        run_directory_1 = create_run_directory(feature_file)
+        run_directory_2 = create_run_directory(feature_file)
+
+        # every invocation has its own directory, next to the feature file
+        assert run_directory_1 != run_directory_2
+        for run_directory in [run_directory_1, run_directory_2]:
+            assert run_directory.is_dir()
+            assert run_directory.parent == feature_file.parent
+            assert run_directory.name.startswith('.grizzly-cli-run-')
+            assert run_directory.stat().st_mode & 0o777 == 0o755
+
+        with cwd(test_context):
+            run_directory = create_run_directory(Path('features/test.feature'))
+            assert not run_directory.is_absolute()
+            assert run_directory.parent.as_posix() == 'features'
+            assert run_directory.is_dir()
+    finally:
+        rm_rf(test_context)
+
 
 def test_load_configuration(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
     test_context = tmp_path_factory.mktemp('test_context')
@@ -975,6 +1483,23 @@ def test_load_configuration(mocker: MockerFixture, tmp_path_factory: TempPathFac
             assert env_file_lock.read_text() == env_file_local.read_text()
             load_configuration_keyvault_mock.assert_not_called()
 
+        output_dir = test_context / '.grizzly-cli-run-test'
+        output_dir.mkdir()
+        env_file_lock_name = load_configuration(env_file_local.as_posix(), output_dir)
+        assert env_file_lock_name == f'{output_dir.as_posix()}/local.lock.yaml'
+        assert Path(env_file_lock_name).read_text() == env_file_local.read_text()
+        assert sorted(path.name for path in output_dir.iterdir()) == ['local.lock.yaml']
+        # readable by the user in the containers
+        umask = os.umask(0o022)
+        os.umask(umask)
+        assert Path(env_file_lock_name).stat().st_mode & 0o777 == 0o644 & ~umask
+
+        # absolute, even if the run directory is relative, so the path can be rewritten to where it is mounted in the containers
+        with cwd(test_context):
+            env_file_lock_name = load_configuration(env_file_local.as_posix(), Path('.grizzly-cli-run-test'))
+            assert env_file_lock_name == f'{test_context.resolve().as_posix()}/.grizzly-cli-run-test/local.lock.yaml'
+            assert env_file_lock_name.startswith(os.getcwd())
+
         env_file_local.write_text('''configuration:
     keyvault: https://grizzly.keyvault.azure.com
     authentication:
@@ -1077,23 +1602,56 @@ def create_secret(name: str, value: str) -> KeyVaultSecret:
 
 def mock_keyvault(client: MagicMock, keyvault: dict[str, str]) -> None:
     secret_properties: list[SecretProperties] = []
-    secrets: list[KeyVaultSecret] = []
+    secrets: dict[str, KeyVaultSecret] = {}
 
     for key, value in keyvault.items():
         secret = create_secret(key, value)
         secret_properties.append(secret.properties)
         if key.startswith('grizzly--'):
-            secrets.append(secret)
+            secrets.update({key: secret})
 
     client.reset_mock()
     client.list_properties_of_secrets.return_value = secret_properties
-    client.get_secret.side_effect = secrets
+    # secrets are retrieved concurrently, in no particular order
+    client.get_secret.side_effect = lambda name: secrets[name]
+
+
+class FakeSecretClient:
+    def __init__(self, secrets: dict[str, str], latency: float = 0.0) -> None:
+        self.secrets = {name: (value, datetime(2024, 1, 1, tzinfo=timezone.utc)) for name, value in secrets.items()}
+        self.latency = latency
+        self.get_secret_calls: list[str] = []
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self._lock = Lock()
+
+    def update(self, name: str, value: str) -> None:
+        _, updated_on = self.secrets[name]
+        self.secrets[name] = (value, updated_on + timedelta(seconds=1))
+
+    def list_properties_of_secrets(self) -> list[SimpleNamespace]:
+        return [SimpleNamespace(name=name, updated_on=updated_on) for name, (_, updated_on) in self.secrets.items()]
+
+    def get_secret(self, name: str) -> SimpleNamespace:
+        with self._lock:
+            self.get_secret_calls.append(name)
+            self.concurrent += 1
+            self.max_concurrent = max(self.concurrent, self.max_concurrent)
+
+        sleep(self.latency)
+
+        with self._lock:
+            self.concurrent -= 1
+
+        value, _ = self.secrets[name]
+
+        return SimpleNamespace(name=name, value=value)
 
 
 def test_load_configuration_keyvault(mocker: MockerFixture, capsys: CaptureFixture) -> None:
     setup_logging()
 
-    secret_client_mock = mocker.patch('grizzly_cli.run.SecretClient', new_callable=mocker.MagicMock, spec=SecretClient)
+    secret_client_mock = mocker.patch('azure.keyvault.secrets.SecretClient', new_callable=mocker.MagicMock, spec=SecretClient)
     client_mock = secret_client_mock.return_value
 
     # <!-- no matching secrets
@@ -1153,6 +1711,77 @@ def test_load_configuration_keyvault(mocker: MockerFixture, capsys: CaptureFixtu
     # // -->
 
 
+def test_load_configuration_keyvault_fake_client(mocker: MockerFixture) -> None:
+    secret_client_mock = mocker.patch('azure.keyvault.secrets.SecretClient', new_callable=mocker.MagicMock, spec=SecretClient)
+
+    secrets = {f'grizzly--{"global" if index % 2 == 0 else "local"}--key{index}-value': f'value-{index}' for index in range(40)}
+    secrets.update({
+        'grizzly--remote--key0-value': 'remote',
+        'some--random--key': 'rando',
+    })
+    client = FakeSecretClient(secrets, latency=0.01)
+
+    expected_configuration = {'configuration': {f'key{index}': {'value': f'value-{index}'} for index in range(40)}}
+
+    # <!-- no cache, all secrets for environment are retrieved concurrently
+    mocker.patch.dict(os.environ, {'GRIZZLY_CLI_KEYVAULT_CACHE': ''})
+
+    assert load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='local', client=cast(SecretClient, client)) == expected_configuration
+    assert sorted(client.get_secret_calls) == sorted(name for name in secrets.keys() if name.startswith(('grizzly--global--', 'grizzly--local--')))
+    assert 1 < client.max_concurrent <= KEYVAULT_MAX_WORKERS
+    secret_client_mock.assert_not_called()
+
+    assert load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='local', client=cast(SecretClient, client)) == expected_configuration
+    assert len(client.get_secret_calls) == 80
+    # // -->
+
+    # <!-- cache
+    client.get_secret_calls.clear()
+    mocker.patch.dict(os.environ, {'GRIZZLY_CLI_KEYVAULT_CACHE': '60'})
+    cache_file = _keyvault_cache_file('https://grizzly.keyvault.com', 'local')
+    cache_file.unlink(missing_ok=True)
+
+    assert load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='local', client=cast(SecretClient, client)) == expected_configuration
+    assert len(client.get_secret_calls) == 40
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+    assert cache_file.parent.stat().st_mode & 0o777 == 0o700
+
+    # nothing has changed
+    client.get_secret_calls.clear()
+    assert load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='local', client=cast(SecretClient, client)) == expected_configuration
+    assert client.get_secret_calls == []
+
+    # cache is per environment
+    assert load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='remote', client=cast(SecretClient, client)) == {'configuration': {
+        f'key{index}': {'value': f'value-{index}'} for index in range(0, 40, 2)
+    }}
+    assert len(client.get_secret_calls) == 21
+    client.get_secret_calls.clear()
+
+    # only updated secret is retrieved
+    client.update('grizzly--local--key1-value', 'foobar')
+    expected_configuration['configuration']['key1']['value'] = 'foobar'
+
+    assert load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='local', client=cast(SecretClient, client)) == expected_configuration
+    assert client.get_secret_calls == ['grizzly--local--key1-value']
+    client.get_secret_calls.clear()
+
+    # cached values has expired
+    mocker.patch('grizzly_cli.run.time', return_value=time() + 61)
+
+    assert load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='local', client=cast(SecretClient, client)) == expected_configuration
+    assert len(client.get_secret_calls) == 40
+    client.get_secret_calls.clear()
+
+    # invalid ttl
+    mocker.patch.dict(os.environ, {'GRIZZLY_CLI_KEYVAULT_CACHE': 'foo'})
+
+    with pytest.raises(ValueError) as ve:
+        load_configuration_keyvault(url='https://grizzly.keyvault.com', environment='local', client=cast(SecretClient, client))
+    assert str(ve.value) == 'GRIZZLY_CLI_KEYVAULT_CACHE should be number of seconds secrets are cached, not "foo"'
+    # // -->
+
+
 @pytest.mark.skip(reason='needs real credentials and keyvault')
 def test_load_configuration_keyvault_real() -> None:
     """
@@ -0,0 +1,139 @@
+import json
+
+from os import getpid
+from threading import Thread, get_ident
+from time import sleep
+
+import pytest
+
+from _pytest.tmpdir import TempPathFactory
+
+from grizzly_cli.tracing import Tracer
+
+from tests.helpers import rm_rf
+
+
+def test_tracer_span() -> None:
+    tracer = Tracer()
+
+    with tracer.span('foo', hello='world') as foo:
+        assert tracer.spans[0].duration is None
+        sleep(0.01)
+
+        with tracer.span('bar', 'probe'):
+            pass
+
+    assert foo.duration is not None
+    assert foo.duration >= 0.01
+    assert [(span.name, span.category) for span in tracer.spans] == [('foo', 'grizzly-cli'), ('bar', 'probe')]
+    assert tracer.spans[0].args == {'hello': 'world'}
+    assert tracer.spans[0].thread_id == get_ident()
+    assert tracer.spans[1].start >= tracer.spans[0].start
+
+    # duration is recorded, even if it fails
+    with pytest.raises(ValueError):
+        with tracer.span('baz'):
+            raise ValueError('baz')
+
+    assert tracer.spans[-1].name == 'baz'
+    assert tracer.spans[-1].duration is not None
+
+    def threaded() -> None:
+        with tracer.span('threaded'):
+            pass
+
+    thread = Thread(target=threaded)
+    thread.start()
+    thread.join()
+
+    assert tracer.spans[-1].name == 'threaded'
+    assert tracer.spans[-1].thread_id != get_ident()
+
+    tracer.reset()
+    assert tracer.spans == []
+
+
+def test_tracer_traced() -> None:
+    tracer = Tracer()
+
+    @tracer.traced('foobar')
+    def foobar(value: int, *, twice: bool = False) -> int:
+        """foobar docstring"""
+        return value * 2 if twice else value
+
+    assert foobar.__name__ == 'foobar'
+    assert foobar.__doc__ == 'foobar docstring'
+
+    assert foobar(1) == 1
+    assert foobar(2, twice=True) == 4
+
+    assert [span.name for span in tracer.spans] == ['foobar', 'foobar']
+
+
+def test_tracer_chrome_trace(tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    tracer = Tracer()
+
+    try:
+        with tracer.span('foo', file='test.feature', workers=3):
+            with tracer.span('bar'):
+                sleep(0.01)
+
+            unfinished = tracer.span('unfinished')
+            unfinished.__enter__()
+
+            trace = tracer.chrome_trace()
+
+        assert trace['displayTimeUnit'] == 'ms'
+        # unfinished spans are not included
+        assert len(trace['traceEvents']) == 1
+        bar = trace['traceEvents'][0]
+        assert bar['name'] == 'bar'
+        assert bar['cat'] == 'grizzly-cli'
+        assert bar['ph'] == 'X'
+        assert bar['pid'] == getpid()
+        assert bar['tid'] == get_ident()
+        assert bar['ts'] >= 0
+        assert bar['dur'] >= 10_000
+        assert bar['args'] == {}
+
+        unfinished.__exit__(None, None, None)
+
+        trace_file = test_context / 'trace.json'
+        tracer.write_chrome_trace(str(trace_file))
+
+        trace = json.loads(trace_file.read_text())
+        assert [event['name'] for event in trace['traceEvents']] == ['foo', 'bar', 'unfinished']
+        foo, bar, _ = trace['traceEvents']
+        assert foo['args'] == {'file': 'test.feature', 'workers': '3'}
+        # bar is within foo
+        assert foo['ts'] <= bar['ts']
+        assert foo['ts'] + foo['dur'] >= bar['ts'] + bar['dur']
+    finally:
+        rm_rf(test_context)
+
+
+def test_tracer_summary() -> None:
+    tracer = Tracer()
+
+    assert tracer.summary() == (
+        'phase  count    total ms      max ms\n'
+        '------------------------------------'
+    )
+
+    for name in ['parse arguments', 'run_command', 'run_command', 'dist']:
+        with tracer.span(name):
+            pass
+
+    tracer.spans[1].duration = 0.1
+    tracer.spans[2].duration = 0.25
+    tracer.spans[3].duration = 1.5
+    tracer.spans[0].duration = 0.0123
+
+    assert tracer.summary() == (
+        'phase            count    total ms      max ms\n'
+        '----------------------------------------------\n'
+        'parse arguments      1        12.3        12.3\n'
+        'run_command          2       350.0       250.0\n'
+        'dist                 1      1500.0      1500.0'
+    )
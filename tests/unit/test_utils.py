@@ -1,126 +1,190 @@
-from typing import Any, Dict, List, Tuple, Union
-from os import chdir, getcwd
+import os
+import sys
+import subprocess
+
+from io import StringIO
+from time import sleep, perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from random import Random
+from os import environ
 from textwrap import dedent
-from importlib import reload
 from argparse import Namespace
-from tempfile import gettempdir
-from contextlib import ExitStack
+from pathlib import Path
+from dataclasses import asdict
+from json import loads as jsonloads
 
 import pytest
+import requests
 
 from _pytest.tmpdir import TempPathFactory
 from _pytest.capture import CaptureFixture
 from pytest_mock import MockerFixture
-from unittest.mock import mock_open, patch as unittest_patch
 from requests_mock import Mocker as RequestsMocker
 
 from grizzly_cli.utils import (
-    parse_feature_file,
-    list_images,
+    logger,
+    inspect_image,
+    run_probes,
+    forget_image,
     get_default_mtu,
     requirements,
     run_command,
+    run_commands,
+    _read_output,
     get_distributed_system,
     find_variable_names_in_questions,
     distribution_of_users_per_scenario,
+    _render_template,
+    apportion,
+    allocate_users_to_workers,
     ask_yes_no,
     get_dependency_versions,
+    get_git_mirror,
+    git_show,
+    setuptools_scm_version,
+    get_cache_dir,
+    get_pypi,
+    _get_pypi_session,
     find_metadata_notices,
+    FeatureDocument,
     setup_logging,
+    write_file_atomic,
+    ProgressSpinner,
+    merge_dicts,
+    LayeredConfiguration,
 )
+from grizzly_cli.tracing import tracer
 
-from tests.helpers import create_scenario, rm_rf
+from tests.helpers import create_scenario, patch_feature_document, rm_rf
 
-CWD = getcwd()
 
-
-def test_parse_feature_file(tmp_path_factory: TempPathFactory) -> None:
-    test_context = tmp_path_factory.mktemp('test_context')
-    test_context_root = str(test_context)
+def test_feature_document(tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('feature_document_context')
     feature_file = test_context / 'test.feature'
-    feature_file.touch()
     feature_file.write_text(dedent('''
+    # grizzly-cli run --verbose
+    # grizzly-cli:notice have you created testdata?
     Feature: test feature
         Background:
             Given a common test step
             When executed in every scenario
         Scenario: scenario-1
             Given a test step
-            And another test step
+            And ask for value of variable "foo"
         Scenario: scenario-2
+            # grizzly-cli:notice is the event log cleared?
             Given a second test step
             Then execute it
             When done, just stop
     '''))
 
-    chdir(test_context_root)
-
     try:
-        import grizzly_cli
-        reload(grizzly_cli)
-        reload(grizzly_cli.utils)
-
-        assert len(grizzly_cli.SCENARIOS) == 0
-
-        parse_feature_file('test.feature')
-
-        import grizzly_cli
-
-        cached_scenarios = grizzly_cli.SCENARIOS.copy()
-        assert len(grizzly_cli.SCENARIOS) == 2
-        assert list(grizzly_cli.SCENARIOS)[0].name == 'scenario-1'
-        assert len(list(grizzly_cli.SCENARIOS)[0].steps) == 2
-        assert len(list(grizzly_cli.SCENARIOS)[0].background_steps) == 2
-        assert list(grizzly_cli.SCENARIOS)[1].name == 'scenario-2'
-        assert len(list(grizzly_cli.SCENARIOS)[1].steps) == 3
-        assert len(list(grizzly_cli.SCENARIOS)[1].background_steps) == 2
-
-        parse_feature_file('test.feature')
-
-        import grizzly_cli
-
-        assert grizzly_cli.SCENARIOS == cached_scenarios
-
+        document = FeatureDocument.load(str(feature_file))
+
+        assert document.file == str(feature_file)
+        assert document.content == feature_file.read_text()
+        assert document.metadata == [['run', '--verbose']]
+        assert document.notices == ['have you created testdata?', 'is the event log cleared?']
+
+        # parsed when first needed
+        assert document._scenarios is None
+        assert document.description == 'test feature'
+        assert len(document.scenarios) == 2
+        assert document.scenarios[0].name == 'scenario-1'
+        assert len(document.scenarios[0].steps) == 2
+        assert len(document.scenarios[0].background_steps) == 2
+        assert document.scenarios[1].name == 'scenario-2'
+        assert len(document.scenarios[1].steps) == 3
+        assert len(document.scenarios[1].background_steps) == 2
+        assert document.variables == ['foo']
+
+        # same file is only read once, as long as it has not changed
+        assert FeatureDocument.load(str(feature_file)) is document
+
+        feature_file.write_text('Feature: changed\n    Scenario: scenario-1\n        Given a test step\n')
+        changed_document = FeatureDocument.load(str(feature_file))
+
+        assert changed_document is not document
+        assert changed_document.description == 'changed'
+        assert changed_document.metadata == []
+        assert changed_document.notices == []
+        assert [scenario.name for scenario in changed_document.scenarios] == ['scenario-1']
+        assert changed_document.variables == []
+
+        # documents for different files are not mixed up
+        other_file = test_context / 'other.feature'
+        other_file.write_text('Feature: other\n    Scenario: scenario-3\n        Given a test step\n')
+
+        assert FeatureDocument.load(str(other_file)).description == 'other'
+        assert FeatureDocument.load(str(feature_file)) is changed_document
+
+        # content that has been written does not have to be read again
+        content = 'Feature: created\n    Scenario: scenario-4\n        Given a test step\n'
+        other_file.write_text(content)
+        created_document = FeatureDocument.create(str(other_file), content)
+
+        assert FeatureDocument.load(str(other_file)) is created_document
+        assert created_document.description == 'created'
     finally:
-        chdir(CWD)
-        rm_rf(test_context_root)
+        rm_rf(test_context)
 
 
-def test_list_images(mocker: MockerFixture) -> None:
-    check_output = mocker.patch('grizzly_cli.utils.subprocess.check_output', side_effect=[(
-        '{"name": "mcr.microsoft.com/vscode/devcontainers/python", "tag": "0-3.10", "size": "1.16GB", "created": "2021-12-02 23:46:55 +0100 CET", "id": "a05f8cc8454b"}\n'
-        '{"name": "mcr.microsoft.com/vscode/devcontainers/python", "tag": "0-3.10-bullseye", "size": "1.16GB", "created": "2021-12-02 23:46:55 +0100 CET", "id": "a05f8cc8454b"}\n'
-        '{"name": "mcr.microsoft.com/vscode/devcontainers/python", "tag": "0-3.9", "size": "1.23GB", "created": "2021-12-02 23:27:50 +0100 CET", "id": "bfbce224d490"}\n'
-        '{"name": "mcr.microsoft.com/vscode/devcontainers/python", "tag": "0-3.8", "size": "1.23GB", "created": "2021-12-02 23:10:12 +0100 CET", "id": "8a04d9e5df14"}\n'
-        '{"name": "mcr.microsoft.com/vscode/devcontainers/base", "tag": "0-focal", "size": "343MB", "created": "2021-12-02 22:44:23 +0100 CET", "id": "0cc1cbb6d08d"}\n'
-        '{"name": "mcr.microsoft.com/vscode/devcontainers/python", "tag": "0-3.6", "size": "1.22GB", "created": "2021-12-02 22:17:47 +0100 CET", "id": "cc5abbf52b04"}\n'
-    ).encode()])
+def test_inspect_image(mocker: MockerFixture) -> None:
+    import grizzly_cli.utils
+    mocker.patch.dict(grizzly_cli.utils._inspected_images, clear=True)
+    check_output = mocker.patch('grizzly_cli.utils.subprocess.check_output', side_effect=[
+        (
+            '{"id": "sha256:a05f8cc8454b", "created": "2021-12-02T22:46:55.123Z", "labels": {"org.opencontainers.image.version": "1.5.3"}}\n'
+        ).encode(),
+        subprocess.CalledProcessError(returncode=1, cmd=''),
+        '{"id": "sha256:bfbce224d490", "created": "2021-12-02T22:27:50Z", "labels": null}\n'.encode(),
+    ])
 
     arguments = Namespace(container_system='capsulegirl')
 
-    images = list_images(arguments)
+    image = inspect_image(arguments, 'grizzly-cli-test-project:test-user')
 
+    assert image is not None
+    assert asdict(image) == {
+        'name': 'grizzly-cli-test-project:test-user',
+        'id': 'sha256:a05f8cc8454b',
+        'created': '2021-12-02T22:46:55.123Z',
+        'labels': {'org.opencontainers.image.version': '1.5.3'},
+    }
     assert check_output.call_count == 1
-    args, _ = check_output.call_args_list[-1]
+    args, kwargs = check_output.call_args_list[-1]
     assert args[0] == [
         'capsulegirl',
         'image',
-        'ls',
+        'inspect',
         '--format',
-        '{"name": "{{.Repository}}", "tag": "{{.Tag}}", "size": "{{.Size}}", "created": "{{.CreatedAt}}", "id": "{{.ID}}"}',
+        '{"id": {{ json .Id }}, "created": {{ json .Created }}, "labels": {{ json .Config.Labels }}}',
+        'grizzly-cli-test-project:test-user',
     ]
+    assert kwargs.get('stderr', None) == subprocess.DEVNULL
 
-    assert len(images.keys()) == 2
-    assert sorted(list(images.get('mcr.microsoft.com/vscode/devcontainers/python', {}).keys())) == sorted([
-        '0-3.10',
-        '0-3.10-bullseye',
-        '0-3.9',
-        '0-3.8',
-        '0-3.6',
-    ])
-    assert sorted(list(images.get('mcr.microsoft.com/vscode/devcontainers/base', {}).keys())) == sorted([
-        '0-focal'
-    ])
+    # remembered
+    assert inspect_image(arguments, 'grizzly-cli-test-project:test-user') is image
+    assert check_output.call_count == 1
+
+    # does not exist, which is also remembered
+    assert inspect_image(arguments, 'grizzly-cli-test-project:other-user') is None
+    assert inspect_image(arguments, 'grizzly-cli-test-project:other-user') is None
+    assert check_output.call_count == 2
+
+    forget_image(arguments, 'grizzly-cli-test-project:test-user')
+    forget_image(arguments, 'grizzly-cli-test-project:foobar')
+
+    image = inspect_image(arguments, 'grizzly-cli-test-project:test-user')
+
+    assert image is not None
+    assert asdict(image) == {
+        'name': 'grizzly-cli-test-project:test-user',
+        'id': 'sha256:bfbce224d490',
+        'created': '2021-12-02T22:27:50Z',
+        'labels': {},
+    }
+    assert check_output.call_count == 3
 
 
 def test_get_default_mtu(mocker: MockerFixture) -> None:
@@ -174,39 +238,33 @@ def test_run_command(capsys: CaptureFixture, mocker: MockerFixture) -> None:
     poll_mock = mocker.patch('grizzly_cli.utils.subprocess.Popen.poll', side_effect=[None])
     kill_mock = mocker.patch('grizzly_cli.utils.subprocess.Popen.kill', side_effect=[RuntimeError, None])
 
-    assert run_command(['hello', 'world'], verbose=True).return_code == 133
+    tracer.reset()
+    try:
+        assert run_command(['/usr/bin/hello', 'world'], verbose=True).return_code == 133
+
+        # only the executable is traced, arguments can contain secrets
+        assert [(span.name, span.args) for span in tracer.spans] == [('run_command', {'command': 'hello'})]
+    finally:
+        tracer.reset()
 
     capture = capsys.readouterr()
     assert capture.out == ''
-    assert capture.err == 'run_command: hello world\n'
+    assert capture.err == 'run_command: /usr/bin/hello world\n'
 
     assert terminate.call_count == 1
     assert wait.call_count == 1
     assert poll_mock.call_count == 1
     assert kill_mock.call_count == 1
 
-    def mock_command_output(output: List[str], returncode: int = 0) -> None:
-        output_buffer: List[Union[bytes, int]] = [f'{line}\n'.encode('utf-8') for line in output] + [0]
-
-        def popen___init__(*args: Tuple[Any, ...], **kwargs: Dict[str, Any]) -> None:
-            setattr(args[0], 'returncode', returncode)
-
-            class Stdout:
-                def readline(self) -> Union[bytes, int]:
-                    return output_buffer.pop(0)
+    mocker.stopall()
 
-            setattr(args[0], 'stdout', Stdout())
+    def python_command(source: str) -> List[str]:
+        return [sys.executable, '-c', dedent(source)]
 
-        mocker.patch('grizzly_cli.utils.subprocess.Popen.terminate', side_effect=[KeyboardInterrupt])
-        mocker.patch('grizzly_cli.utils.subprocess.Popen.__init__', popen___init__)
-
-    mock_command_output([
-        'first line',
-        'second line',
-    ])
-    poll_mock = mocker.patch('grizzly_cli.utils.subprocess.Popen.poll', side_effect=[None] * 3)
-
-    result = run_command([], {})
+    result = run_command(python_command("""
+        print('first line')
+        print('second line\\r  ')
+    """), {})
     assert result.return_code == 0
     assert result.output is None
     assert result.abort_timestamp is None
@@ -218,36 +276,226 @@ def test_run_command(capsys: CaptureFixture, mocker: MockerFixture) -> None:
         'second line\n'
     )
 
-    assert wait.call_count == 2
-    assert poll_mock.call_count == 3
-    assert kill_mock.call_count == 2
-
-    mock_command_output([
-        'hello world',
-        'foo bar',
-        'bar grizzly.returncode=1234 foo',
-        'grizzly.returncode=4321',
-        'world foo hello bar',
-    ], 4321)
-    poll_mock = mocker.patch('grizzly_cli.utils.subprocess.Popen.poll', side_effect=[None] * 6)
-
-    result = run_command([], {}, silent=True)
-    assert result.return_code == 4321
+    result = run_command(python_command("""
+        import sys
+        print('hello world')
+        print('foo bar')
+        print('bar grizzly.returncode=1234 foo')
+        print('grizzly.returncode=123')
+        print('world foo hello bar', end='')
+        sys.exit(123)
+    """), {}, silent=True)
+    assert result.return_code == 123
     assert result.output == [
         b'hello world\n',
         b'foo bar\n',
         b'bar grizzly.returncode=1234 foo\n',
-        b'grizzly.returncode=4321\n',
-        b'world foo hello bar\n',
+        b'grizzly.returncode=123\n',
+        b'world foo hello bar',
     ]
 
     capture = capsys.readouterr()
     assert capture.err == ''
     assert capture.out == ''
 
-    assert wait.call_count == 3
-    assert poll_mock.call_count == 6
-    assert kill_mock.call_count == 3
+    # lines are put together when split over more than one chunk
+    mocker.patch('grizzly_cli.utils.RUN_COMMAND_CHUNK_SIZE', 7)
+
+    result = run_command(python_command("""
+        import sys
+        sys.stdout.write('\\n'.join(f'line {index} \\r progress' for index in range(1000)) + '\\n')
+    """))
+    assert result.return_code == 0
+
+    capture = capsys.readouterr()
+    assert capture.out == ''
+    assert capture.err == ''.join(f'line {index} \r progress\n' for index in range(1000))
+
+    # lines are logged in batches
+    mocker.patch('grizzly_cli.utils.RUN_COMMAND_CHUNK_SIZE', 64 * 1024)
+    logger_info_spy = mocker.spy(logger, 'info')
+
+    result = run_command(python_command("""
+        import sys
+        sys.stdout.write(''.join(f'line {index}\\n' for index in range(1000)))
+    """))
+    assert result.return_code == 0
+    assert logger_info_spy.call_count < 10
+
+    capture = capsys.readouterr()
+    assert capture.err == ''.join(f'line {index}\n' for index in range(1000))
+
+    # output is not logged when showing a spinner
+    result = run_command(python_command("""
+        print('hello world')
+    """), spinner='building')
+    assert result.return_code == 0
+
+    capture = capsys.readouterr()
+    assert capture.out == ''
+    assert capture.err == ''
+
+    # only the last lines are kept in silent mode
+    mocker.patch('grizzly_cli.utils.RUN_COMMAND_OUTPUT_LINES', 10)
+
+    result = run_command(python_command("""
+        for index in range(1000):
+            print(f'line {index}')
+    """), silent=True)
+    assert result.return_code == 0
+    assert result.output == [f'line {index}\n'.encode() for index in range(990, 1000)]
+
+    capture = capsys.readouterr()
+    assert capture.err == ''
+    assert capture.out == ''
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='select does not work with pipes on windows')
+def test__read_output(mocker: MockerFixture) -> None:
+    read_fd, write_fd = os.pipe()
+    stdout = os.fdopen(read_fd, 'rb')
+
+    try:
+        process = mocker.MagicMock()
+        process.poll.return_value = None
+
+        # output is read until pipe is closed
+        os.write(write_fd, b'hello world\n')
+        chunks = _read_output(process, stdout)
+        assert next(chunks) == b'hello world\n'
+        os.close(write_fd)
+        write_fd = -1
+        assert list(chunks) == []
+        process.poll.assert_not_called()
+
+        # output written just before the process exited is read, even if something else keeps the pipe open
+        read_fd, write_fd = os.pipe()
+        stdout.close()
+        stdout = os.fdopen(read_fd, 'rb')
+
+        def poll() -> int:
+            os.write(write_fd, b'last words\n')
+            return 0
+
+        process.poll.side_effect = poll
+
+        assert list(_read_output(process, stdout)) == [b'last words\n']
+        process.poll.assert_called_once_with()
+    finally:
+        stdout.close()
+        if write_fd > -1:
+            os.close(write_fd)
+
+
+def test_run_commands(capsys: CaptureFixture) -> None:
+    setup_logging()
+
+    def python_command(source: str) -> List[str]:
+        return [sys.executable, '-c', dedent(source)]
+
+    assert run_commands({}) == {}
+
+    results = run_commands({
+        'master': python_command("""
+            import sys, time
+            time.sleep(0.5)
+            print('master done')
+            sys.exit(3)
+        """),
+        'worker-1': python_command("""
+            import sys, time
+            print('worker started', flush=True)
+            sys.stdout.write('partial line')
+            sys.stdout.flush()
+            time.sleep(60)
+        """),
+        'worker-2': python_command("""
+            print('first line')
+            print('second line\\r  ')
+        """),
+    }, {}, verbose=True)
+
+    # workers that are still running when master exits are terminated
+    assert results['master'].return_code == 3
+    assert results['worker-1'].return_code == -15
+    assert results['worker-2'].return_code == 0
+
+    capture = capsys.readouterr()
+    assert capture.out == ''
+
+    lines = capture.err.splitlines()
+    assert [line for line in lines if line.startswith('run_commands: ')] == [
+        f'run_commands: {name}: {sys.executable} -c ' for name in ['master', 'worker-1', 'worker-2']
+    ]
+    output = sorted([line for line in lines if ' | ' in line])
+    assert output == [
+        'master   | master done',
+        'worker-1 | partial line',
+        'worker-1 | worker started',
+        'worker-2 | first line',
+        'worker-2 | second line',
+    ]
+
+
+def test_progress_spinner() -> None:
+    output = StringIO()
+
+    spinner = ProgressSpinner('building', file=output, check_tty=False, interval=0.05)
+    assert spinner.received_size == '0 B'
+
+    spinner.start()
+
+    # redrawn by timer, even if nothing is received
+    sleep(0.3)
+    redraws = output.getvalue().count('\r')
+    assert redraws >= 3
+
+    # not redrawn when something is received
+    for _ in range(1000):
+        spinner.received += 1024
+
+    assert output.getvalue().count('\r') - redraws <= 2
+
+    spinner.finish()
+    assert spinner._thread is None
+
+    last_line = output.getvalue().rsplit('\r', 1)[-1]
+    assert last_line.startswith('building 0:00:00, 1000.0 KB ')
+
+    output_length = len(output.getvalue())
+    sleep(0.1)
+    assert len(output.getvalue()) == output_length
+
+    spinner.received = 12 * 1024 * 1024 * 1024 + 512 * 1024 * 1024
+    assert spinner.received_size == '12.5 GB'
+    spinner.received = 3 * 1024 * 1024
+    assert spinner.received_size == '3.0 MB'
+    spinner.received = 1023
+    assert spinner.received_size == '1023 B'
+
+
+def test_write_file_atomic(mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+
+    try:
+        file = test_context / 'test.lock.feature'
+
+        write_file_atomic(file, 'Feature: hello')
+        assert file.read_text() == 'Feature: hello'
+
+        write_file_atomic(file, 'Feature: world')
+        assert file.read_text() == 'Feature: world'
+
+        # file is not touched, and no temporary file is left, if replace fails
+        mocker.patch('grizzly_cli.utils.os.replace', side_effect=[OSError('replace failed')])
+
+        with pytest.raises(OSError):
+            write_file_atomic(file, 'Feature: foobar')
+
+        assert file.read_text() == 'Feature: world'
+        assert [path.name for path in test_context.iterdir()] == ['test.lock.feature']
+    finally:
+        rm_rf(test_context)
 
 
 def test_get_distributed_system(capsys: CaptureFixture, mocker: MockerFixture) -> None:
@@ -316,12 +564,11 @@ def test_get_distributed_system(capsys: CaptureFixture, mocker: MockerFixture) -
 
 
 def test_find_variable_names_in_questions(mocker: MockerFixture) -> None:
-    mocker.patch('grizzly_cli.SCENARIOS', [])
-    mocker.patch('grizzly_cli.utils.parse_feature_file', autospec=True)
+    patch_feature_document(mocker, [])
 
     assert find_variable_names_in_questions('test.feature') == []
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [],
@@ -336,7 +583,7 @@ def test_find_variable_names_in_questions(mocker: MockerFixture) -> None:
         find_variable_names_in_questions('test.feature')
     assert 'could not find variable name in "ask for value of variable test_variable_1"' in str(ve)
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [],
@@ -395,6 +642,86 @@ Feature: test -1
         rm_rf(test_context)
 
 
+def test_apportion() -> None:
+    assert apportion(0, []) == []
+    assert apportion(10, [1]) == [10]
+    assert apportion(10, [1, 1, 1]) == [4, 3, 3]
+    assert apportion(10, [3, 3, 3]) == [4, 3, 3]
+    assert apportion(10, [1, 2, 2]) == [2, 4, 4]
+    assert apportion(12, [50, 12, 21, 4, 6, 3, 3]) == [5, 1, 2, 1, 1, 1, 1]
+    assert apportion(36, [16, 20, 35, 6, 10, 5, 5]) == [6, 7, 13, 2, 4, 2, 2]
+    assert apportion(4, [1, 50, 0, 0]) == [1, 3, 0, 0]
+    assert apportion(4, [0, 0]) == [0, 0]
+    assert apportion(7, [0.5, 0.25, 0.25]) == [3, 2, 2]
+    assert apportion(10, [1, 1000], minimum=3) == [3, 7]
+    assert apportion(10, [1, 1000], minimum=0) == [0, 10]
+
+    with pytest.raises(ValueError) as ve:
+        apportion(2, [1, 1, 1])
+    assert str(ve.value) == '2 can not be divided in 3 shares of at least 1'
+
+    with pytest.raises(ValueError) as ve:
+        apportion(10, [1, -1])
+    assert str(ve.value) == 'weights can not be negative'
+
+    # properties that must hold for any input
+    random = Random(1337)
+
+    for _ in range(1000):
+        count = random.randint(1, 40)
+        minimum = random.randint(0, 2)
+        weights: List[float] = [random.choice([0, random.randint(1, 100), random.random() * 10]) for _ in range(count)]
+        weighted = [weight for weight in weights if weight > 0]
+        total = random.randint(len(weighted) * minimum, len(weighted) * minimum + 500)
+
+        shares = apportion(total, weights, minimum=minimum)
+
+        assert len(shares) == count
+        assert sum(shares) == (total if len(weighted) > 0 else 0)
+
+        for weight, share in zip(weights, shares):
+            assert share >= minimum if weight > 0 else share == 0
+
+        # more weight never gets fewer users
+        for (weight_a, share_a), (weight_b, share_b) in zip(sorted(zip(weights, shares)), sorted(zip(weights, shares))[1:]):
+            assert weight_a == weight_b or share_a <= share_b
+
+        # without minimum it is the largest remainder method, every share is its quota rounded up or down
+        if minimum == 0 and len(weighted) > 0:
+            for weight, share in zip(weights, shares):
+                assert abs(share - total * weight / sum(weights)) < 1
+
+        # same input, same result
+        assert apportion(total, weights, minimum=minimum) == shares
+
+
+def test_allocate_users_to_workers() -> None:
+    assert allocate_users_to_workers([], 2) == [[], []]
+    assert allocate_users_to_workers([3], 1) == [[3]]
+    assert allocate_users_to_workers([3, 1], 2) == [[2, 0], [1, 1]]
+    assert allocate_users_to_workers([1, 1, 1, 1], 2) == [[1, 0, 1, 0], [0, 1, 0, 1]]
+    assert allocate_users_to_workers([4, 2, 1], 3) == [[3, 0, 0], [0, 2, 0], [1, 0, 1]]
+    # skewed, each worker only gets users of one scenario
+    assert allocate_users_to_workers([3, 2], 2) == [[3, 0], [0, 2]]
+    assert allocate_users_to_workers([1], 3) == [[1], [0], [0]]
+
+    with pytest.raises(ValueError) as ve:
+        allocate_users_to_workers([1], 0)
+    assert str(ve.value) == 'there must be at least 1 worker'
+
+    random = Random(1337)
+
+    for _ in range(200):
+        user_counts = [random.randint(0, 50) for _ in range(random.randint(1, 10))]
+        workers = random.randint(1, 8)
+        allocation = allocate_users_to_workers(user_counts, workers)
+
+        # all users are allocated, and workers never differ with more than one user
+        assert [sum(worker_users[index] for worker_users in allocation) for index in range(len(user_counts))] == user_counts
+        worker_totals = [sum(worker_users) for worker_users in allocation]
+        assert max(worker_totals) - min(worker_totals) <= 1
+
+
 def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: MockerFixture) -> None:
     setup_logging()
 
@@ -402,7 +729,7 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
 
     ask_yes_no = mocker.patch('grizzly_cli.utils.ask_yes_no', autospec=True)
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [],
@@ -418,7 +745,7 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
         distribution_of_users_per_scenario(arguments, {})
     assert str(ve.value) == 'grizzly needs at least 1 users to run this feature'
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [
@@ -450,7 +777,7 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
 
     capsys.readouterr()
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [
@@ -499,7 +826,7 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
     args, _ = ask_yes_no.call_args_list[-1]
     assert args[0] == 'continue?'
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [],
@@ -511,7 +838,7 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
         distribution_of_users_per_scenario(arguments, {})
     assert 'scenario "scenario-1" does not have any steps' in str(ve)
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             ['Given "1" users'],
@@ -523,7 +850,7 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
         distribution_of_users_per_scenario(arguments, {})
     assert 'scenario-1 does not have a user type' in str(ve)
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [
@@ -549,11 +876,12 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
         )
     ])
 
-    import grizzly_cli.utils
+    from jinja2 import Template
 
-    render = mocker.spy(grizzly_cli.utils.Template, 'render')  # type: ignore
+    _render_template.cache_clear()
+    render = mocker.spy(Template, 'render')
 
-    distribution_of_users_per_scenario(arguments, {
+    testdata = {
         'TESTDATA_VARIABLE_users': '40',
         'TESTDATA_VARIABLE_boolean': 'True',
         'TESTDATA_VARIABLE_integer': '500',
@@ -562,7 +890,9 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
         'TESTDATA_VARIABLE_neg_integer': '-100',
         'TESTDATA_VARIABLE_neg_float': '-1.33',
         'TESTDATA_VARIABLE_pad_integer': '001',
-    })
+    }
+
+    distribution_of_users_per_scenario(arguments, testdata)
     capture = capsys.readouterr()
 
     assert capture.out == ''
@@ -584,7 +914,8 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
     args, _ = ask_yes_no.call_args_list[-1]
     assert args[0] == 'continue?'
 
-    assert render.call_count == 5
+    # default weight of scenario-2 does not have any expressions, so it is not rendered
+    assert render.call_count == 4
     for _, kwargs in render.call_args_list:
         assert kwargs.get('boolean', None)
         assert kwargs.get('integer', None) == 500
@@ -594,7 +925,12 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
         assert kwargs.get('neg_float', None) == -1.33
         assert kwargs.get('pad_integer', None) == '001'
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    # same expressions with the same variables are only rendered once
+    distribution_of_users_per_scenario(arguments, testdata)
+    assert capsys.readouterr().err == capture.err
+    assert render.call_count == 4
+
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1 testing a lot of stuff',
             [
@@ -649,9 +985,9 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
         '\n',
     ])
     capsys.readouterr()
-    assert ask_yes_no.call_count == 2
+    assert ask_yes_no.call_count == 3
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1',
             [
@@ -701,7 +1037,7 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
     ])
     capsys.readouterr()
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-1 testing a lot of stuff',
             [
@@ -801,10 +1137,10 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
             'ident   weight  #iter  #user  description\n',
             '------|-------|------|------|-------------|\n'
             '001         33     23      6  scenario-0 \n',
-            '002         16      5      2  scenario-1 \n',
+            '002         16      5      3  scenario-1 \n',
             '003         28      8      5  scenario-2 \n',
             '004          5      2      1  scenario-3 \n',
-            '005          8      3      2  scenario-4 \n',
+            '005          8      3      1  scenario-4 \n',
             '006          4      1      1  scenario-5 \n',
             '007          4      1      1  scenario-6 \n',
             '------|-------|------|------|-------------|\n',
@@ -823,9 +1159,9 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
             '------|-------|------|------|-------------|\n',
             '001         25     35      6  scenario-0 \n',
             '002         18      8      4  scenario-1 \n',
-            '003         31     13      7  scenario-2 \n',
+            '003         31     13      8  scenario-2 \n',
             '004          6      2      2  scenario-3 \n',
-            '005          9      4      3  scenario-4 \n',
+            '005          9      4      2  scenario-4 \n',
             '006          4      2      1  scenario-5 \n',
             '007          4      2      1  scenario-6 \n',
             '------|-------|------|------|-------------|\n',
@@ -845,10 +1181,10 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
             '001         20     56      6  scenario-0 \n',
             '002         20     12      6  scenario-1 \n',
             '003         33     21     10  scenario-2 \n',
-            '004          6      4      1  scenario-3 \n',
+            '004          6      4      2  scenario-3 \n',
             '005         10      6      3  scenario-4 \n',
             '006          4      3      2  scenario-5 \n',
-            '007          4      3      2  scenario-6 \n',
+            '007          4      3      1  scenario-6 \n',
             '------|-------|------|------|-------------|\n',
             '\n',
         ])
@@ -865,8 +1201,8 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
             '------|-------|------|------|-------------|\n',
             '001         16     66      6  scenario-0 \n',
             '002         20     15      7  scenario-1 \n',
-            '003         35     24     12  scenario-2 \n',
-            '004          6      5      3  scenario-3 \n',
+            '003         35     24     13  scenario-2 \n',
+            '004          6      5      2  scenario-3 \n',
             '005         10      8      4  scenario-4 \n',
             '006          5      3      2  scenario-5 \n',
             '007          5      3      2  scenario-6 \n',
@@ -886,8 +1222,8 @@ def test_distribution_of_users_per_scenario(capsys: CaptureFixture, mocker: Mock
             '------|-------|------|------|-------------|\n',
             '001         16  23940      6  scenario-0 \n',
             '002         20   5250      7  scenario-1 \n',
-            '003         35   8820     12  scenario-2 \n',
-            '004          6   1680      3  scenario-3 \n',
+            '003         35   8820     13  scenario-2 \n',
+            '004          6   1680      2  scenario-3 \n',
             '005         10   2730      4  scenario-4 \n',
             '006          5   1260      2  scenario-5 \n',
             '007          5   1260      2  scenario-6 \n',
@@ -906,7 +1242,7 @@ def test_distribution_of_users_per_scenario_advanced(capsys: CaptureFixture, moc
         'And spawn rate is "{{ rate }}" users per second'
     ]
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-0',
             background_steps,
@@ -988,7 +1324,7 @@ def test_distribution_of_users_per_scenario_no_weights(capsys: CaptureFixture, m
         'Given spawn rate is "{{ rate }}" users per second'
     ]
 
-    mocker.patch('grizzly_cli.SCENARIOS', [
+    patch_feature_document(mocker, [
         create_scenario(
             'scenario-0',
             background_steps,
@@ -1033,6 +1369,147 @@ def test_distribution_of_users_per_scenario_no_weights(capsys: CaptureFixture, m
     capsys.readouterr()
 
 
+def test_distribution_of_users_per_scenario_plan(capsys: CaptureFixture, mocker: MockerFixture, tmp_path_factory: TempPathFactory) -> None:
+    test_context = tmp_path_factory.mktemp('plan_context')
+    plan_file = test_context / 'plan.json'
+
+    setup_logging()
+
+    patch_feature_document(mocker, [
+        create_scenario(
+            'scenario-1',
+            ['Given "5" users'],
+            [
+                'Given a user of type "RestApi" with weight "3" load testing "https://localhost"',
+                'And repeat for "10" iterations',
+            ],
+        ),
+        create_scenario(
+            'scenario-2',
+            [],
+            [
+                'Given a user of type "MessageQueueUser" with weight "2" load testing "mqs://localhost"',
+                'And repeat for "5" iterations',
+            ],
+        ),
+    ])
+
+    try:
+        arguments = Namespace(file='integration.lock.feature', files=['integration.feature'], yes=True, workers=2, plan_output=plan_file.as_posix())
+
+        plan = distribution_of_users_per_scenario(arguments, {})
+        capture = capsys.readouterr()
+
+        assert capture.out == ''
+        assert capture.err.endswith(f'plan written to {plan_file.as_posix()}\n\n')
+        assert jsonloads(plan_file.read_text()) == {'features': [plan]}
+        assert plan == {
+            'file': 'integration.feature',
+            'users': 5,
+            'iterations': 15,
+            'scenarios': [
+                {'identifier': '001', 'name': 'scenario-1', 'user': 'RestApi', 'weight': 3, 'iterations': 10, 'users': 3},
+                {'identifier': '002', 'name': 'scenario-2', 'user': 'MessageQueueUser', 'weight': 2, 'iterations': 5, 'users': 2},
+            ],
+            'workers': [
+                {'worker': 1, 'users': 3, 'iterations': 10, 'scenarios': {'001': {'users': 3, 'iterations': 10}}},
+                {'worker': 2, 'users': 2, 'iterations': 5, 'scenarios': {'002': {'users': 2, 'iterations': 5}}},
+            ],
+        }
+
+        # without workers, everything is on one
+        plan_file.unlink()
+        arguments = Namespace(file='integration.feature', yes=True, plan_output=None)
+
+        plan = distribution_of_users_per_scenario(arguments, {})
+        capsys.readouterr()
+
+        assert not plan_file.exists()
+        assert plan['workers'] == [
+            {'worker': 1, 'users': 5, 'iterations': 15, 'scenarios': {'001': {'users': 3, 'iterations': 10}, '002': {'users': 2, 'iterations': 5}}},
+        ]
+    finally:
+        rm_rf(test_context)
+
+
+def test_run_probes(mocker: MockerFixture) -> None:
+    # grizzly_cli.utils is reloaded in other tests, get the current class
+    from grizzly_cli.utils import ProbeError
+
+    logger_info = mocker.patch('grizzly_cli.utils.logger.info')
+
+    def probe(value: Any, delay: float) -> Callable[[], Any]:
+        def wrapped() -> Any:
+            sleep(delay)
+            if isinstance(value, Exception):
+                raise value
+
+            return value
+
+        return wrapped
+
+    assert run_probes({}) == {}
+
+    # concurrently
+    start = perf_counter()
+    results = run_probes({
+        'foo': probe('foo', 0.2),
+        'bar': probe(None, 0.2),
+        'baz': probe({'hello': 'world'}, 0.2),
+    })
+    assert perf_counter() - start < 0.4
+
+    assert list(results.keys()) == ['foo', 'bar', 'baz']
+    assert results['foo'].value == 'foo'
+    assert results['bar'].value is None
+    assert results['baz'].value == {'hello': 'world'}
+    for result in results.values():
+        assert result.error is None
+        assert result.duration is not None
+        assert result.duration >= 0.2
+    logger_info.assert_not_called()
+
+    # verbose
+    run_probes({'foo': probe('foo', 0.0)}, verbose=True)
+    assert logger_info.call_count == 1
+    args, _ = logger_info.call_args_list[-1]
+    assert args[0].startswith('probe foo: ')
+    assert args[0].endswith(' ms')
+
+    logger_info.reset_mock()
+
+    # fail fast, probes that fails long after the first one are not waited for
+    start = perf_counter()
+    with pytest.raises(ProbeError) as pe:
+        run_probes({
+            'foo': probe('foo', 3.0),
+            'bar': probe(ValueError('bar is not ok'), 0.1),
+            'baz': probe(subprocess.CalledProcessError(returncode=1, cmd='baz'), 1.5),
+        }, verbose=True)
+    assert perf_counter() - start < 1.0
+
+    assert isinstance(pe.value, ValueError)
+    assert str(pe.value) == '!! bar failed: bar is not ok'
+    assert [result.name for result in pe.value.results] == ['bar']
+    assert [call.args[0] for call in logger_info.call_args_list if call.args[0].endswith('not finished')] == [
+        'probe foo: not finished',
+        'probe baz: not finished',
+    ]
+
+    # probes that fails at the same time, the first failure is always included
+    with pytest.raises(ProbeError) as pe:
+        run_probes({
+            'foo': probe('foo', 3.0),
+            'bar': probe(ValueError('bar is not ok'), 0.1),
+            'baz': probe(subprocess.CalledProcessError(returncode=1, cmd='baz'), 0.1),
+        })
+
+    failed = [result.name for result in pe.value.results]
+    assert len(failed) > 0
+    assert set(failed) <= {'bar', 'baz'}
+    assert "!! baz failed: Command 'baz' returned non-zero exit status 1." in str(pe.value) or '!! bar failed: bar is not ok' in str(pe.value)
+
+
 def test_ask_yes_no(capsys: CaptureFixture, mocker: MockerFixture) -> None:
     get_input = mocker.patch('grizzly_cli.utils.get_input', side_effect=['yeah', 'n', 'y'])
 
@@ -1058,9 +1535,39 @@ def test_ask_yes_no(capsys: CaptureFixture, mocker: MockerFixture) -> None:
         assert args[0] == 'are you sure you know what you are doing? [y/n]: '
 
 
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.check_output(
+        ['git', '-c', 'user.name=grizzly', '-c', 'user.email=grizzly@example.com', '-c', 'init.defaultBranch=main', *args],
+        cwd=repo,
+        universal_newlines=True,
+        stderr=subprocess.DEVNULL,
+    ).strip()
+
+
+def _git_commit(repo: Path, files: Dict[str, Optional[str]], tag: Optional[str] = None) -> str:
+    for name, content in files.items():
+        file = repo / name
+        if content is None:
+            file.unlink()
+        else:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_text(content)
+
+    _git(repo, 'add', '-A')
+    _git(repo, 'commit', '-q', '-m', 'test')
+
+    if tag is not None:
+        _git(repo, 'tag', tag)
+
+    return _git(repo, 'rev-parse', 'HEAD')
+
+
 def test_get_dependency_versions_git(mocker: MockerFixture, tmp_path_factory: TempPathFactory, capsys: CaptureFixture) -> None:
     test_context = tmp_path_factory.mktemp('test_context')
     requirements_file = test_context / 'requirements.txt'
+    work_repo = test_context / 'grizzly'
+    bare_repo = test_context / 'grizzly.git'
+    url = bare_repo.as_uri()
 
     mocker.patch('grizzly_cli.EXECUTION_CONTEXT', str(test_context))
 
@@ -1078,213 +1585,235 @@ def test_get_dependency_versions_git(mocker: MockerFixture, tmp_path_factory: Te
         assert capture.err == f'!! unable to find grizzly dependency in {requirements_file.absolute()}\n'
         assert capture.out == ''
 
-        requirements_file.write_text('git+https://github.com/Biometria-se/grizzly.git@v1.5.3#egg=grizzly-loadtester')
-        import subprocess
-        with ExitStack() as stack:
-            stack.enter_context(
-                mocker.patch.context_manager(subprocess, 'check_call', side_effect=[1, 0, 0, 1, 0]),
-            )
-            stack.enter_context(
-                mocker.patch.context_manager(subprocess, 'check_output', side_effect=[
-                    subprocess.CalledProcessError(returncode=1, cmd=''),
-                    'main\n',
-                    'branch\n',
-                    'v1.5.3\n',
-                ]),
-            )
-
-            assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
-
-            capture = capsys.readouterr()
-            assert capture.err == '!! unable to clone git repo https://github.com/Biometria-se/grizzly.git\n'
-            assert capture.out == ''
-
-            assert subprocess.check_call.call_count == 1  # type: ignore  # pylint: disable=no-member
-            assert subprocess.check_output.call_count == 0  # type: ignore  # pylint: disable=no-member
-
-            # git clone...
-            args, kwargs = subprocess.check_call.call_args_list[0]  # type: ignore  # pylint: disable=no-member
-            assert len(args) == 1
-            args = args[0]
-            assert args[:-1] == ['git', 'clone', '--filter=blob:none', '-q', 'https://github.com/Biometria-se/grizzly.git']
-            assert args[-1].startswith(gettempdir())
-            assert args[-1].endswith('grizzly-loadtester_3f210f1809f6ca85ef414b2b4d450bf54353b5e0')
-            assert not kwargs.get('shell', True)
-            assert kwargs.get('stdout', None) == subprocess.DEVNULL
-            assert kwargs.get('stderr', None) == subprocess.DEVNULL
-
-            assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
-
-            capture = capsys.readouterr()
-            assert capture.err == '!! unable to check branch name of HEAD in git repo https://github.com/Biometria-se/grizzly.git\n'
-            assert capture.out == ''
-
-            assert subprocess.check_call.call_count == 2  # type: ignore  # pylint: disable=no-member
-            assert subprocess.check_output.call_count == 1  # type: ignore  # pylint: disable=no-member
-
-            # git rev-parse...
-            args, kwargs = subprocess.check_output.call_args_list[0]  # type: ignore  # pylint: disable=no-member
-            assert len(args) == 1
-            args = args[0]
-            assert args == ['git', 'rev-parse', '--abbrev-ref', 'HEAD']
-            assert not kwargs.get('shell', True)
-            assert kwargs.get('cwd', '').startswith(gettempdir())
-            assert kwargs.get('cwd', '').endswith('grizzly-loadtester_3f210f1809f6ca85ef414b2b4d450bf54353b5e0')
-            assert kwargs.get('universal_newlines', False)
-
-            assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(True)
-
-            capture = capsys.readouterr()
-            assert capture.err == '!! unable to checkout branch v1.5.3 from git repo https://github.com/Biometria-se/grizzly.git\n'
-            assert capture.out == ''
-
-            assert subprocess.check_call.call_count == 4  # type: ignore  # pylint: disable=no-member
-            assert subprocess.check_output.call_count == 3  # type: ignore  # pylint: disable=no-member
-
-            # git checkout...
-            args, kwargs = subprocess.check_call.call_args_list[-1]  # type: ignore  # pylint: disable=no-member
-            assert len(args) == 1
-            args = args[0]
-            assert args == ['git', 'checkout', '-b', 'v1.5.3', '--track', 'origin/v1.5.3']
-            assert kwargs.get('cwd', '').startswith(gettempdir())
-            assert kwargs.get('cwd', '').endswith('grizzly-loadtester_3f210f1809f6ca85ef414b2b4d450bf54353b5e0')
-            assert not kwargs.get('shell', True)
-            assert kwargs.get('stdout', None) == subprocess.DEVNULL
-            assert kwargs.get('stderr', None) == subprocess.DEVNULL
-
-            with pytest.raises(FileNotFoundError):
-                get_dependency_versions(False)
-
-            capture = capsys.readouterr()
-            assert capture.err == ''
-            assert capture.out == ''
-
-            assert subprocess.check_call.call_count == 5  # type: ignore  # pylint: disable=no-member
-            assert subprocess.check_output.call_count == 4  # type: ignore  # pylint: disable=no-member
-
-        with ExitStack() as stack:
-            stack.enter_context(mocker.patch.context_manager(subprocess, 'check_call', return_value=0))
-            stack.enter_context(
-                mocker.patch.context_manager(subprocess, 'check_output', return_value='main\n'),
-            )
-
-            with pytest.raises(FileNotFoundError) as fne:
-                get_dependency_versions(False)
-            assert fne.value.errno == 2
-            assert fne.value.strerror == 'No such file or directory'
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='git+https://github.com/Biometria-se/grizzly.git@v1.5.3#egg=grizzly-loadtester\n').return_value,
-                mock_open(read_data='').return_value,
-            ]) as open_mock:
-                assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == '!! unable to find "__version__" declaration in grizzly/__init__.py from https://github.com/Biometria-se/grizzly.git\n'
-                assert capture.out == ''
-                assert open_mock.call_count == 2
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='git+https://github.com/Biometria-se/grizzly.git@v1.5.3#egg=grizzly-loadtester\n').return_value,
-                mock_open(read_data="__version__ = '0.0.0'").return_value,
-                mock_open(read_data='').return_value,
-            ]) as open_mock:
-                assert (('(development)', [], ), '(unknown)',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == '!! unable to find "locust" dependency in requirements.txt from https://github.com/Biometria-se/grizzly.git\n'
-                assert capture.out == ''
-
-                assert open_mock.call_count == 3
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='git+https://github.com/Biometria-se/grizzly.git@v1.5.3#egg=grizzly-loadtester[dev,mq]\n').return_value,
-                mock_open(read_data="__version__ = '1.5.3'").return_value,
-                mock_open(read_data='locust').return_value,
-            ]) as open_mock:
-                assert (('1.5.3', ['dev', 'mq'], ), '(unknown)',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == '!! unable to find locust version in "locust" specified in requirements.txt from https://github.com/Biometria-se/grizzly.git\n'
-                assert capture.out == ''
-
-                assert open_mock.call_count == 3
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='git+https://github.com/Biometria-se/grizzly.git@v1.5.3#egg=grizzly-loadtester\n').return_value,
-                mock_open(read_data="__version__ = '1.5.3'").return_value,
-                mock_open(read_data='locust==2.2.1 \\ ').return_value,
-            ]) as open_mock:
-                assert (('1.5.3', [], ), '2.2.1',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == ''
-                assert capture.out == ''
-
-                assert open_mock.call_count == 3
-
-            mocker.patch('grizzly_cli.utils.path.exists', return_value=True)
-
-            with pytest.raises(FileNotFoundError) as fne:
-                get_dependency_versions(False)
-            assert fne.value.errno == 2
-            assert fne.value.strerror == 'No such file or directory'
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='git+https://github.com/Biometria-se/grizzly.git@main#egg=grizzly-loadtester\n').return_value,
-                mock_open(read_data='').return_value,
-            ]) as open_mock:
-                assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == '!! unable to find "version" declaration in setup.cfg from https://github.com/Biometria-se/grizzly.git\n'
-                assert capture.out == ''
-                assert open_mock.call_count == 2
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='git+https://github.com/Biometria-se/grizzly.git@main#egg=grizzly-loadtester[mq]\n').return_value,
-                mock_open(read_data='name = grizzly-loadtester\nversion = 2.0.0').return_value,
-                mock_open(read_data='locust==2.8.4 \\ ').return_value,
-            ]) as open_mock:
-                assert (('2.0.0', ['mq'], ), '2.8.4',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == ''
-                assert capture.out == ''
-                assert open_mock.call_count == 3
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='grizzly-loadtester @ git+https://github.com/Biometria-se/grizzly.git@main\n').return_value,
-                mock_open(read_data='').return_value,
-            ]) as open_mock:
-                assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == '!! unable to find "version" declaration in setup.cfg from https://github.com/Biometria-se/grizzly.git\n'
-                assert capture.out == ''
-                assert open_mock.call_count == 2
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='grizzly-loadtester[mq] @ git+https://github.com/Biometria-se/grizzly.git@main\n').return_value,
-                mock_open(read_data='name = grizzly-loadtester\nversion = 2.0.0').return_value,
-                mock_open(read_data='locust==2.8.4 \\ ').return_value,
-            ]) as open_mock:
-                assert (('2.0.0', ['mq'], ), '2.8.4',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == ''
-                assert capture.out == ''
-                assert open_mock.call_count == 3
-
-            with unittest_patch('builtins.open', side_effect=[
-                mock_open(read_data='grizzly-loadtester[mq] % git+https://github.com/Biometria-se/grizzly.git@main\n').return_value,
-            ]) as open_mock:
-                assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
-
-                capture = capsys.readouterr()
-                assert capture.err == f'!! unable to find properly formatted grizzly dependency in {requirements_file}\n'
-                assert capture.out == ''
-                assert open_mock.call_count == 1
+        requirements_file.write_text(f'git+{url}@v1.5.3#egg=grizzly-loadtester')
+
+        assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to clone git repo {url}\n'
+        assert capture.out == ''
+
+        work_repo.mkdir()
+        _git(work_repo, 'init', '-q')
+        v1_5_3 = _git_commit(work_repo, {
+            'grizzly/__init__.py': "__version__ = '1.5.3'\n",
+            'requirements.txt': 'locust==2.2.1 \\ \n',
+        }, tag='v1.5.3')
+        _git(test_context, 'clone', '-q', '--bare', str(work_repo), str(bare_repo))
+
+        assert (('1.5.3', [], ), '2.2.1',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == ''
+        assert capture.out == ''
+
+        # bare mirror in cache, nothing is checked out
+        mirror = get_git_mirror(url, offline=True)
+        assert mirror is not None
+        assert mirror.parent == get_cache_dir('git')
+        assert _git(mirror, 'rev-parse', '--is-bare-repository') == 'true'
+        assert not (mirror / 'grizzly').exists()
+
+        requirements_file.write_text(f'git+{url}@foobar#egg=grizzly-loadtester')
+        assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to find foobar in git repo {url}\n'
+        assert capture.out == ''
+
+        _git_commit(work_repo, {'grizzly/__init__.py': '', 'requirements.txt': ''})
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+
+        requirements_file.write_text(f'git+{url}@main#egg=grizzly-loadtester')
+        assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to find "__version__" declaration in grizzly/__init__.py from {url}\n'
+        assert capture.out == ''
+
+        _git_commit(work_repo, {'grizzly/__init__.py': "__version__ = '0.0.0'\n"})
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+
+        assert (('(development)', [], ), '(unknown)',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to find "locust" dependency in requirements.txt from {url}\n'
+        assert capture.out == ''
+
+        _git_commit(work_repo, {'grizzly/__init__.py': "__version__ = '1.5.3'\n", 'requirements.txt': 'locust\n'})
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+
+        requirements_file.write_text(f'git+{url}@main#egg=grizzly-loadtester[dev,mq]')
+        assert (('1.5.3', ['dev', 'mq'], ), '(unknown)',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to find locust version in "locust" specified in requirements.txt from {url}\n'
+        assert capture.out == ''
+
+        # commit
+        requirements_file.write_text(f'git+{url}@{v1_5_3}#egg=grizzly-loadtester')
+        assert (('1.5.3', [], ), '2.2.1',) == get_dependency_versions(False)
+
+        _git_commit(work_repo, {
+            'grizzly/__init__.py': None,
+            'pyproject.toml': '[project]\nname = "grizzly-loadtester"\n',
+            'setup.cfg': 'name = grizzly-loadtester\n',
+            'requirements.txt': 'locust==2.8.4 \\ \n',
+        })
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+
+        requirements_file.write_text(f'grizzly-loadtester @ git+{url}@main\n')
+        assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to find "version" declaration in setup.cfg from {url}\n'
+        assert capture.out == ''
+
+        _git_commit(work_repo, {'setup.cfg': 'name = grizzly-loadtester\nversion = 2.0.0\n'})
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+
+        requirements_file.write_text(f'grizzly-loadtester[mq] @ git+{url}@main\n')
+        assert (('2.0.0', ['mq'], ), '2.8.4',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == ''
+        assert capture.out == ''
+
+        # version from tags, and locust version from pyproject.toml
+        v2_2_0 = _git_commit(work_repo, {
+            'setup.cfg': None,
+            'requirements.txt': None,
+            'pyproject.toml': '[project]\nname = "grizzly-loadtester"\ndependencies = [\n    "locust ==2.9.0",\n]\n',
+        }, tag='v2.2.0')
+        _git(work_repo, 'push', '-q', '--tags', str(bare_repo), 'main')
+
+        requirements_file.write_text(f'git+{url}@main#egg=grizzly-loadtester')
+        assert (('2.2.0', [], ), '==2.9.0',) == get_dependency_versions(False)
+
+        development = _git_commit(work_repo, {'README.md': 'grizzly'})
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+
+        # only use what is cached
+        assert (('2.2.0', [], ), '==2.9.0',) == get_dependency_versions(False, offline=True)
+        assert (('2.2.0', [], ), '==2.9.0',) == get_dependency_versions(False, offline=True)
+
+        assert ((f'2.2.1.dev1+g{development[:7]}', [], ), '==2.9.0',) == get_dependency_versions(False)
+
+        _git(work_repo, 'tag', '-d', 'v1.5.3')
+        _git(work_repo, 'tag', '-d', 'v2.2.0')
+        _git(bare_repo, 'tag', '-d', 'v1.5.3')
+        _git(bare_repo, 'tag', '-d', 'v2.2.0')
+
+        requirements_file.write_text(f'git+{url}@{v2_2_0}#egg=grizzly-loadtester')
+        assert ((f'0.1.dev7+g{v2_2_0[:7]}', [], ), '==2.9.0',) == get_dependency_versions(False)
+
+        # not reachable, mirror is used as is
+        rm_rf(bare_repo)
+
+        requirements_file.write_text(f'git+{url}@main#egg=grizzly-loadtester')
+        assert ((f'0.1.dev8+g{development[:7]}', [], ), '==2.9.0',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == ''
+        assert capture.out == ''
+
+        rm_rf(mirror)
+
+        assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False, offline=True)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! git repo {url} has not been cached by previous executions\n'
+        assert capture.out == ''
+
+        requirements_file.write_text(f'grizzly-loadtester[mq] % git+{url}@main\n')
+        assert (('(unknown)', None, ), '(unknown)',) == get_dependency_versions(False)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to find properly formatted grizzly dependency in {requirements_file}\n'
+        assert capture.out == ''
+    finally:
+        rm_rf(test_context)
+
+
+def test_git_show(tmp_path_factory: TempPathFactory, capsys: CaptureFixture) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    work_repo = test_context / 'grizzly'
+    bare_repo = test_context / 'grizzly.git'
+    url = bare_repo.as_uri()
+
+    try:
+        work_repo.mkdir()
+        _git(work_repo, 'init', '-q')
+        revision = _git_commit(work_repo, {'grizzly/__init__.py': "__version__ = '1.5.3'\n"})
+        _git(test_context, 'clone', '-q', '--bare', str(work_repo), str(bare_repo))
+        # so the mirror is a partial clone
+        _git(bare_repo, 'config', 'uploadpack.allowFilter', 'true')
+
+        mirror = get_git_mirror(url)
+        assert mirror is not None
+
+        assert git_show(mirror, revision, 'grizzly/__init__.py') == "__version__ = '1.5.3'\n"
+        assert git_show(mirror, revision, 'requirements.txt') is None
+        assert git_show(mirror, revision, 'requirements.txt', offline=True) is None
+
+        capture = capsys.readouterr()
+        assert capture.err == ''
+        assert capture.out == ''
+
+        # content that has not been fetched is not available when offline, and the reason is reported
+        revision = _git_commit(work_repo, {'requirements.txt': 'locust==2.2.1\n'})
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+        assert get_git_mirror(url) == mirror
+        rm_rf(bare_repo)
+
+        with pytest.raises(RuntimeError):
+            git_show(mirror, revision, 'requirements.txt', offline=True)
+
+        capture = capsys.readouterr()
+        assert capture.err.startswith(f'!! unable to get requirements.txt in {revision}: ')
+        assert capture.err.count('\n') == 1
+        assert capture.out == ''
+    finally:
+        rm_rf(test_context)
+
+
+def test_setuptools_scm_version(tmp_path_factory: TempPathFactory, capsys: CaptureFixture) -> None:
+    test_context = tmp_path_factory.mktemp('test_context')
+    work_repo = test_context / 'grizzly'
+    bare_repo = test_context / 'grizzly.git'
+    url = bare_repo.as_uri()
+
+    try:
+        work_repo.mkdir()
+        _git(work_repo, 'init', '-q')
+        _git_commit(work_repo, {'pyproject.toml': '[project]\nname = "grizzly-loadtester"\n'}, tag='v2.2.0')
+        development = _git_commit(work_repo, {'README.md': 'grizzly'}, tag='latest')
+        _git(test_context, 'clone', '-q', '--bare', str(work_repo), str(bare_repo))
+
+        mirror = get_git_mirror(url)
+        assert mirror is not None
+
+        # tags that are not versions are ignored
+        assert setuptools_scm_version(mirror, development, url) == f'2.2.1.dev1+g{development[:7]}'
+
+        # configuration of the project is used
+        configured = _git_commit(work_repo, {
+            'pyproject.toml': '[project]\nname = "grizzly-loadtester"\n\n[tool.setuptools_scm]\nlocal_scheme = "no-local-version"\n',
+        })
+        _git(work_repo, 'push', '-q', str(bare_repo), 'main')
+        assert get_git_mirror(url) == mirror
+
+        assert setuptools_scm_version(mirror, configured, url) == '2.2.1.dev2'
+
+        # temporary checkout is removed
+        assert _git(mirror, 'worktree', 'list').splitlines() == [f'{mirror.as_posix()}  (bare)']
+
+        with pytest.raises(RuntimeError):
+            setuptools_scm_version(mirror, 'foobar', url)
+
+        capture = capsys.readouterr()
+        assert capture.err == f'!! unable to checkout foobar from git repo {url}\n'
+        assert capture.out == ''
     finally:
         rm_rf(test_context)
 
@@ -1295,6 +1824,8 @@ def test_get_dependency_versions_pypi(mocker: MockerFixture, tmp_path_factory: T
     requirements_file = test_context / 'requirements.txt'
 
     mocker.patch('grizzly_cli.EXECUTION_CONTEXT', str(test_context))
+    # always ask (mocked) pypi, so responses cached by previous steps are not used
+    mocker.patch.dict(environ, {'GRIZZLY_CLI_PYPI_CACHE_TTL': '0'})
 
     try:
         grizzly_versions, locust_version = get_dependency_versions(False)
@@ -1412,6 +1943,72 @@ def test_get_dependency_versions_pypi(mocker: MockerFixture, tmp_path_factory: T
         rm_rf(test_context)
 
 
+def test_get_pypi(mocker: MockerFixture, requests_mock: RequestsMocker) -> None:
+    url = 'https://pypi.org/pypi/grizzly-loadtester-get-pypi/json'
+    mocker.patch.dict(environ, {'GRIZZLY_CLI_PYPI_CACHE_TTL': '0'})
+
+    # nothing cached
+    response = get_pypi(url, offline=True)
+    assert response.status_code == 504
+    assert response.text == ''
+    assert requests_mock.call_count == 0
+
+    requests_mock.register_uri('GET', url, status_code=404)
+    response = get_pypi(url)
+    assert response.status_code == 404
+    assert requests_mock.call_count == 1
+
+    requests_mock.register_uri('GET', url, status_code=200, text='{"info": {"version": "1.1.1"}}', headers={'ETag': '"foobar"'})
+    response = get_pypi(url)
+    assert response.status_code == 200
+    assert response.text == '{"info": {"version": "1.1.1"}}'
+    assert requests_mock.call_count == 2
+    assert requests_mock.last_request is not None
+    assert 'If-None-Match' not in requests_mock.last_request.headers
+
+    # not changed, cached text is used
+    requests_mock.register_uri('GET', url, status_code=304, text='')
+    response = get_pypi(url)
+    assert response.status_code == 200
+    assert response.text == '{"info": {"version": "1.1.1"}}'
+    assert requests_mock.call_count == 3
+    assert requests_mock.last_request is not None
+    assert requests_mock.last_request.headers['If-None-Match'] == '"foobar"'
+
+    # cached, regardless of age
+    response = get_pypi(url, offline=True)
+    assert response.status_code == 200
+    assert response.text == '{"info": {"version": "1.1.1"}}'
+    assert requests_mock.call_count == 3
+
+    # pypi not reachable, stale response is better than none
+    requests_mock.register_uri('GET', url, exc=requests.exceptions.ConnectionError)
+    response = get_pypi(url)
+    assert response.status_code == 200
+    assert response.text == '{"info": {"version": "1.1.1"}}'
+    assert requests_mock.call_count == 4
+
+    requests_mock.register_uri('GET', f'{url[:-5]}/1.1.1/json', exc=requests.exceptions.ConnectionError)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        get_pypi(f'{url[:-5]}/1.1.1/json')
+    assert requests_mock.call_count == 5
+
+    # within ttl, pypi is not asked
+    mocker.patch.dict(environ, {'GRIZZLY_CLI_PYPI_CACHE_TTL': '600'})
+    requests_mock.register_uri('GET', url, status_code=200, text='{"info": {"version": "2.2.2"}}')
+    response = get_pypi(url)
+    assert response.text == '{"info": {"version": "1.1.1"}}'
+    assert requests_mock.call_count == 5
+
+    mocker.patch.dict(environ, {'GRIZZLY_CLI_PYPI_CACHE_TTL': 'foo'})
+    with pytest.raises(ValueError) as ve:
+        get_pypi(url)
+    assert str(ve.value) == 'GRIZZLY_CLI_PYPI_CACHE_TTL should be number of seconds pypi responses are cached, not "foo"'
+
+    # connections are reused
+    assert _get_pypi_session() is _get_pypi_session()
+
+
 def test_requirements(capsys: CaptureFixture, tmp_path_factory: TempPathFactory) -> None:
     test_context = tmp_path_factory.mktemp('test_context')
     requirements_file = test_context / 'requirements.txt'
@@ -1435,3 +2032,77 @@ def test_requirements(capsys: CaptureFixture, tmp_path_factory: TempPathFactory)
 
     finally:
         rm_rf(test_context)
+
+
+def create_configuration_layer(random: Random, depth: int = 0) -> Dict[str, Any]:
+    layer: Dict[str, Any] = {}
+
+    for _ in range(random.randint(0, 4)):
+        key = random.choice(['foo', 'bar', 'hello', 'world', 'none'])
+        kind = random.random()
+        if kind < 0.4 and depth < 3:
+            layer[key] = create_configuration_layer(random, depth + 1)
+        elif kind < 0.6:
+            layer[key] = random.choice(['none', 'None', 'NONE'])
+        elif kind < 0.7:
+            layer[key] = None
+        elif kind < 0.8:
+            layer[key] = [1, 2, 3]
+        else:
+            layer[key] = random.randint(0, 100)
+
+    return layer
+
+
+def test_layered_configuration() -> None:
+    layers: List[Dict[str, Any]] = [
+        {'configuration': {'env': 'none', 'keyvault': 'https://example.com', 'foo': {'bar': 'none'}}},
+        {'configuration': {'foo': {'bar': 'foobar', 'baz': 'None'}, 'hello': 'world'}},
+        {'configuration': {'env': 'local', 'foo': 'none'}},
+    ]
+
+    configuration = LayeredConfiguration(*layers)
+    assert configuration.get('configuration', 'env') == 'local'
+    assert configuration.get('configuration', 'keyvault') == 'https://example.com'
+    assert configuration.get('configuration', 'foo') is None
+    assert configuration.get('configuration', 'foo', 'bar') is None
+    assert configuration.get('configuration', 'foo', 'bar', default='default') == 'default'
+    assert configuration.get('configuration', 'missing', default='default') == 'default'
+    assert configuration.get('missing') is None
+
+    assert configuration.materialize() == {'configuration': {'env': 'local', 'keyvault': 'https://example.com', 'foo': None, 'hello': 'world'}}
+
+    configuration = LayeredConfiguration(*layers[:2])
+    # values in the base layer is not converted, same as `merge_dicts`
+    assert configuration.get('configuration', 'env') == 'none'
+    assert configuration.get('configuration', 'foo') == {'bar': 'foobar', 'baz': None}
+    assert configuration.materialize() == merge_dicts(*layers[:2])
+
+    configuration.prepend({'configuration': {'hello': 'foo', 'world': 'bar'}})
+    configuration.append({'configuration': {'world': 'foo'}})
+    assert configuration.materialize() == {
+        'configuration': {'hello': 'world', 'world': 'foo', 'env': None, 'keyvault': 'https://example.com', 'foo': {'bar': 'foobar', 'baz': None}},
+    }
+    assert configuration.materialize() == merge_dicts(configuration.layers[0], merge_dicts(merge_dicts(*layers[:2]), configuration.layers[-1]))
+    assert list(configuration.get('configuration').keys()) == ['hello', 'world', 'env', 'keyvault', 'foo']
+
+    # layers are not modified
+    assert layers[0] == {'configuration': {'env': 'none', 'keyvault': 'https://example.com', 'foo': {'bar': 'none'}}}
+
+    assert LayeredConfiguration().materialize() == {}
+
+    # same result as merging one layer at the time with `merge_dicts`, including order of keys
+    random = Random(1337)
+    for _ in range(500):
+        layers = [create_configuration_layer(random) for _ in range(random.randint(1, 6))]
+
+        expected = layers[0]
+        for layer in layers[1:]:
+            expected = merge_dicts(expected, layer)
+
+        actual = LayeredConfiguration(*layers).materialize()
+        assert actual == expected
+        assert repr(actual) == repr(expected)
+
+        for key in ['foo', 'bar', 'none']:
+            assert LayeredConfiguration(*layers).get(key, default='missing') == expected.get(key, 'missing')